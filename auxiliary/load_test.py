@@ -0,0 +1,273 @@
+"""
+Load test of a full game against local stand-ins for DynamoDB and SQS.
+
+Spins up one simulated team server per player in a single asyncio process, each answering with a
+configurable latency, error rate and correctness, then drives a game through GamesManager while a
+Worker runs the game runners in process. Reports questions per second, the p50/p99 latency from a
+team's answer to its score being written, and DynamoDB calls per question.
+
+The stand-ins are the in-memory backend (shared.memory_backend) by default. With --backend local
+they are servers reached through the standard AWS_ENDPOINT_URL_<SERVICE> variables, e.g. DynamoDB
+Local on :8000 and ElasticMQ on :9324 (the defaults):
+
+    python auxiliary/load_test.py --players 200 --profile good=0.7 --profile slow=0.2 --profile flaky=0.1
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_DYNAMODB_ENDPOINT = "http://localhost:8000"
+DEFAULT_SQS_ENDPOINT = "http://localhost:9324"
+BASE_PORT = 9100
+
+
+class TeamProfile:
+    """ Behaviour of a simulated team server. Latencies in seconds, rates in [0, 1] """
+
+    def __init__(self, latency, jitter=0, error_rate=0, drop_rate=0, correct_rate=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.correct_rate = correct_rate
+
+
+PROFILES = {
+    "good": TeamProfile(latency=0.02, jitter=0.01, correct_rate=0.95),
+    "slow": TeamProfile(latency=0.5, jitter=0.25, correct_rate=0.8),
+    "flaky": TeamProfile(latency=0.05, jitter=0.05, error_rate=0.2, drop_rate=0.05, correct_rate=0.7),
+    "wrong": TeamProfile(latency=0.02, jitter=0.01, correct_rate=0.2),
+}
+
+
+class SimulatedTeam:
+    """ HTTP server of one team. Correct answers are sent as "cheat", which is graded CORRECT while
+        cheating is allowed, so the server doesn't need to solve the questions """
+
+    def __init__(self, port, profile, rng):
+        self.port = port
+        self.profile = profile
+        self.rng = rng
+        self.questions = 0
+        self.answered_at = None     # perf_counter() of the latest response, the team has one question at a time
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", self.port)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                # questions are GET requests, without a body
+                await reader.readuntil(b"\r\n\r\n")
+                self.questions += 1
+
+                profile = self.profile
+                await asyncio.sleep(max(0, self.rng.gauss(profile.latency, profile.jitter)))
+                if self.rng.random() < profile.drop_rate:
+                    self.answered_at = time.perf_counter()
+                    return
+                if self.rng.random() < profile.error_rate:
+                    status, body = "500 Internal Server Error", "error"
+                elif self.rng.random() < profile.correct_rate:
+                    status, body = "200 OK", "cheat"
+                else:
+                    status, body = "200 OK", "wrong"
+
+                writer.write((
+                    f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\n"
+                    f"Content-Length: {len(body.encode())}\r\n\r\n{body}"
+                ).encode())
+                await writer.drain()
+                self.answered_at = time.perf_counter()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class SimulatedTeams:
+    """ Team servers run on an event loop in a background thread """
+
+    def __init__(self, profiles, base_port=BASE_PORT, seed=None):
+        rng = random.Random(seed)
+        self.teams = [SimulatedTeam(base_port + i, profile, random.Random(rng.random()))
+                      for i, profile in enumerate(profiles)]
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        for team in self.teams:
+            asyncio.run_coroutine_threadsafe(team.start(), self.loop).result()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def shutdown(self):
+        for team in self.teams:
+            team.server.close()
+        connections = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    def api(self, team):
+        return f"http://127.0.0.1:{team.port}/"
+
+
+class DynamoDBCallCounter:
+    """ Counts DynamoDB calls per operation, hooked to the botocore events of a client """
+
+    def __init__(self, client):
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        client.meta.events.register("before-call.dynamodb", self.count)
+
+    def count(self, model, **kwargs):
+        with self.lock:
+            self.calls[model.name] += 1
+
+    def total(self):
+        return sum(self.calls.values())
+
+
+def percentile(values, q):
+    """ Returns the q-th percentile (0-100) of values, by nearest rank """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def team_profiles(weights, players, rng):
+    names = list(weights)
+    return [PROFILES[name] for name in rng.choices(names, [weights[name] for name in names], k=players)]
+
+
+def create_tables(dynamodb):
+    """ Creates the tables missing from the local DynamoDB """
+    from dynamodb.schema import TABLES
+
+    existing = set(dynamodb.meta.client.list_tables()['TableNames'])
+    for definition in TABLES:
+        if definition['TableName'] not in existing:
+            dynamodb.create_table(**definition).wait_until_exists()
+
+
+def run(args):
+    # imported once the endpoints are set, as clients are created on first use
+    from shared import aws
+    from shared.games_manager import GamesManager
+    from shared.question_factory import MAX_ROUND
+    from shared.worker import Worker, ADMINISTER_QUESTION_QUEUE, GAME_MONITOR_QUEUE
+
+    dynamodb = aws.dynamodb()
+    create_tables(dynamodb)
+    for queue_name in (ADMINISTER_QUESTION_QUEUE, GAME_MONITOR_QUEUE):
+        aws.queue_url(queue_name)
+
+    rng = random.Random(args.seed)
+    teams = SimulatedTeams(team_profiles(args.profiles, args.players, rng), args.base_port, args.seed)
+    teams.start()
+
+    games_manager = GamesManager()
+    worker = Worker()
+    counter = DynamoDBCallCounter(dynamodb.meta.client)
+
+    # answer-to-score latency, measured when the worker writes the answer
+    team_of_player = {}
+    latencies = []
+    record_answer = worker.quiz_master.players.record_answer
+
+    def timed_record_answer(game_id, player_id, *record_args, **record_kwargs):
+        response = record_answer(game_id, player_id, *record_args, **record_kwargs)
+        team = team_of_player.get(player_id)
+        if team is not None and team.answered_at is not None:
+            latencies.append(time.perf_counter() - team.answered_at)
+        return response
+
+    worker.quiz_master.players.record_answer = timed_record_answer
+    worker_thread = threading.Thread(target=worker.run, daemon=True)
+    worker_thread.start()
+
+    game = games_manager.new_game("load-test")
+    game_id = game['game_id']
+    for i, team in enumerate(teams.teams):
+        player = games_manager.add_player_to_game(game_id, f"team{i}", teams.api(team))
+        team_of_player[player['player_id']] = team
+    print(f"Game {game_id} started with {args.players} simulated teams")
+
+    calls_before = counter.total()
+    started = time.perf_counter()
+    rounds = min(args.rounds, MAX_ROUND)
+    for round in range(rounds + 1):
+        time.sleep(args.round_duration)
+        if round < rounds:
+            games_manager.advance_game_round(game_id)
+            print(f"Round {round + 1}: {len(latencies)} questions scored")
+    elapsed = time.perf_counter() - started
+    questions = len(latencies)
+    calls = counter.total() - calls_before
+
+    games_manager.end_game(game_id)
+    worker.stop()
+    worker_thread.join()
+    teams.stop()
+
+    print()
+    print(f"questions scored       {questions}")
+    print(f"questions per second   {questions / elapsed:.1f}")
+    print(f"answer-to-score p50    {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"answer-to-score p99    {percentile(latencies, 99) * 1000:.1f} ms")
+    print(f"DynamoDB calls/question {calls / questions if questions else 0:.2f}")
+    for operation, count in counter.calls.most_common():
+        print(f"    {operation:<22} {count}")
+
+
+def profile_weight(value):
+    name, _, weight = value.partition("=")
+    if name not in PROFILES:
+        raise argparse.ArgumentTypeError(f"unknown profile {name}, choose from {', '.join(PROFILES)}")
+    return name, float(weight or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=50, help="simulated teams")
+    parser.add_argument("--profile", dest="profiles", action="append", type=profile_weight,
+                        help="NAME=WEIGHT of a team profile, repeatable (default good=1)")
+    parser.add_argument("--rounds", type=int, default=3, help="rounds played after the warmup")
+    parser.add_argument("--round-duration", type=float, default=30, help="seconds per round")
+    parser.add_argument("--base-port", type=int, default=BASE_PORT, help="port of the first team server")
+    parser.add_argument("--seed", type=int, help="seed of the team profiles and answers")
+    parser.add_argument("--backend", choices=["memory", "local"], default="memory",
+                        help="in-memory stand-ins, or local DynamoDB/SQS servers at the endpoints below")
+    parser.add_argument("--dynamodb-endpoint",
+                        default=os.environ.get("AWS_ENDPOINT_URL_DYNAMODB", DEFAULT_DYNAMODB_ENDPOINT))
+    parser.add_argument("--sqs-endpoint", default=os.environ.get("AWS_ENDPOINT_URL_SQS", DEFAULT_SQS_ENDPOINT))
+    args = parser.parse_args()
+    args.profiles = dict(args.profiles or [("good", 1)])
+
+    if args.backend == "memory":
+        os.environ["EXTREME_STARTUP_BACKEND"] = "memory"
+    else:
+        os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = args.dynamodb_endpoint
+        os.environ["AWS_ENDPOINT_URL_SQS"] = args.sqs_endpoint
+    os.environ.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    # the local stand-ins accept any credentials
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Startup budget of the Lambda entry points.
+
+Imports every lambda_function module in a fresh interpreter with -X importtime, as a cold Lambda would,
+and reports the total cold start time and the heaviest imports of each. Exits with status 1 if an
+entry point is over budget.
+
+    python auxiliary/startup_budget.py [--budget MS] [--top N] [--json FILE] [entry point dir ...]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINT_DIRS = ["lambda-api-endpoint", "lambda-game-runner"]
+
+# Cold start budget (in ms) of one entry point, imports and module level initialisation included
+DEFAULT_BUDGET_MS = 500
+DEFAULT_TOP = 5
+
+MARKER = "STARTUP_BUDGET "
+PROBE = """
+import sys, time, json
+sys.path[:0] = {paths!r}
+started = time.perf_counter()
+import lambda_function
+print({marker!r} + json.dumps({{"total_ms": (time.perf_counter() - started) * 1000}}))
+"""
+
+
+def entry_points():
+    return sorted(
+        os.path.dirname(path)
+        for entry_dir in ENTRY_POINT_DIRS
+        for path in glob.glob(os.path.join(ROOT, entry_dir, "*", "lambda_function.py"))
+    )
+
+
+def measure(entry_point):
+    """ Returns {"total_ms", "imports": [(module, self_ms, cumulative_ms, depth), ...]} of one cold import of
+        entry_point, in -X importtime order: every module after the modules it imports, which are one level deeper """
+    # the game runners also import the shared modules without their package, as deployed
+    paths = [entry_point, ROOT, os.path.join(ROOT, "shared")]
+    env = dict(os.environ)
+    # resources are created at import, which needs a region but makes no call
+    env.setdefault("AWS_DEFAULT_REGION", "eu-west-2")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(paths=paths, marker=MARKER)],
+        capture_output=True, text=True, env=env, cwd=ROOT,
+    )
+    marker_lines = [line for line in result.stdout.splitlines() if line.startswith(MARKER)]
+    if result.returncode != 0 or not marker_lines:
+        raise RuntimeError(f"Couldn't import {entry_point}:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        # a module imported by another is indented two more spaces than it
+        depth = (len(module) - len(module.lstrip())) // 2
+        imports.append((module.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+
+    return {"total_ms": json.loads(marker_lines[-1][len(MARKER):])["total_ms"], "imports": imports}
+
+
+def parents(imports):
+    """ Returns the index in imports of the module importing each one, None for top level imports """
+    parent = [None] * len(imports)
+    unclaimed = []
+    for i, (_, _, _, depth) in enumerate(imports):
+        while unclaimed and imports[unclaimed[-1]][3] > depth:
+            parent[unclaimed.pop()] = i
+        unclaimed.append(i)
+    return parent
+
+
+def heaviest(imports, top):
+    """ Returns the top heaviest imports of lambda_function as (module, self_ms, cumulative_ms) by cumulative time,
+        skipping the modules imported by one already listed, whose time is counted in its cumulative time """
+    parent = parents(imports)
+    listed = []
+    for i in sorted(range(len(imports)), key=lambda i: imports[i][2], reverse=True):
+        if len(listed) == top:
+            break
+        # interpreter startup imports, e.g. site, aren't under lambda_function
+        ancestor = parent[i]
+        while ancestor is not None and ancestor not in listed and imports[ancestor][0] != "lambda_function":
+            ancestor = parent[ancestor]
+        if ancestor is not None and ancestor not in listed:
+            listed.append(i)
+    return [imports[i][:3] for i in listed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entry_points", nargs="*", help="entry point directories, all lambdas by default")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_MS, help="cold start budget in ms")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="heaviest imports shown per entry point")
+    parser.add_argument("--json", help="file the measurements are recorded to")
+    args = parser.parse_args()
+
+    report = {}
+    over_budget = []
+    for entry_point in [os.path.abspath(path) for path in args.entry_points] or entry_points():
+        name = os.path.relpath(entry_point, ROOT)
+        measurement = measure(entry_point)
+        report[name] = {
+            "total_ms": round(measurement["total_ms"], 1),
+            "heaviest_imports": [
+                {"module": module, "self_ms": round(self_ms, 1), "cumulative_ms": round(cumulative_ms, 1)}
+                for module, self_ms, cumulative_ms in heaviest(measurement["imports"], args.top)
+            ],
+        }
+        status = "OK" if measurement["total_ms"] <= args.budget else "OVER BUDGET"
+        if status != "OK":
+            over_budget.append(name)
+
+        print(f"{name:<45} {measurement['total_ms']:8.1f} ms  {status}")
+        for entry in report[name]["heaviest_imports"]:
+            print(f"    {entry['module']:<41} {entry['cumulative_ms']:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as outfile:
+            json.dump({"budget_ms": args.budget, "entry_points": report}, outfile, indent=2)
+
+    if over_budget:
+        print(f"{len(over_budget)} entry point(s) over the {args.budget} ms budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
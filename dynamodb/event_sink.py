@@ -0,0 +1,125 @@
+from botocore.exceptions import BotoCoreError, ClientError
+import threading
+import random
+import time
+
+BATCH_WRITE_LIMIT = 25          # max items per BatchWriteItem call
+MAX_BUFFERED_EVENTS = 100       # flush once this many events are buffered
+MAX_BUFFER_AGE = 1              # flush once oldest buffered event is this old (in seconds)
+MAX_RETRIES = 5                 # retries of UnprocessedItems before giving up on a batch
+RETRY_BASE_DELAY = 0.05         # first backoff delay (in seconds), doubled on each retry
+
+
+class EventSink:
+    """ Write-behind buffer for items of an event table. Items are buffered per worker and
+        written with BatchWriteItem in groups of 25 once the size or age threshold is reached,
+        instead of one put_item per answered question. flush() must be called on shutdown """
+
+    def __init__(self, dyn_resource, table_name='player_events', max_events=MAX_BUFFERED_EVENTS,
+                 max_age=MAX_BUFFER_AGE, clock=time.time):
+        self.dyn_resource = dyn_resource
+        self.table_name = table_name
+        self.max_events = max_events
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.oldest = None
+
+        self.flushes = 0
+        self.flushed_events = 0
+        self.retries = 0
+        self.last_flush_latency = 0
+        self.max_flush_latency = 0
+        self.total_flush_latency = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def add(self, item):
+        """ Buffers item, flushing if a threshold is reached """
+        with self.lock:
+            if not self.buffer:
+                self.oldest = self.clock()
+            self.buffer.append(item)
+        self.flush_if_due()
+
+    def flush_if_due(self):
+        with self.lock:
+            due = len(self.buffer) >= self.max_events or (self.buffer and self.clock() - self.oldest >= self.max_age)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """ Writes every buffered item. Items which still can't be written are put back in the buffer """
+        with self.lock:
+            items, self.buffer = self.buffer, []
+        if not items:
+            return
+
+        start = time.perf_counter()
+        # items written, or put back in the buffer; whatever the error, the others are put back too
+        done = 0
+        try:
+            for i in range(0, len(items), BATCH_WRITE_LIMIT):
+                batch = items[i:i + BATCH_WRITE_LIMIT]
+                unprocessed = self.__write_batch(batch)
+                self.flushed_events += len(batch) - len(unprocessed)
+                if unprocessed:
+                    self.__requeue(unprocessed + items[i + BATCH_WRITE_LIMIT:])
+                    done = len(items)
+                    print("Couldn't write %d events to table %s, kept in buffer" % (len(unprocessed), self.table_name))
+                    return
+                done = i + len(batch)
+        except ClientError as err:
+            print(
+                "Couldn't batch write events to table %s: %s: %s", self.table_name,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        except BotoCoreError as err:
+            print("Couldn't batch write events to table %s: %s", self.table_name, err)
+            raise
+        finally:
+            if done < len(items):
+                self.__requeue(items[done:])
+            latency = time.perf_counter() - start
+            self.flushes += 1
+            self.last_flush_latency = latency
+            self.max_flush_latency = max(self.max_flush_latency, latency)
+            self.total_flush_latency += latency
+
+    def metrics(self):
+        return {
+            'queue_depth': len(self.buffer),
+            'flushes': self.flushes,
+            'flushed_events': self.flushed_events,
+            'retries': self.retries,
+            'last_flush_latency': self.last_flush_latency,
+            'max_flush_latency': self.max_flush_latency,
+            'average_flush_latency': self.total_flush_latency / self.flushes if self.flushes else 0,
+        }
+
+    def __write_batch(self, items):
+        # Returns items still unprocessed after MAX_RETRIES
+        requests = [{'PutRequest': {'Item': item}} for item in items]
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                self.retries += 1
+                time.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+            response = self.dyn_resource.batch_write_item(RequestItems={self.table_name: requests})
+            requests = response.get('UnprocessedItems', {}).get(self.table_name, [])
+            if not requests:
+                return []
+        return [request['PutRequest']['Item'] for request in requests]
+
+    def __requeue(self, items):
+        with self.lock:
+            if not self.buffer:
+                self.oldest = self.clock()
+            self.buffer[:0] = items
@@ -2,12 +2,16 @@ from uuid import uuid4
 from botocore.exceptions import ClientError
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key, Attr
+from dynamodb.pagination import paginate, page
 import datetime as dt
+import time
 
 class GameEvents:
-    def __init__(self, dyn_resource):
+    def __init__(self, dyn_resource, clock=time.time):
         self.dyn_resource = dyn_resource
         self.table = dyn_resource.Table('game_events')
+        # timestamps of new events, a virtual clock when a game is simulated
+        self.clock = clock
 
     # FOR REFERENCE ONLY, NEVER CALLED
     def __create_table(self, table_name='game_events'):
@@ -34,7 +38,7 @@ class GameEvents:
     def add_game_events(self, game_id, title, description, player_id):
         item = {
                     'game_id': game_id,
-                    'timestamp': dt.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+                    'timestamp': dt.datetime.fromtimestamp(self.clock()).strftime('%Y-%m-%dT%H:%M:%S'),
                     'title': title,
                     'description': description,
                     'player_id': player_id,
@@ -63,6 +67,38 @@ class GameEvents:
     #         return response['Item'] if 'Item' in response else None
 
     def query_game_events_by_timestamp(self, game_id, projection=[], forward=False, **eq_filter):
+        return list(self.iter_game_events_by_timestamp(game_id, projection, forward, **eq_filter))
+
+
+    def iter_game_events_by_timestamp(self, game_id, projection=[], forward=False, since=None, **eq_filter):
+        """ Yields game events ordered by timestamp. If since is given, only yields game events with a timestamp at or after it """
+        kwargs = self.__timestamp_query(game_id, projection, forward, eq_filter)
+        if since is not None:
+            kwargs['KeyConditionExpression'] = kwargs['KeyConditionExpression'] & Key('timestamp').gte(since)
+        try:
+            yield from paginate(self.table.query, **kwargs)
+        except ClientError as err:
+            print(
+                "Couldn't get query game events by timestampfrom game %s: %s: %s",
+                game_id,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+
+    def query_game_events_by_timestamp_page(self, game_id, limit, cursor=None, projection=[], forward=False, **eq_filter):
+        """ Returns (game events, next_cursor) for one page of at most limit game events starting after cursor """
+        kwargs = self.__timestamp_query(game_id, projection, forward, eq_filter)
+        try:
+            return page(self.table.query, limit, cursor, **kwargs)
+        except ClientError as err:
+            print(
+                "Couldn't get query game events by timestampfrom game %s: %s: %s",
+                game_id,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+
+    def __timestamp_query(self, game_id, projection, forward, eq_filter):
         kwargs = {'KeyConditionExpression': Key('game_id').eq(game_id),
                   "ScanIndexForward": forward}
 
@@ -75,16 +111,4 @@ class GameEvents:
         if projection:
             kwargs['ProjectionExpression'] = ', '.join(map(lambda s : '#' + s, projection))
             kwargs['ExpressionAttributeNames'] = {f'#{s}': s for s in projection}
-
-        try:
-            response = self.table.query(**kwargs)
-        except ClientError as err:
-            print(
-                "Couldn't get query game events by timestampfrom game %s: %s: %s",
-                game_id,
-                err.response['Error']['Code'], err.response['Error']['Message'])
-            raise
-        else:
-            return response['Items']
-
-    
\ No newline at end of file
+        return kwargs
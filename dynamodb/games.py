@@ -2,8 +2,50 @@ from uuid import uuid4
 from botocore.exceptions import ClientError
 from decimal import Decimal
 from boto3.dynamodb.conditions import Key, Attr
+from dynamodb.pagination import paginate
+import threading
+import time
+
+GAME_CACHE_TTL = 2   # seconds a cached game item may be served for
+
+
+class GameCache:
+    """ Read-through cache of game items with a TTL, shared by every Games instance of the process """
+
+    def __init__(self, ttl=GAME_CACHE_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.items = {}     # game_id -> (expiry time, item)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, game_id):
+        """ Returns a copy of the cached item, or None if absent or expired """
+        with self.lock:
+            expiry, item = self.items.get(game_id, (0, None))
+            if item is None or expiry < self.clock():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(item)
+
+    def put(self, game_id, item):
+        with self.lock:
+            self.items[game_id] = (self.clock() + self.ttl, dict(item))
+
+    def invalidate(self, game_id):
+        with self.lock:
+            self.items.pop(game_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
 
 class Games:
+    cache = GameCache()
+
     def __init__(self, dyn_resource):
         self.dyn_resource = dyn_resource
         self.table = dyn_resource.Table('games')
@@ -51,9 +93,15 @@ class Games:
         return item
 
 
-    def get_game(self, game_id):
+    def get_game(self, game_id, consistent=False):
+        """ Returns game item, served from the cache unless consistent is set """
+        if not consistent:
+            game = self.cache.get(game_id)
+            if game is not None:
+                return game
+
         try:
-            response = self.table.get_item(Key={'game_id': game_id})
+            response = self.table.get_item(Key={'game_id': game_id}, ConsistentRead=consistent)
         except ClientError as err:
             print(
                 "Couldn't get game %s from table %s: %s: %s",
@@ -61,7 +109,10 @@ class Games:
                 err.response['Error']['Code'], err.response['Error']['Message'])
             
         else:
-            return response['Item'] if 'Item' in response else None
+            if 'Item' not in response:
+                return None
+            self.cache.put(game_id, response['Item'])
+            return response['Item']
 
     def scan_games(self, projection=[], **eq_filter):
         games = []
@@ -78,15 +129,7 @@ class Games:
             kwargs['ExpressionAttributeNames'] = {f'#{s}': s for s in projection}
 
         try:
-            done = False
-            start_key = None
-            while not done:
-                if start_key:
-                    kwargs['ExclusiveStartKey'] = start_key
-                response = self.table.scan(**kwargs)
-                games.extend(response.get('Items', []))
-                start_key = response.get('LastEvaluatedKey', None)
-                done = start_key is None
+            games.extend(paginate(self.table.scan, **kwargs))
         except ClientError as err:
             print(
                 "Couldn't scan for games: %s: %s",
@@ -109,6 +152,7 @@ class Games:
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
         else:
+            self.cache.invalidate(game_id)
             return response['Attributes']
 
     def update_game_flag(self, game_id, **flag):
@@ -129,6 +173,7 @@ class Games:
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
         else:
+            self.cache.invalidate(game_id)
             return response['Attributes']
 
     def update_round(self, game_id, increment=1):
@@ -145,6 +190,7 @@ class Games:
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
         else:
+            self.cache.invalidate(game_id)
             return response['Attributes']
 
     def update_games_attribute(self, game_id, **attribute):
@@ -166,6 +212,7 @@ class Games:
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
         else:
+            self.cache.invalidate(game_id)
             return response['Attributes']
 
 
@@ -0,0 +1,49 @@
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Key
+from decimal import Decimal
+from dynamodb.pagination import paginate
+
+BATCH_WRITE_LIMIT = 25          # max items per BatchWriteItem call
+
+
+class LatencyMetrics:
+    """ Latency histograms of the questions of a game (see shared.latency), written by each process (source)
+        as one item of its cumulative game histograms, and one item per player under source#player_id, so
+        items stay small however many players the game has """
+
+    def __init__(self, dyn_resource):
+        self.dyn_resource = dyn_resource
+        self.table = dyn_resource.Table('latency_metrics')
+
+    def put_metrics(self, game_id, source, spans, players, updated_at):
+        """ Writes the game histograms and the histograms of the given players only """
+        updated_at = Decimal(str(round(updated_at, 3)))
+        items = [{'game_id': game_id, 'source': source, 'spans': spans, 'updated_at': updated_at}]
+        items += [
+            {'game_id': game_id, 'source': f"{source}#{player_id}", 'player_id': player_id, 'spans': player_spans,
+             'updated_at': updated_at}
+            for player_id, player_spans in players.items()
+        ]
+        try:
+            for i in range(0, len(items), BATCH_WRITE_LIMIT):
+                requests = [{'PutRequest': {'Item': item}} for item in items[i:i + BATCH_WRITE_LIMIT]]
+                response = self.dyn_resource.batch_write_item(RequestItems={self.table.name: requests})
+                if response.get('UnprocessedItems'):
+                    raise RuntimeError(f"{len(response['UnprocessedItems'][self.table.name])} items unprocessed")
+        except ClientError as err:
+            print(
+                "Couldn't put latency metrics of game %s to table %s: %s: %s",
+                game_id, self.table.name,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        return items
+
+    def query_metrics(self, game_id):
+        """ Returns the items of every source and player of game """
+        try:
+            return list(paginate(self.table.query, KeyConditionExpression=Key('game_id').eq(game_id)))
+        except ClientError as err:
+            print(
+                "Couldn't query latency metrics of game %s: %s: %s", game_id,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
@@ -0,0 +1,40 @@
+from botocore.exceptions import ClientError
+
+
+class LeaderboardSnapshots:
+    """ Leaderboard of a game as last written by a QuizMaster (see shared.leaderboard), one item per game.
+        Kept out of the games item, so game reads and the GameCache don't carry it """
+
+    def __init__(self, dyn_resource):
+        self.dyn_resource = dyn_resource
+        self.table = dyn_resource.Table('leaderboard_snapshots')
+
+    def put_snapshot(self, game_id, leaderboard, taken_at):
+        """ Writes the snapshot unless a newer one is stored, e.g. by a container whose leaderboard is fresher.
+            Returns whether it was written """
+        try:
+            self.table.put_item(
+                Item={'game_id': game_id, 'leaderboard': leaderboard, 'taken_at': taken_at},
+                ConditionExpression='attribute_not_exists(game_id) OR taken_at < :taken_at',
+                ExpressionAttributeValues={':taken_at': taken_at})
+        except ClientError as err:
+            if err.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            print(
+                "Couldn't put leaderboard snapshot of game %s to table %s: %s: %s",
+                game_id, self.table.name,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        return True
+
+    def get_snapshot(self, game_id):
+        """ Returns the snapshot item of game, None if none was written """
+        try:
+            response = self.table.get_item(Key={'game_id': game_id})
+        except ClientError as err:
+            print(
+                "Couldn't get leaderboard snapshot of game %s from table %s: %s: %s",
+                game_id, self.table.name,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        return response.get('Item')
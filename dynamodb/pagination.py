@@ -0,0 +1,58 @@
+from decimal import Decimal
+import base64
+import json
+
+
+def paginate(operation, **kwargs):
+    """ Lazily yields the items of every page of a query/scan, following LastEvaluatedKey,
+        so results over 1 MB are neither truncated nor loaded whole """
+    while True:
+        response = operation(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def page(operation, limit, cursor=None, **kwargs):
+    """ Runs one page of a query/scan of at most limit items, starting after cursor.
+        Returns (items, next_cursor), next_cursor is None on the last page """
+    kwargs['Limit'] = limit
+    if cursor:
+        kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    response = operation(**kwargs)
+    last_key = response.get('LastEvaluatedKey', None)
+    return response.get('Items', []), encode_cursor(last_key) if last_key else None
+
+
+def parse_page(limit, cursor):
+    """ Returns (limit, cursor) of paging query parameters, either may be None. Raises ValueError unless
+        limit is a positive integer and cursor one returned with a previous page, sent with a limit """
+    if limit:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid page limit {limit!r}")
+        if limit < 1:
+            raise ValueError(f"Invalid page limit {limit!r}, must be at least 1")
+    if cursor:
+        decode_cursor(cursor)
+        # without a limit the whole result would be returned, ignoring the cursor
+        if not limit:
+            raise ValueError("A page cursor needs a page limit")
+    return limit or None, cursor or None
+
+
+# Cursors are LastEvaluatedKey as url-safe base64 JSON. Numbers are tagged so they are decoded back to Decimal
+def encode_cursor(key):
+    tagged = {k: {'N': str(v)} if isinstance(v, Decimal) else {'S': v} for k, v in key.items()}
+    return base64.urlsafe_b64encode(json.dumps(tagged).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """ Returns the key of a cursor, raises ValueError if it wasn't made by encode_cursor """
+    try:
+        tagged = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return {k: Decimal(v['N']) if 'N' in v else v['S'] for k, v in tagged.items()}
+    except (ValueError, TypeError, KeyError, AttributeError, ArithmeticError):
+        raise ValueError(f"Invalid page cursor {cursor!r}")
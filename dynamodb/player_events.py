@@ -1,13 +1,25 @@
 from uuid import uuid4
 from botocore.exceptions import ClientError
 from boto3.dynamodb.conditions import Key, Attr
+from dynamodb.pagination import paginate, page
 import datetime as dt
+import time
+
+# player_event_id is the player_id followed by an event id of this length
+EVENT_ID_LENGTH = 8
+
+
+def player_id_of(player_event_id):
+    """ Returns the player_id of a player_event_id, player ids don't all have the same length """
+    return player_event_id[:-EVENT_ID_LENGTH]
 
 
 class PlayerEvents:
-    def __init__(self, dyn_resource):
+    def __init__(self, dyn_resource, clock=time.time):
         self.dyn_resource = dyn_resource
         self.table = dyn_resource.Table('player_events')
+        # timestamps of new events, a virtual clock when a game is simulated
+        self.clock = clock
 
 
     # FOR REFERENCE ONLY, NEVER CALLED
@@ -34,22 +46,27 @@ class PlayerEvents:
             return self.table
 
 
-    def add_event(self, game_id, player_id, score, query, difficulty, points_gained, response_type):
-        item = {
+    def new_event(self, game_id, player_id, score, query, difficulty, points_gained, response_type, request_index=None):
+        """ Returns a new event item without writing it, e.g. to write it in a transaction. request_index is the
+            player's request count once this answer is recorded, it orders the answers given within one second """
+        event = {
                     'game_id': game_id,
-                    'player_event_id': player_id+uuid4().hex[:8],
+                    'player_event_id': player_id+uuid4().hex[:EVENT_ID_LENGTH],
                     'score': score,
                     'query': query,
                     'difficulty': difficulty,
                     'points_gained': points_gained,
                     'response_type': response_type,
-                    'timestamp': dt.datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+                    'timestamp': dt.datetime.fromtimestamp(self.clock()).strftime('%Y-%m-%dT%H:%M:%S')
                 }
+        if request_index is not None:
+            event['request_index'] = request_index
+        return event
+
+    def add_event(self, game_id, player_id, score, query, difficulty, points_gained, response_type):
+        item = self.new_event(game_id, player_id, score, query, difficulty, points_gained, response_type)
         try:
-            self.table.put_item(
-                Item=item,
-                ReturnValues="ALL_OLD"
-                )
+            self.table.put_item(Item=item)
         except ClientError as err:
             print(
                 "Couldn't add new event to table %s: %s: %s",
@@ -72,37 +89,82 @@ class PlayerEvents:
 
 
     def query_events_by_timestamp(self, game_id, projection=[], forward=False, **eq_filter):
-        kwargs = {'KeyConditionExpression': Key('game_id').eq(game_id),
-                  'IndexName': "timestamp-index",
-                  "ScanIndexForward": forward,
-                  "ConsistentRead": True}
+        return list(self.iter_events_by_timestamp(game_id, projection, forward, **eq_filter))
 
-        if eq_filter:
-            filterExpression = Attr('player_event_id').ne("")
-            for k, v in eq_filter.items():
-                if k == 'player_id':
-                    filterExpression = filterExpression & Attr('player_event_id').begins_with(v)
-                else:
-                    filterExpression = filterExpression & Attr(k).eq(v)
-            kwargs['FilterExpression'] = filterExpression
+
+    def iter_events_by_timestamp(self, game_id, projection=[], forward=False, since=None, **eq_filter):
+        """ Yields events ordered by timestamp. If since is given, only yields events with a timestamp at or after it """
+        kwargs = self.__timestamp_query(game_id, projection, forward, eq_filter)
+        if since is not None:
+            kwargs['KeyConditionExpression'] = kwargs['KeyConditionExpression'] & Key('timestamp').gte(since)
+        try:
+            yield from paginate(self.table.query, **kwargs)
+        except ClientError as err:
+            print(
+                "Couldn't get query events by timestampfrom game %s: %s: %s",
+                game_id,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+
+    def query_events_by_timestamp_page(self, game_id, limit, cursor=None, projection=[], forward=False, **eq_filter):
+        """ Returns (events, next_cursor) for one page of at most limit events starting after cursor """
+        kwargs = self.__timestamp_query(game_id, projection, forward, eq_filter)
+        try:
+            return page(self.table.query, limit, cursor, **kwargs)
+        except ClientError as err:
+            print(
+                "Couldn't get query events by timestampfrom game %s: %s: %s",
+                game_id,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+
+
+    def query_events_for_player(self, game_id, player_id, projection=[], forward=False):
+        """ Returns events of one player ordered by timestamp. Reads only that player's events
+            through a player_event_id prefix key condition """
+        events = list(self.iter_events_for_player(game_id, player_id, projection))
+        return sorted(events, key=lambda event: event['timestamp'], reverse=not forward)
+
+
+    def iter_events_for_player(self, game_id, player_id, projection=[]):
+        """ Yields events of one player in player_event_id order """
+        kwargs = {'KeyConditionExpression': Key('game_id').eq(game_id) & Key('player_event_id').begins_with(player_id)}
 
         if projection:
+            projection = set(projection) | {'timestamp', 'player_event_id'}
             kwargs['ProjectionExpression'] = ', '.join(map(lambda s : '#' + s, projection))
             kwargs['ExpressionAttributeNames'] = {f'#{s}': s for s in projection}
 
         try:
-            response = self.table.query(**kwargs)
+            for event in paginate(self.table.query, **kwargs):
+                # the prefix also matches the events of players whose id starts with player_id
+                if player_id_of(event['player_event_id']) == player_id:
+                    yield event
         except ClientError as err:
             print(
-                "Couldn't get query events by timestampfrom game %s: %s: %s",
-                game_id,
+                "Couldn't get events for player %s from game %s: %s: %s",
+                player_id, game_id,
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
-        else:
-            return response['Items']
+
+
+    def query_events_by_player(self, game_id, projection=[], forward=False):
+        """ Returns dict of player_id -> events ordered by timestamp for every player with events,
+            from a single pass over the game's events """
+        if projection:
+            projection = list(set(projection) | {'player_event_id'})
+        events_by_player = {}
+        for event in self.iter_events_by_timestamp(game_id, projection, forward):
+            events_by_player.setdefault(player_id_of(event['player_event_id']), []).append(event)
+        return events_by_player
 
 
     def query_events(self, game_id, projection=[]):
+        return list(self.iter_events(game_id, projection))
+
+
+    def iter_events(self, game_id, projection=[]):
         kwargs = {'KeyConditionExpression': Key('game_id').eq(game_id)}
 
         if projection:
@@ -110,13 +172,31 @@ class PlayerEvents:
             kwargs['ExpressionAttributeNames'] = {f'#{s}': s for s in projection}
 
         try:
-            response = self.table.query(**kwargs)
+            yield from paginate(self.table.query, **kwargs)
         except ClientError as err:
             print(
                 "Couldn't get event for game %s: %s: %s",
                 game_id,
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
-        else:
-            return response['Items']
 
+
+    def __timestamp_query(self, game_id, projection, forward, eq_filter):
+        kwargs = {'KeyConditionExpression': Key('game_id').eq(game_id),
+                  'IndexName': "timestamp-index",
+                  "ScanIndexForward": forward,
+                  "ConsistentRead": True}
+
+        if eq_filter:
+            filterExpression = Attr('player_event_id').ne("")
+            for k, v in eq_filter.items():
+                if k == 'player_id':
+                    filterExpression = filterExpression & Attr('player_event_id').begins_with(v)
+                else:
+                    filterExpression = filterExpression & Attr(k).eq(v)
+            kwargs['FilterExpression'] = filterExpression
+
+        if projection:
+            kwargs['ProjectionExpression'] = ', '.join(map(lambda s : '#' + s, projection))
+            kwargs['ExpressionAttributeNames'] = {f'#{s}': s for s in projection}
+        return kwargs
@@ -2,6 +2,16 @@ from uuid import uuid4
 from botocore.exceptions import ClientError
 from boto3.dynamodb.conditions import Key, Attr
 from decimal import Decimal
+from dynamodb.pagination import paginate
+
+def stale_modification_hash(err):
+    """ True if err, raised by Players.record_answer, is its failed modification_hash condition rather than
+        e.g. throttling or a transaction conflict """
+    code = err.response['Error']['Code']
+    if code == 'ConditionalCheckFailedException':
+        return True
+    return code == 'TransactionCanceledException' and any(
+        reason.get('Code') == 'ConditionalCheckFailed' for reason in err.response.get('CancellationReasons', []))
 
 def sanitize(item):
     if type(item) is list:
@@ -39,10 +49,10 @@ class Players:
             return self.table
 
 
-    def add_player(self, game_id, name, api):
+    def add_player(self, game_id, name, api, player_id=None):
         item = {
                     'game_id': game_id,
-                    'player_id': uuid4().hex[:8],
+                    'player_id': player_id or uuid4().hex[:8],
                     'name': name,
                     'api': api,
                     'active': True,
@@ -67,9 +77,9 @@ class Players:
         return item
 
 
-    def get_player(self, game_id, player_id):
+    def get_player(self, game_id, player_id, consistent=False):
         try:
-            response = self.table.get_item(Key={'game_id': game_id, 'player_id': player_id})
+            response = self.table.get_item(Key={'game_id': game_id, 'player_id': player_id}, ConsistentRead=consistent)
         except ClientError as err:
             print(
                 "Couldn't get player %s from game %s: %s: %s",
@@ -81,6 +91,10 @@ class Players:
 
 
     def query_players(self, game_id, projection=[], **eq_filter):
+        return list(self.iter_players(game_id, projection, **eq_filter))
+
+
+    def iter_players(self, game_id, projection=[], **eq_filter):
         kwargs = {'KeyConditionExpression': Key('game_id').eq(game_id)}
 
         if eq_filter:
@@ -94,14 +108,12 @@ class Players:
             kwargs['ExpressionAttributeNames'] = {f'#{s}': s for s in projection}
         
         try:
-            response = self.table.query(**kwargs)
+            yield from paginate(self.table.query, **kwargs)
         except ClientError as err:
             print(
                 "Couldn't query for players from %s: %s: %s", game_id,
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
-        else:
-            return response['Items']
 
 
     # def query_players_id(self, game_id):
@@ -119,6 +131,10 @@ class Players:
     #         return response['Items']
 
     def query_players_by_score(self, game_id, projection=[], forward=False, **eq_filter):
+        return list(self.iter_players_by_score(game_id, projection, forward, **eq_filter))
+
+
+    def iter_players_by_score(self, game_id, projection=[], forward=False, **eq_filter):
         kwargs = {'KeyConditionExpression': Key('game_id').eq(game_id),
                   'IndexName': "score-index",
                   "ScanIndexForward": forward,
@@ -135,14 +151,12 @@ class Players:
             kwargs['ExpressionAttributeNames'] = {f'#{s}': s for s in projection}
         
         try:
-            response = self.table.query(**kwargs)
+            yield from paginate(self.table.query, **kwargs)
         except ClientError as err:
             print(
                 "Couldn't query for players from %s: %s: %s", game_id,
                 err.response['Error']['Code'], err.response['Error']['Message'])
             raise
-        else:
-            return response['Items']
 
 
     def validate_modification_hash(self, game_id, player_id, modification_hash):
@@ -207,9 +221,43 @@ class Players:
             return response['Attributes']
 
 
+    def record_answer(self, game_id, player_id, modification_hash, new_modification_hash, points_gained,
+                      increment=[], event=None, event_table='player_events', **attribute):
+        """ Applies the result of one answered question in a single conditional write: rotates
+            modification_hash, adds points_gained to score, increments the `increment` counters and sets
+            `attribute`. Fails with ConditionalCheckFailedException (TransactionCanceledException when
+            an event is given) if modification_hash is stale. If event is given, it is put in
+            event_table in the same transaction """
+        attribute['modification_hash'] = new_modification_hash
+        expression_values = {f':{k}': v for k, v in attribute.items() }
+        expression_names_values = [f'#{k} = :{k}' for k in attribute.keys() ]
+        expression_names = {f'#{k}' : k for k in attribute.keys() }
+        expression_names_values.append('#score = #score + :points_gained')
+        expression_names['#score'] = 'score'
+        expression_values[':points_gained'] = Decimal(str(points_gained))
+        expression_values[':prev_hash'] = modification_hash
+        if increment:
+            expression_names_values.extend(map(lambda x: f'{x} = {x} + :one', increment))
+            expression_values[':one'] = 1
 
-
-    
-
-
-    
\ No newline at end of file
+        update = {
+            'Key': {'game_id': game_id, 'player_id': player_id},
+            'UpdateExpression': 'set ' + ",".join(expression_names_values),
+            'ConditionExpression': "#prev_hash = :prev_hash",
+            'ExpressionAttributeValues': expression_values,
+            'ExpressionAttributeNames': expression_names | {'#prev_hash': 'modification_hash'},
+        }
+        try:
+            if event is None:
+                self.table.update_item(**update)
+            else:
+                self.dyn_resource.meta.client.transact_write_items(TransactItems=[
+                    {'Update': {'TableName': self.table.name, **update}},
+                    {'Put': {'TableName': event_table, 'Item': event}},
+                ])
+        except ClientError as err:
+            print(
+                "Couldn't record answer for game %s and player %s: %s: %s",
+                game_id, player_id,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
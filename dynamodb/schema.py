@@ -0,0 +1,93 @@
+# create_table arguments of every table, as deployed. Used to create the tables of local stand-ins
+# such as the in-memory backend (shared.memory_backend) or DynamoDB Local
+
+TABLES = [
+    {
+        'TableName': 'games',
+        'KeySchema': [
+            {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'game_id', 'AttributeType': 'S'},
+        ],
+        'BillingMode': 'PAY_PER_REQUEST',
+    },
+    {
+        'TableName': 'players',
+        'KeySchema': [
+            {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'player_id', 'KeyType': 'RANGE'},
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'game_id', 'AttributeType': 'S'},
+            {'AttributeName': 'player_id', 'AttributeType': 'S'},
+            {'AttributeName': 'score', 'AttributeType': 'N'},
+        ],
+        # local index, as it is queried with ConsistentRead
+        'LocalSecondaryIndexes': [{
+            'IndexName': 'score-index',
+            'KeySchema': [
+                {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'score', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        'BillingMode': 'PAY_PER_REQUEST',
+    },
+    {
+        'TableName': 'player_events',
+        'KeySchema': [
+            {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'player_event_id', 'KeyType': 'RANGE'},
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'game_id', 'AttributeType': 'S'},
+            {'AttributeName': 'player_event_id', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+        ],
+        # local index, as it is queried with ConsistentRead
+        'LocalSecondaryIndexes': [{
+            'IndexName': 'timestamp-index',
+            'KeySchema': [
+                {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestamp', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        'BillingMode': 'PAY_PER_REQUEST',
+    },
+    {
+        'TableName': 'game_events',
+        'KeySchema': [
+            {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'},
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'game_id', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+        ],
+        'BillingMode': 'PAY_PER_REQUEST',
+    },
+    {
+        'TableName': 'latency_metrics',
+        'KeySchema': [
+            {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'source', 'KeyType': 'RANGE'},
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'game_id', 'AttributeType': 'S'},
+            {'AttributeName': 'source', 'AttributeType': 'S'},
+        ],
+        'BillingMode': 'PAY_PER_REQUEST',
+    },
+    {
+        'TableName': 'leaderboard_snapshots',
+        'KeySchema': [
+            {'AttributeName': 'game_id', 'KeyType': 'HASH'},
+        ],
+        'AttributeDefinitions': [
+            {'AttributeName': 'game_id', 'AttributeType': 'S'},
+        ],
+        'BillingMode': 'PAY_PER_REQUEST',
+    },
+]
@@ -6,17 +6,25 @@ from flask import (
     url_for,
     send_from_directory,
     session,
+    Response,
+    stream_with_context,
 )
 from shared.games_manager import GamesManager
-import threading
+from shared import aws, metrics
+from dynamodb.pagination import parse_page
+from shared.running_totals import validate_timestamp
+from flaskr.game_stream import GameStreams
 import secrets
 from random import randint
 from flaskr.json_sanitizer import JSONSanitizer
 import os
+import time
 
 # PRODUCTION CONSTANT(S)
 QUESTION_TIMEOUT = 10
 QUESTION_DELAY = 5
+# Bots of /api/bot have ids 0 to MAX_BOTS - 1, so clients can't grow the server's memory without limit
+MAX_BOTS = 1000
 
 # HTTP CODES
 ALL_GOOD = 200
@@ -40,7 +48,42 @@ def create_app():
     app.config["SECRET_KEY"] = secrets.token_hex()
     app.json_encoder = JSONSanitizer
 
-    games_manager = GamesManager()
+    # The app's DynamoDB client is its own, so its metrics handlers don't see (or ask for the consumed
+    # capacity of) the calls of a QuizMaster or GameMonitor running in the same process
+    dynamodb = aws.new_resource('dynamodb')
+    games_manager = GamesManager(dynamodb=dynamodb)
+    game_streams = GameStreams(games_manager)
+
+    # Request, GamesManager, DynamoDB, GameCache and queue metrics of this app, see shared.metrics
+    registry = metrics.Registry()
+    metrics.instrument_methods(games_manager, registry, "games_manager")
+    metrics.instrument_dynamodb(dynamodb.meta.client, registry)
+    metrics.instrument_game_cache(registry)
+    metrics.instrument_queues(registry, ["administer_question_tasks", "game_monitor_tasks"])
+    app.config["METRICS"] = registry
+
+    requests_total = registry.counter("http_requests_total", "HTTP requests", ["route", "method", "status"])
+    request_duration = registry.histogram("http_request_duration_seconds", "Duration of HTTP requests",
+                                          ["route", "method"])
+
+    @app.before_request
+    def start_request_timer():
+        request.environ["metrics.start"] = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        # routes are labelled by their rule, not their path, so game ids don't make a label each.
+        # Streams are counted when they start
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        requests_total.inc(route=route, method=request.method, status=response.status_code)
+        start = request.environ.get("metrics.start")
+        if start is not None:
+            request_duration.observe(time.perf_counter() - start, route=route, method=request.method)
+        return response
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return Response(registry.exposition(), content_type=metrics.CONTENT_TYPE)
 
 
     # This is a catch-all function that will redirect anything not caught by the other rules
@@ -175,7 +218,35 @@ def create_app():
         if not games_manager.game_exists(game_id):
             return NOT_ACCEPTABLE
 
-        return games_manager.get_game_running_totals(game_id)
+        try:
+            limit, cursor = get_page(request)
+            since = validate_timestamp(request.args.get("since"))
+        except ValueError as err:
+            return (str(err), FAULTY_REQUEST)
+        return games_manager.get_game_running_totals(game_id, limit, cursor, since=since)
+
+
+    # Server-sent events of game, round, leaderboard, scores, player_events and game_events changes.
+    # All viewers of a game share a single producer reading the game
+    @app.get("/api/<game_id>/stream")
+    def game_stream(game_id):
+        if not games_manager.game_exists(game_id):
+            return NOT_ACCEPTABLE
+
+        return Response(
+            stream_with_context(game_streams.events(game_id)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+
+    # Latency of every step of the game's questions and of every player's server, see shared.latency
+    @app.get("/api/<game_id>/metrics")
+    def game_metrics(game_id):
+        if not games_manager.game_exists(game_id):
+            return NOT_ACCEPTABLE
+
+        return games_manager.get_latency_metrics(game_id)
 
 
     # Managing all players
@@ -293,7 +364,11 @@ def create_app():
     def final_game_graph(game_id):
         if not games_manager.game_exists(game_id):
             return ("Game id not found", NOT_FOUND)
-        return games_manager.get_game_running_totals(game_id)
+        try:
+            limit, cursor = get_page(request)
+        except ValueError as err:
+            return (str(err), FAULTY_REQUEST)
+        return games_manager.get_game_running_totals(game_id, limit, cursor)
 
     @app.get("/api/<game_id>/review/stats")
     def review_stats(game_id):
@@ -305,7 +380,11 @@ def create_app():
     def review_analysis(game_id):
         if not games_manager.game_exists(game_id):
             return ("Game id not found", NOT_FOUND)
-        return games_manager.review_analysis(game_id)
+        try:
+            limit, cursor = get_page(request)
+        except ValueError as err:
+            return (str(err), FAULTY_REQUEST)
+        return games_manager.review_analysis(game_id, limit, cursor)
 
 
 
@@ -315,50 +394,39 @@ def create_app():
 
 
     # FORGIVE ME
-    bot_responses = {n: [f"Bot{n}", 0] for n in range(100)}
+    # Up to MAX_BOTS bots, created on first use. Use auxiliary/load_test.py to load test a game
+    bot_responses = {}
+    BOT_NOT_FOUND = ("Bot id not found", NOT_FOUND)
+
+    def bot_response(bot_id):
+        """ Returns [response, updates] of bot, None if bot_id is out of bounds """
+        if bot_id >= MAX_BOTS:
+            return None
+        return bot_responses.setdefault(bot_id, [f"Bot{bot_id}", 0])
 
     # /2/hi  style links, these update the response
     @app.route("/api/bot/<int:bot_id>/<string:resp>", methods=["GET"])
     def _update_response(bot_id, resp):
-        bot_responses[bot_id][0] = resp
-        bot_responses[bot_id][1] += 1
+        response = bot_response(bot_id)
+        if response is None:
+            return BOT_NOT_FOUND
+        response[0] = resp
+        response[1] += 1
         return redirect(url_for("_api_response", bot_id=bot_id))
 
     # Get a response
     @app.route("/api/bot/<int:bot_id>", methods=["GET"])
     def _api_response(bot_id):
-        if bot_responses[bot_id][0] == "cheat":
+        response = bot_response(bot_id)
+        if response is None:
+            return BOT_NOT_FOUND
+        if response[0] == "cheat":
             return "cheat"
         if randint(0, max(bot_id - 5, 0)) == 0:
-            return bot_responses[bot_id][0]
+            return response[0]
         else:
             return "Wrong response"
 
-    @app.route("/api/bot/ddos/<game_id>", methods=["GET"])
-    def _spam_with_bots(game_id):
-        for i in range(20):
-            player = Player(
-                game_id, f"Bot{i}", api=f"http://localhost:5000/api/bot/{i}"
-            )
-
-            games[game_id].new_player(player.uuid)
-            scoreboards[game_id].new_player(player)
-            players[player.uuid] = player
-
-            quiz_master = QuizMaster(
-                player,
-                games[game_id].question_factory,
-                scoreboards[game_id],
-                games[game_id].pause_rlock,
-            )
-
-            player_thread = threading.Thread(
-                target=quiz_master.start,
-                args=(games[game_id].first_round_event, games[game_id].running),
-            )
-            player_thread.daemon = True  # for test termination
-            player_thread.start()
-
     @app.route("/api/bot/", methods=["GET"])
     def _main_view():
         return "<br>".join(list(str(x) for x in bot_responses.values()))
@@ -387,6 +455,11 @@ def create_app():
     def is_player(player_id, session):
         return ("player" in session) and (player_id in session["player"])
 
+    # Paging query parameters: ?limit=<page size>&cursor=<cursor returned with previous page>.
+    # Raises ValueError if either is invalid
+    def get_page(request):
+        return parse_page(request.args.get("limit"), request.args.get("cursor"))
+
     def get_player(session):
         if "player" in session:
             return True, session["player"]
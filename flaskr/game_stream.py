@@ -0,0 +1,235 @@
+from flaskr.json_sanitizer import JSONSanitizer
+from shared.running_totals import SETTLE_TIME, parse_timestamp, format_timestamp
+from queue import Queue, Empty, Full
+import threading
+import json
+
+# Seconds between two reads of a game by its producer
+STREAM_INTERVAL = 1
+# Seconds without changes after which a comment is sent to keep the connection open
+KEEPALIVE_INTERVAL = 15
+# Messages a viewer can fall behind before it is disconnected
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Game attributes whose change is pushed to viewers
+GAME_FIELDS = ['round', 'running', 'ended', 'auto_mode', 'players', 'players_to_assist', 'max_round']
+
+
+class GameStream:
+    """
+    Single producer of one game's server-sent events. The producer thread reads the game once per
+    STREAM_INTERVAL and fans the changes out to every subscribed viewer, so the upstream reads
+    don't grow with the number of viewers. The thread stops once the last viewer unsubscribes.
+    """
+
+    def __init__(self, games_manager, game_id, interval=STREAM_INTERVAL):
+        self.games_manager = games_manager
+        self.game_id = game_id
+        self.interval = interval
+        self.lock = threading.Lock()
+        # held for a whole poll, so a stopped thread finishes its poll before the next thread starts one
+        self.poll_lock = threading.Lock()
+        self.subscribers = set()
+        self.thread = None
+        self.stopped = None
+
+        # last state sent to viewers, replayed to new viewers when they subscribe
+        self.game = None
+        self.leaderboard = {}       # player_id -> {"player_id", "name", "score"}
+
+        # only changes after the first poll are streamed, earlier history is read from the REST endpoints
+        self.started = False
+        self.scores_since = None    # time of the newest score bucket
+        self.scores = {}            # time -> last bucket sent, from scores_since
+        # buffered events are written late with earlier timestamps, so the SETTLE_TIME before the newest
+        # event is read again on every poll
+        self.player_events_since = None     # timestamp of the newest event
+        self.player_events_seen = {}        # player_event_id -> timestamp, of the events in the settle window
+        self.game_events_since = None
+        self.game_events_seen = set()       # (title, player_id) at game_events_since
+
+    def subscribe(self):
+        """ Returns a queue of (event, data) messages for a new viewer """
+        queue = Queue(SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            if self.game is not None:
+                queue.put(("game", self.game))
+                queue.put(("leaderboard", {"updated": list(self.leaderboard.values()), "removed": []}))
+            self.subscribers.add(queue)
+            if self.thread is None:
+                self.stopped = threading.Event()
+                self.thread = threading.Thread(target=self.run, args=(self.stopped,), daemon=True)
+                self.thread.start()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            self.subscribers.discard(queue)
+            if not self.subscribers and self.thread is not None:
+                self.stopped.set()
+                self.thread = None
+
+    def publish(self, event, data):
+        with self.lock:
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait((event, data))
+                except Full:
+                    # viewer stopped reading, drop it rather than buffer without bound
+                    self.subscribers.discard(queue)
+
+    def is_subscribed(self, queue):
+        with self.lock:
+            return queue in self.subscribers
+
+    def run(self, stopped):
+        while not stopped.is_set():
+            with self.poll_lock:
+                # a thread stopped while waiting for the lock leaves the state to the thread that replaced it
+                if stopped.is_set():
+                    return
+                try:
+                    self.poll()
+                except Exception as err:
+                    print("Couldn't poll game stream for", self.game_id, err)
+            stopped.wait(self.interval)
+
+    def poll(self):
+        """ Reads the game once and publishes what changed since the previous poll """
+        game = self.games_manager.get_game(self.game_id)
+        game = {field: game[field] for field in GAME_FIELDS if field in game}
+        if self.game is None or game['round'] != self.game['round']:
+            self.publish("round", {"round": game['round']})
+        if game != self.game:
+            self.game = game
+            self.publish("game", game)
+
+        self.poll_leaderboard()
+
+        if not self.started:
+            self.skip_history()
+            self.started = True
+            return
+
+        self.poll_scores()
+        self.poll_player_events()
+        self.poll_game_events()
+
+    def skip_history(self):
+        """ Moves the scores, player_events and game_events cursors to the newest items """
+        scores = self.games_manager.get_game_running_totals(self.game_id, since=self.scores_since)
+        if scores:
+            self.scores_since = scores[-1]['time']
+            self.scores = {bucket['time']: bucket for bucket in scores if bucket['time'] >= self.scores_since}
+
+        events, _ = self.games_manager.player_events.query_events_by_timestamp_page(self.game_id, 1)
+        if events:
+            self.player_events_since = events[0]['timestamp']
+            for event in self.games_manager.player_events.iter_events_by_timestamp(
+                    self.game_id, ['player_event_id', 'timestamp'], forward=True, since=self.settle_start()):
+                self.player_events_seen[event['player_event_id']] = event['timestamp']
+
+        events, _ = self.games_manager.game_events.query_game_events_by_timestamp_page(self.game_id, 1)
+        if events:
+            self.game_events_since = events[0]['timestamp']
+            self.game_events_seen = {(events[0]['title'], events[0]['player_id'])}
+
+    def poll_leaderboard(self):
+        players = self.games_manager.players.query_players_by_score(
+            self.game_id, ['player_id', 'name', 'score'], active=True)
+        leaderboard = {player['player_id']: player for player in players}
+        updated = [player for pid, player in leaderboard.items() if self.leaderboard.get(pid) != player]
+        removed = [pid for pid in self.leaderboard if pid not in leaderboard]
+        self.leaderboard = leaderboard
+        if updated or removed:
+            self.publish("leaderboard", {"updated": updated, "removed": removed})
+
+    def poll_scores(self):
+        """ Publishes the score buckets that are new or changed since the previous poll """
+        scores = self.games_manager.get_game_running_totals(self.game_id, since=self.scores_since)
+        # the bucket at scores_since is always returned, it's only sent again if it changed
+        changed = [bucket for bucket in scores if self.scores.get(bucket['time']) != bucket]
+        if changed:
+            self.scores_since = scores[-1]['time']
+            self.scores = {bucket['time']: bucket for bucket in scores if bucket['time'] >= self.scores_since}
+            self.publish("scores", changed)
+
+    def settle_start(self):
+        """ Returns the timestamp from which player events are read again, SETTLE_TIME before the newest """
+        if self.player_events_since is None:
+            return None
+        return format_timestamp(parse_timestamp(self.player_events_since) - SETTLE_TIME)
+
+    def poll_player_events(self):
+        events = self.games_manager.player_events.iter_events_by_timestamp(
+            self.game_id, forward=True, since=self.settle_start())
+        new_events = []
+        for event in events:
+            # events of the settle window are read again
+            if event['player_event_id'] in self.player_events_seen:
+                continue
+            self.player_events_seen[event['player_event_id']] = event['timestamp']
+            if self.player_events_since is None or event['timestamp'] > self.player_events_since:
+                self.player_events_since = event['timestamp']
+            new_events.append(event)
+        if new_events:
+            settle_start = self.settle_start()
+            self.player_events_seen = {
+                event_id: timestamp for event_id, timestamp in self.player_events_seen.items() if timestamp >= settle_start
+            }
+            self.publish("player_events", new_events)
+
+    def poll_game_events(self):
+        events = self.games_manager.game_events.iter_game_events_by_timestamp(
+            self.game_id, forward=True, since=self.game_events_since)
+        new_events = []
+        for event in events:
+            key = (event['title'], event['player_id'])
+            if event['timestamp'] == self.game_events_since and key in self.game_events_seen:
+                continue
+            if event['timestamp'] != self.game_events_since:
+                self.game_events_since = event['timestamp']
+                self.game_events_seen = set()
+            self.game_events_seen.add(key)
+            new_events.append(event)
+        if new_events:
+            self.publish("game_events", new_events)
+
+
+class GameStreams:
+    """ One GameStream per game, shared by all its viewers """
+
+    def __init__(self, games_manager, interval=STREAM_INTERVAL):
+        self.games_manager = games_manager
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.streams = {}
+
+    def stream(self, game_id):
+        with self.lock:
+            if game_id not in self.streams:
+                self.streams[game_id] = GameStream(self.games_manager, game_id, self.interval)
+            return self.streams[game_id]
+
+    def events(self, game_id, keepalive=KEEPALIVE_INTERVAL):
+        """ Yields the server-sent events of game_id for one viewer until the viewer disconnects """
+        stream = self.stream(game_id)
+        queue = stream.subscribe()
+        try:
+            while True:
+                try:
+                    event, data = queue.get(timeout=keepalive)
+                except Empty:
+                    if not stream.is_subscribed(queue):
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_event(event, data)
+                if event == "game" and data.get('ended'):
+                    return
+        finally:
+            stream.unsubscribe(queue)
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, cls=JSONSanitizer)}\n\n"
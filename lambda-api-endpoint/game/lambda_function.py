@@ -1,9 +1,14 @@
 import json
 from request_response import *
 from shared.games_manager import GamesManager
+from shared import aws
 
+# Reused across invocations of a warm Lambda
+games_manager = GamesManager()
+
+
+@aws.report_cold_start("game")
 def lambda_handler(event, context):
-    games_manager = GamesManager()
     req = RequestRespond(event)
     game_id = req.params['game_id']
     
@@ -0,0 +1,18 @@
+import json
+from request_response import *
+from shared.games_manager import GamesManager
+from shared import aws
+
+# Reused across invocations of a warm Lambda
+games_manager = GamesManager()
+
+
+@aws.report_cold_start("game_metrics")
+def lambda_handler(event, context):
+    req = RequestRespond(event)
+    game_id = req.params['game_id']
+
+    if not games_manager.game_exists(game_id):
+        return NOT_ACCEPTABLE
+
+    return req.make_response(games_manager.get_latency_metrics(game_id))
@@ -1,13 +1,25 @@
 import json
 from request_response import *
 from shared.games_manager import GamesManager
+from shared.running_totals import validate_timestamp
+from shared import aws
 
+# Reused across invocations of a warm Lambda
+games_manager = GamesManager()
+
+
+@aws.report_cold_start("game_scores")
 def lambda_handler(event, context):
     req = RequestRespond(event)
-    games_manager = GamesManager()
     game_id = req.params['game_id']
     
     if not games_manager.game_exists(game_id):
         return NOT_ACCEPTABLE
 
-    return games_manager.get_game_running_totals(game_id)
+    try:
+        limit, cursor = req.get_page()
+        since = validate_timestamp(req.query.get('since'))
+    except ValueError as err:
+        print(err)
+        return BAD_REQUEST
+    return games_manager.get_game_running_totals(game_id, limit, cursor, since=since)
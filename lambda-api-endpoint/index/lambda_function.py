@@ -1,10 +1,15 @@
 import json
 from shared.games_manager import GamesManager
 from request_response import *
+from shared import aws
 
+# Reused across invocations of a warm Lambda
+games_manager = GamesManager()
+
+
+@aws.report_cold_start("index")
 def lambda_handler(event, context):
     req = RequestRespond(event)
-    games_manager = GamesManager()
     
     if req.method == "GET":
         return req.make_response(games_manager.get_all_games())
@@ -1,10 +1,15 @@
 import json
 from shared.games_manager import GamesManager
 from request_response import *
+from shared import aws
 
+# Reused across invocations of a warm Lambda
+games_manager = GamesManager()
+
+
+@aws.report_cold_start("player_event")
 def lambda_handler(event, context):
     req = RequestRespond(event)
-    games_manager = GamesManager()
     game_id = req.params['game_id']
     player_id = req.params['player_id']
     event_id = req.params['event_id']
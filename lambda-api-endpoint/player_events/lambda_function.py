@@ -1,12 +1,15 @@
 import json
 from shared.games_manager import GamesManager
 from request_response import *
+from shared import aws
 
-## NOT WORKING: "'PlayerEvents' object has no attribute 'query_events_for_player'"
+# Reused across invocations of a warm Lambda
+games_manager = GamesManager()
 
+
+@aws.report_cold_start("player_events")
 def lambda_handler(event, context):
     req = RequestRespond(event)
-    games_manager = GamesManager()
     game_id = req.params['game_id']
     player_id = req.params['player_id']
     
@@ -1,12 +1,22 @@
 import json
 from shared.games_manager import GamesManager
 from request_response import *
+from shared import aws
 
+# Reused across invocations of a warm Lambda
+games_manager = GamesManager()
+
+
+@aws.report_cold_start("review_analysis")
 def lambda_handler(event, context):
     req = RequestRespond(event)
-    games_manager = GamesManager()
     game_id = req.params['game_id']
     
     if not games_manager.game_exists(game_id):
         return ("Game id not found", NOT_FOUND)
-    return games_manager.review_analysis(game_id)
+    try:
+        limit, cursor = req.get_page()
+    except ValueError as err:
+        print(err)
+        return BAD_REQUEST
+    return games_manager.review_analysis(game_id, limit, cursor)
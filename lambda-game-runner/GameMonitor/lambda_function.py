@@ -1,21 +1,29 @@
-import json
 from game_monitor import GameMonitor
+from concurrent.futures import ThreadPoolExecutor
+import json
+from shared import aws
 
+# Reused across invocations of a warm Lambda, so tables and the queue URL are only set up once per process
+game_monitor = GameMonitor()
+executor = ThreadPoolExecutor(max_workers=10)
+
+@aws.report_cold_start("GameMonitor")
 def lambda_handler(event, context):
-    for record in event['Records']:
-        payload = json.loads(record['body'])
-        game_id = payload['game_id']
-        if payload['type'] == 'START_GAME':
-            print("Running START_GAME monitor for: ", game_id)
-            GameMonitor().start(game_id, payload['modification_hash'])
-        elif payload['type'] == 'AUTO_INCREMENT':
-            print("Running AUTO_INCREMENT monitor for: ", game_id)
-            GameMonitor().increment_round_monitor(game_id, payload['modification_hash'])
-        elif payload['type'] == 'EPIC_COMEBACK':
-            print("Running EPIC_COMEBACK monitor for: ", game_id)
-            GameMonitor().comeback_monitor(game_id, payload['potential_players'], payload['transition_players'])
-        elif payload['type'] == 'NEW_LEADER':
-            print("Running NEW_LEADER monitor for: ", game_id)
-            GameMonitor().new_leader_monitor(game_id, payload['prev_leader'], payload['curr_leader'], payload['time_in'])
-        else:
-            raise f"Unknown Payload type: {payload['type']}"
\ No newline at end of file
+    """ Runs every record in the batch concurrently. Returns the records that failed as
+        batchItemFailures, so only those are retried """
+    def handle(record):
+        try:
+            payload = json.loads(record['body'])
+        except ValueError as err:
+            # would fail on every delivery, so it isn't reported and is deleted with the batch
+            print("Invalid monitor task, dropped: ", record['body'], err)
+            return None
+        try:
+            game_monitor.handle_task(payload)
+            return None
+        except Exception as err:
+            print("Couldn't run monitor task", record['body'], err)
+            return record['messageId']
+
+    failures = [message_id for message_id in executor.map(handle, event['Records']) if message_id is not None]
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
@@ -1,14 +1,42 @@
 from shared.quiz_master import QuizMaster
+from shared.rate_controller import DEFAULT_DELAY
+from concurrent.futures import ThreadPoolExecutor
 import json
+from shared import aws
 
-def lambda_handler(event, context): 
+# Reused across invocations of a warm Lambda, so tables and queue URLs are only set up once per process
+quiz_master = QuizMaster()
+executor = ThreadPoolExecutor(max_workers=10)
+
+@aws.report_cold_start("QuizMaster")
+def lambda_handler(event, context):
+    """ Administers the questions of every record in the batch, one concurrent batch per game.
+        Returns the records that failed as batchItemFailures, so only those are retried. Malformed
+        records can't succeed and aren't reported. The latency histograms of the batch are written before
+        returning """
+    failures = []
+    games = {}
     for record in event['Records']:
-        payload = json.loads(record['body'])
-        print("Reaceive administering Question task for: ", payload )
-        if 'prev_delay' in payload:
-            QuizMaster().administer_question(payload["game_id"],
-                payload["player_id"], payload["modification_hash"], payload['prev_delay'])
-        else:
-            QuizMaster().administer_question(payload["game_id"],
-                payload["player_id"], payload["modification_hash"])
-        return "DONE"
\ No newline at end of file
+        try:
+            payload = json.loads(record['body'])
+            task = (payload["player_id"], payload["modification_hash"], payload.get('prev_delay', DEFAULT_DELAY))
+            games.setdefault(payload["game_id"], []).append((record['messageId'], task))
+        except (ValueError, KeyError) as err:
+            # would fail on every delivery, so it isn't reported and is deleted with the batch
+            print("Invalid administering Question task, dropped: ", record['body'], err)
+
+    def administer(game_id, records):
+        print("Receive administering Question tasks for: ", game_id, len(records))
+        try:
+            quiz_master.administer_questions(game_id, [task for _, task in records])
+            return []
+        except Exception as err:
+            print("Couldn't administer questions of game", game_id, err)
+            return [message_id for message_id, _ in records]
+
+    for failed in executor.map(lambda game: administer(*game), games.items()):
+        failures.extend(failed)
+    # a frozen or recycled container never flushes again, so the histograms are written with every batch
+    quiz_master.flush_events(force=True)
+
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
@@ -1,11 +1,13 @@
 import base64
 import json
 from decimal import Decimal
+from dynamodb.pagination import parse_page
 
 NOT_ACCEPTABLE = {'statusCode': 406, 'body': "Unacceptable request - Requested resource not found"}
 DELETE_SUCCESSFUL = {'statusCode': 204, 'body': "Successfully deleted"}
 METHOD_NOT_ALLOWED = {'statusCode': 405, 'body': "Method Not Allowed"}
 UNAUTHORIZED = {'statusCode': 401, 'body': "Unauthenticated request"}
+BAD_REQUEST = {'statusCode': 400, 'body': "Bad request - Invalid query parameters"}
 
 class RequestRespond:
     def __init__(self, payload):
@@ -14,6 +16,7 @@ class RequestRespond:
             self.body = json.loads(payload['body'])
         if 'pathParameters' in payload:
             self.params = payload['pathParameters']
+        self.query = payload.get('queryStringParameters') or {}
         req_session = None
         if 'cookies' in payload:
             req_session = next((x[len('session='):] for x in payload['cookies'] if x.startswith('session=')), None)
@@ -53,6 +56,10 @@ class RequestRespond:
     def is_player(self, player_id):
         return ("player" in self.req_session)
 
+    def get_page(self):
+        """ Returns (limit, cursor) paging query parameters, raises ValueError if either is invalid """
+        return parse_page(self.query.get('limit'), self.query.get('cursor'))
+
     def get_player(self):
         if "player" in self.req_session:
             return True, self.req_session["player"]
@@ -0,0 +1,161 @@
+from botocore.exceptions import ClientError
+import functools
+import threading
+import boto3
+import json
+import os
+import time
+
+# Process-wide boto3 resources, clients and resolved queue URLs, created on first use and reused by
+# every GamesManager/QuizMaster/GameMonitor so warm Lambda invocations make no control-plane calls
+
+# Backend of every resource and client: "aws" (boto3) or "memory" (shared.memory_backend, no network)
+BACKEND_ENV = 'EXTREME_STARTUP_BACKEND'
+
+_lock = threading.RLock()
+_resources = {}
+_clients = {}
+_queue_urls = {}
+
+# Max entries of one SendMessageBatch call
+SEND_BATCH_LIMIT = 10
+
+# SQS control-plane calls (get_queue_url/create_queue) made by this process
+control_plane_calls = 0
+
+# Fallback start of the process where /proc isn't available
+_imported_at = time.perf_counter()
+
+
+def backend():
+    """ Returns the module resources and clients are created with, both have boto3's resource()/client() interface """
+    if os.environ.get(BACKEND_ENV, 'aws') == 'memory':
+        from shared import memory_backend
+        return memory_backend
+    return boto3
+
+
+def reset():
+    """ Drops the process-wide resources, clients and queue URLs, e.g. after switching backend """
+    global control_plane_calls
+    with _lock:
+        _resources.clear()
+        _clients.clear()
+        _queue_urls.clear()
+        control_plane_calls = 0
+
+
+def resource(service_name):
+    if service_name not in _resources:
+        # boto3's default session isn't thread-safe, so resources and clients are created under a lock
+        with _lock:
+            if service_name not in _resources:
+                _resources[service_name] = backend().resource(service_name)
+    return _resources[service_name]
+
+
+def client(service_name):
+    if service_name not in _clients:
+        with _lock:
+            if service_name not in _clients:
+                _clients[service_name] = backend().client(service_name)
+    return _clients[service_name]
+
+
+def dynamodb():
+    return resource('dynamodb')
+
+
+def new_resource(service_name):
+    """ Returns a resource with a client of its own, not shared with the process, e.g. to register event
+        handlers (metrics) that only see the calls of one component """
+    with _lock:
+        return backend().resource(service_name)
+
+
+def queue_url(queue_name):
+    """ Returns the URL of queue_name, creating the queue if it doesn't exist. Resolved once per process """
+    global control_plane_calls
+    if queue_name not in _queue_urls:
+        with _lock:
+            if queue_name not in _queue_urls:
+                sqs = client('sqs')
+                control_plane_calls += 1
+                try:
+                    url = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+                except ClientError as err:
+                    if err.response['Error']['Code'] != 'AWS.SimpleQueueService.NonExistentQueue':
+                        raise
+                    control_plane_calls += 1
+                    url = sqs.create_queue(QueueName=queue_name)['QueueUrl']
+                _queue_urls[queue_name] = url
+    return _queue_urls[queue_name]
+
+
+def queue(queue_name):
+    """ Returns an SQS Queue resource of queue_name. Building it makes no call once the URL is resolved """
+    return resource('sqs').Queue(queue_url(queue_name))
+
+
+def send_messages(queue_name, payloads, delay=0):
+    """ Sends every payload to queue_name as JSON with SendMessageBatch, in groups of SEND_BATCH_LIMIT.
+        Returns the payloads which couldn't be sent """
+    sqs = client('sqs')
+    url = queue_url(queue_name)
+    failed = []
+    for i in range(0, len(payloads), SEND_BATCH_LIMIT):
+        batch = payloads[i:i + SEND_BATCH_LIMIT]
+        try:
+            response = sqs.send_message_batch(QueueUrl=url, Entries=[
+                {'Id': str(j), 'MessageBody': json.dumps(payload), 'DelaySeconds': delay}
+                for j, payload in enumerate(batch)
+            ])
+        except ClientError as err:
+            print(
+                "Couldn't send messages to queue %s: %s: %s", queue_name,
+                err.response['Error']['Code'], err.response['Error']['Message'])
+            raise
+        for failure in response.get('Failed', []):
+            print("Couldn't send message to queue", queue_name, failure)
+            failed.append(batch[int(failure['Id'])])
+    return failed
+
+
+def process_uptime():
+    """ Returns the seconds since the process started, read from /proc on Linux (as on Lambda), otherwise
+        the seconds since this module was imported """
+    try:
+        with open("/proc/self/stat") as f:
+            # starttime is the 22nd field, counted after the command name, which may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _imported_at
+
+
+def report_cold_start(name):
+    """ Decorates the handler of a Lambda to log its cold start once, after the first invocation: the time (in ms)
+        from the start of the process until the handler was defined, and the control-plane calls made by the end
+        of the first invocation, as queue URLs are only resolved on first use """
+    init_ms = round(process_uptime() * 1000, 1)
+
+    def decorator(handler):
+        reported = False
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            nonlocal reported
+            try:
+                return handler(event, context)
+            finally:
+                if not reported:
+                    reported = True
+                    print(json.dumps({
+                        "cold_start": name,
+                        "init_ms": init_ms,
+                        "control_plane_calls": control_plane_calls,
+                    }))
+        return wrapper
+    return decorator
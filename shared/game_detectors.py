@@ -0,0 +1,235 @@
+from shared.question_factory import MAX_ROUND
+
+INCREMENT_ROUND_RATIO_THESHOLD = 0.4
+LEADER_ESTABLISHED_DURATION_REQUIRED = 15
+LAST_PLAYER_ESTABLISHED_DURATION_REQUIRED = 15
+EPIC_COMEBACK_DURATION_REQUIRED = 5
+EPIC_FAIL_DURATION_REQUIRED = 5
+
+
+class GameSnapshot:
+    """ Game item and ordered leaderboard read once per monitor tick and shared by every detector """
+
+    def __init__(self, game, leaderboard, players, now, get_player):
+        self.game = game
+        self.game_id = game['game_id']
+        self.leaderboard = leaderboard
+        self.players = players      # player_id -> player item, may only hold some attributes
+        self.now = now
+        self.get_player = get_player
+
+    def ordered_players(self):
+        return [self.players[pid] for pid in self.leaderboard.player_ids() if pid in self.players]
+
+    def name(self, player_id):
+        if 'name' not in self.players.get(player_id, {}):
+            self.players[player_id] = self.get_player(self.game_id, player_id)
+        return self.players[player_id]['name']
+
+
+class Detector:
+    """ Check run by GameMonitor on every tick. Detectors hold no state themselves: their state is a
+        JSON-serialisable dict carried from one tick to the next in the monitor task """
+
+    # key of the detector's state in the monitor task
+    name = None
+    # True if the detector needs every player's streak and round_index
+    needs_streaks = False
+
+    def initial_state(self):
+        return {}
+
+    # abstract function to be overwritten. Returns the detector's state for the next tick
+    def check(self, monitor, snapshot, state):
+        return state
+
+
+class AutoIncrementDetector(Detector):
+    """
+    Advances the round of a game in auto mode once more than 40% of the players are in the top 60%
+    of the leaderboard with at least 6 correct answers in a row in the current round.
+    """
+
+    name = "auto_increment"
+    needs_streaks = True
+
+    def check(self, monitor, snapshot, state):
+        game = snapshot.game
+        if not game['auto_mode'] or game['round'] == 0 or game['round'] >= MAX_ROUND:
+            return state
+
+        players = snapshot.ordered_players()
+        advancable_players = 0
+        for pos, player in enumerate(players):
+            streak, round_index = player['streak'], int(player['round_index'])
+            round_streak = streak[-round_index:] if round_index != 0 else ""
+            c_tail = streak_length(round_streak, "1")
+
+            if c_tail >= 6 and pos <= max(0.6 * len(players), 1):
+                advancable_players += 1
+
+        if advancable_players / max(len(players), 1) > INCREMENT_ROUND_RATIO_THESHOLD:
+            monitor.advance_round(snapshot.game_id, [player['player_id'] for player in players])
+        return state
+
+
+class NewLeaderDetector(Detector):
+    """
+    Logs an event when a player becomes leader for more than 15 seconds. The same leader isn't
+    logged consecutively, and a leader whose position is kept for less than 15 secs isn't logged.
+    """
+
+    name = "new_leader"
+
+    def initial_state(self):
+        return {"prev_leader": None, "curr_leader": None, "time_in": None}
+
+    def check(self, monitor, snapshot, state):
+        # INVARIANCE:
+        #   (1) prev_leader == curr_leader when a new leader is established
+        #   (2) At transition, prev_leader is assigned to old leader, curr_leader to new leader
+        leader = snapshot.leaderboard.leader()
+        if leader is None:
+            pass
+        elif state["curr_leader"] != leader:
+            state = {"prev_leader": state["curr_leader"], "curr_leader": leader, "time_in": snapshot.now}
+        elif (
+            snapshot.now - state["time_in"] > LEADER_ESTABLISHED_DURATION_REQUIRED
+            and state["prev_leader"] != state["curr_leader"]
+        ):
+            monitor.log(snapshot.game_id, "New Leader",
+                f"player {snapshot.name(leader)} beat previous leader and maintained that position for more than 15 seconds",
+                leader,
+            )
+            state["prev_leader"] = state["curr_leader"]
+        return state
+
+
+class NewLastPlayerDetector(Detector):
+    """
+    Logs an event when a player becomes last on the leaderboard for more than 15 seconds. The same
+    player isn't logged consecutively, and a position kept for less than 15 secs isn't logged.
+    """
+
+    name = "new_last_player"
+
+    def initial_state(self):
+        return {"prev_last": None, "curr_last": None, "time_in": None}
+
+    def check(self, monitor, snapshot, state):
+        last = snapshot.leaderboard.last()
+        if last is None or len(snapshot.leaderboard) < 2:
+            pass
+        elif state["curr_last"] != last:
+            state = {"prev_last": state["curr_last"], "curr_last": last, "time_in": snapshot.now}
+        elif (
+            snapshot.now - state["time_in"] > LAST_PLAYER_ESTABLISHED_DURATION_REQUIRED
+            and state["prev_last"] != state["curr_last"]
+        ):
+            monitor.log(snapshot.game_id, "New Last Player",
+                f"player {snapshot.name(last)} became the worst one and maintained that position for more than 15 seconds",
+                last,
+            )
+            state["prev_last"] = state["curr_last"]
+        return state
+
+
+class EpicComebackDetector(Detector):
+    """
+    Logs an event when a player climbs from the bottom 20 percentile to the top 20 percentile of the
+    leaderboard and stays there for more than 5 seconds. The climb itself can happen gradually.
+    """
+
+    name = "epic_comeback"
+
+    def initial_state(self):
+        # potential_players: player_id -> worst position
+        # transition_players: player_id -> {"worst": (int), "time_in": (float)}
+        return {"potential_players": {}, "transition_players": {}}
+
+    def check(self, monitor, snapshot, state):
+        # INVARIANCE: Players can't be in potential_players and transition_players at the same time
+        leaderboard = snapshot.leaderboard
+        potential_players, transition_players = state["potential_players"], state["transition_players"]
+        top_players = set(leaderboard.top_percentile_players(20))
+
+        for pid in leaderboard.bottom_percentile_players(20):
+            potential_players[pid] = max(potential_players.get(pid, 0), leaderboard.rank(pid))
+
+        for pid, worst in list(potential_players.items()):
+            if pid not in leaderboard:
+                del potential_players[pid]
+            elif pid in top_players:
+                transition_players[pid] = {"worst": worst, "time_in": snapshot.now}
+                del potential_players[pid]
+
+        for pid, entry in list(transition_players.items()):
+            if pid not in leaderboard:
+                del transition_players[pid]
+            elif pid not in top_players:
+                potential_players[pid] = entry["worst"]
+                del transition_players[pid]
+            elif snapshot.now - entry["time_in"] > EPIC_COMEBACK_DURATION_REQUIRED:
+                monitor.log(snapshot.game_id, "EpicComeback",
+                    f"player {snapshot.name(pid)} started his epic comeback which was at least 5 seconds long",
+                    pid,
+                )
+                del transition_players[pid]
+        return state
+
+
+class EpicFailDetector(Detector):
+    """
+    Logs an event when a player falls from the top 20 percentile to the bottom 20 percentile of the
+    leaderboard and stays there for more than 5 seconds. The fall itself can happen gradually.
+    """
+
+    name = "epic_fail"
+
+    def initial_state(self):
+        # potential_players: player_id -> best position
+        # transition_players: player_id -> {"best": (int), "time_in": (float)}
+        return {"potential_players": {}, "transition_players": {}}
+
+    def check(self, monitor, snapshot, state):
+        # INVARIANCE: Players can't be in potential_players and transition_players at the same time
+        leaderboard = snapshot.leaderboard
+        potential_players, transition_players = state["potential_players"], state["transition_players"]
+        bottom_players = set(leaderboard.bottom_percentile_players(20))
+
+        for pid in leaderboard.top_percentile_players(20):
+            potential_players[pid] = min(potential_players.get(pid, len(leaderboard)), leaderboard.rank(pid))
+
+        for pid, best in list(potential_players.items()):
+            if pid not in leaderboard:
+                del potential_players[pid]
+            elif pid in bottom_players:
+                transition_players[pid] = {"best": best, "time_in": snapshot.now}
+                del potential_players[pid]
+
+        for pid, entry in list(transition_players.items()):
+            if pid not in leaderboard:
+                del transition_players[pid]
+            elif pid not in bottom_players:
+                potential_players[pid] = entry["best"]
+                del transition_players[pid]
+            elif snapshot.now - entry["time_in"] > EPIC_FAIL_DURATION_REQUIRED:
+                monitor.log(snapshot.game_id, "EpicFail",
+                    f"player {snapshot.name(pid)} started his epic fail which was at least 5 seconds long",
+                    pid,
+                )
+                del transition_players[pid]
+        return state
+
+
+DETECTORS = [
+    AutoIncrementDetector(),
+    NewLeaderDetector(),
+    NewLastPlayerDetector(),
+    EpicComebackDetector(),
+    EpicFailDetector(),
+]
+
+
+def streak_length(response_history, streak_char):
+    return len(response_history) - len(response_history.rstrip(streak_char))
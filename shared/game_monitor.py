@@ -2,182 +2,116 @@ from dynamodb.players import Players
 from dynamodb.player_events import PlayerEvents
 from dynamodb.games import Games
 from dynamodb.game_events import GameEvents
-from shared.question_factory import MAX_ROUND
-import boto3
+from dynamodb.leaderboard_snapshots import LeaderboardSnapshots
+from shared.leaderboard import Leaderboard
+from shared.game_detectors import DETECTORS, GameSnapshot
+from shared.round_transition import advance_players
+from shared import aws
 import json
 import time
-from math import floor, ceil
 
-dynamodb = boto3.resource('dynamodb')
-sqs = boto3.resource('sqs')
-
-INCREMENT_ROUND_RATIO_THESHOLD = 0.4
 MONITOR_INTERVAL = 2
-LEADER_ESTABLISHED_DURATION_REQUIRED = 15
-EPIC_COMEBACK_DURATION_REQUIRED = 5
+# Oldest leaderboard snapshot (in seconds) used before falling back to the score-index
+LEADERBOARD_SNAPSHOT_MAX_AGE = 3 * MONITOR_INTERVAL
 
 class GameMonitor:
-    def __init__(self):
-        self.task_queue = sqs.get_queue_by_name(QueueName='game_monitor_tasks')
+    def __init__(self, detectors=None, clock=time.time):
+        dynamodb = aws.dynamodb()
         self.games = Games(dynamodb)
         self.players = Players(dynamodb)
-        self.player_events = PlayerEvents(dynamodb)
-        self.game_events = GameEvents(dynamodb)
+        self.player_events = PlayerEvents(dynamodb, clock)
+        self.game_events = GameEvents(dynamodb, clock)
+        self.leaderboard_snapshots = LeaderboardSnapshots(dynamodb)
+        self.detectors = DETECTORS if detectors is None else detectors
+        self.clock = clock
+
+    @property
+    def task_queue(self):
+        return aws.queue('game_monitor_tasks')
 
     # FOR REFERENCE ONLY, NEVER CALLED
     def __create_task_queue(self):
-        self.task_queue = sqs.create_queue(QueueName='game_monitor_tasks')
+        aws.resource('sqs').create_queue(QueueName='game_monitor_tasks')
+
+    def handle_task(self, payload):
+        """ Runs one task of the game_monitor_tasks queue """
+        game_id = payload['game_id']
+        if payload['type'] == 'START_GAME':
+            print("Running START_GAME monitor for: ", game_id)
+            self.start(game_id, payload['modification_hash'])
+        elif payload['type'] == 'MONITOR':
+            print("Running MONITOR tick for: ", game_id)
+            self.monitor_tick(game_id, payload['modification_hash'], payload['state'])
+        elif payload['type'] == 'AUTO_INCREMENT':
+            # task queued before the monitors were merged, continue it as a monitor tick
+            print("Running AUTO_INCREMENT as MONITOR tick for: ", game_id)
+            self.monitor_tick(game_id, payload['modification_hash'], dict())
+        elif payload['type'] in ('EPIC_COMEBACK', 'NEW_LEADER'):
+            # task queued before the monitors were merged, its chain is replaced by the MONITOR tick
+            print(f"Dropping legacy {payload['type']} monitor for: ", game_id)
+        else:
+            raise ValueError(f"Unknown Payload type: {payload['type']}")
 
     def start(self, game_id, modification_hash):
+        self.schedule(game_id, modification_hash, dict(), delay=0)
+
+    def schedule(self, game_id, modification_hash, state, delay=MONITOR_INTERVAL):
         self.task_queue.send_message(
             MessageBody=json.dumps({
                 "game_id": game_id,
-                "type": "AUTO_INCREMENT",
+                "type": "MONITOR",
                 "modification_hash": modification_hash,
-        }))
-        self.task_queue.send_message(
-            MessageBody=json.dumps({
-                "game_id": game_id,
-                "type": "EPIC_COMEBACK",
-                "potential_players": dict(),
-                "transition_players": dict(),
-        }))
-        self.task_queue.send_message(
-            MessageBody=json.dumps({
-                "game_id": game_id,
-                "type": "NEW_LEADER",
-                "prev_leader": None,
-                "curr_leader": None,
-                "time_in": None,
-        }))
+                "state": state,
+        }), DelaySeconds=delay,)
 
-
-    def increment_round_monitor(self, game_id, modification_hash):
+    def monitor_tick(self, game_id, modification_hash, state):
+        """ Reads the game and its leaderboard once, runs every detector on them and
+            reschedules the single monitor task of the game """
         try:
             self.games.validate_modification_hash(game_id, modification_hash)
         except:
-            print("Invalid Modification Hash for ")
+            print("Invalid Modification Hash for ", game_id)
             return
-        
-        game = self.games.get_game(game_id)
-        if game['ended'] or not game['running'] or not game['auto_mode']:
-            print("Game ended, not running, or not in auto mode")
-            return
-        elif game['auto_mode'] and game['round'] > 0:
-            players = self.players.query_players_by_score(game_id, ["streak", "round_index", "player_id"], active=True)
-            advancable_players = 0
-
-            for pos, player in enumerate(players):
-                streak, round_index = player['streak'], int(player['round_index'])
-                round_streak = streak[-round_index:] if round_index != 0 else ""
-                c_tail = self.streak_length(round_streak, "1")
-
-                if c_tail >= 6 and pos <= max(0.6 * len(players), 1):
-                    advancable_players += 1
-
-            if advancable_players / max(len(players), 1) > INCREMENT_ROUND_RATIO_THESHOLD and game['round'] < MAX_ROUND:
-                self.games.update_round(game_id)
-                for player in players:
-                    self.players.update_player_attribute(game_id, player['player_id'], round_index=0)
-                    print("DIAGNOSTIC", self.players.get_player(game_id, player["player_id"]))
-
-        self.task_queue.send_message(
-            MessageBody=json.dumps({
-                "game_id": game_id,
-                "type": "AUTO_INCREMENT",
-                "modification_hash": game['modification_hash'],
-        }), DelaySeconds=MONITOR_INTERVAL,)
 
-    
-    def new_leader_monitor(self, game_id, prev_leader, curr_leader, time_in):
         game = self.games.get_game(game_id)
         if game['ended'] or not game['running']:
+            print("Game ended or not running")
             return
 
-        players = self.players.query_players_by_score(game_id, ["player_id", 'name'], active=True)
-        if not len(players):
-            pass
-        elif curr_leader != players[0]['player_id']:
-            prev_leader = curr_leader
-            curr_leader = players[0]['player_id']
-            time_in = time.time()
-        elif (
-            time.time() - time_in > LEADER_ESTABLISHED_DURATION_REQUIRED
-            and prev_leader != curr_leader
-        ):
-            self.game_events.add_game_events(game_id, "New Leader",
-                f"player {players[0]['name']} beat previous leader and maintained that position for more than 15 seconds",
-                players[0]['player_id'],
-            )
-            prev_leader = curr_leader
-
-        self.task_queue.send_message(
-            MessageBody=json.dumps({
-                "game_id": game_id,
-                "type": "NEW_LEADER",
-                "prev_leader": prev_leader,
-                "curr_leader": curr_leader,
-                "time_in": time_in,
-        }), DelaySeconds=MONITOR_INTERVAL,)
-
-
-
-    def comeback_monitor(self,game_id, potential_players, transition_players):
-        game = self.games.get_game(game_id)
-        if game['ended'] or not game['running']:
-            return
-        
-        players = self.players.query_players_by_score(game_id, ['player_id', 'name'], active=True)
-        bottom_players = self.bottom_20_percentile_players(players)
-        top_players = self.top_20_percentile_players(players)
-        for pos, player in enumerate(bottom_players):
-            pid = player['player_id']
-            if pid in potential_players:
-                potential_players[pid] = max(pid, pos)
-            else:
-                potential_players[pid] = pos
-        
-        for pid, lowest_score in list(potential_players.items()):
-
-            if pid in map(lambda x: x['player_id'], top_players):
-                transition_players[pid] = {
-                    "worst": lowest_score,
-                    "time_in": time.time(),
-                }
-                del potential_players[pid]
-
-        for pid, entry in list(transition_players.items()):
-
-            if pid not in map(lambda x: x['player_id'], top_players):
-                potential_players[pid] = entry["worst"]
-                del transition_players[pid]
-            elif time.time() - entry["time_in"] > EPIC_COMEBACK_DURATION_REQUIRED:
-                player = self.players.get_player(game_id, pid)
-                self.game_events.add_game_events(game_id,  "EpicComeback", 
-                    f"player {player['name']} started his epic comeback which was at least 5 seconds long",
-                    player['player_id']
-                )
-                del transition_players[pid]
-
-        self.task_queue.send_message(
-            MessageBody=json.dumps({
-                "game_id": game_id,
-                "type": "EPIC_COMEBACK",
-                "potential_players": potential_players,
-                "transition_players": transition_players,
-        }), DelaySeconds=MONITOR_INTERVAL,)
-
-
-    def streak_length(self, response_history, streak_char):
-        return len(response_history) - len(response_history.rstrip(streak_char))
-
-    def top_20_percentile_players(self, ordered_players):
-        end_index = floor(len(ordered_players) * 0.2)
-        return ordered_players[0:end_index]
-
-    def bottom_20_percentile_players(self, ordered_players):
-        from_index = ceil(0.8 * len(ordered_players))
-        end_index = len(ordered_players)
-        return ordered_players[from_index:end_index]
-
-    
\ No newline at end of file
+        snapshot = self.snapshot(game)
+        for detector in self.detectors:
+            detector_state = state.get(detector.name, None)
+            if detector_state is None:
+                detector_state = detector.initial_state()
+            state[detector.name] = detector.check(self, snapshot, detector_state)
+
+        self.schedule(game_id, game['modification_hash'], state)
+
+    def snapshot(self, game):
+        """ Returns the GameSnapshot shared by the detectors of one tick. Streaks are only read
+            from the score-index when a detector that needs them is active """
+        if game['auto_mode'] and any(detector.needs_streaks for detector in self.detectors):
+            players = self.players.query_players_by_score(
+                game['game_id'], ["streak", "round_index", "player_id", "score"], active=True)
+            leaderboard = Leaderboard.from_players(players)
+            players = {player['player_id']: player for player in players}
+        else:
+            leaderboard = self.leaderboard(game)
+            players = dict()
+        return GameSnapshot(game, leaderboard, players, self.clock(), self.players.get_player)
+
+    def log(self, game_id, event_type, description, player_id):
+        self.game_events.add_game_events(game_id, event_type, description, player_id)
+
+    def advance_round(self, game_id, player_ids):
+        game = self.games.update_round(game_id)
+        advance_players(self.players, self.player_events, game_id, game['round'], player_ids)
+
+    def leaderboard(self, game):
+        """ Returns game's leaderboard from the snapshot kept by QuizMaster, falling back to
+            the score-index when there is no recent snapshot """
+        snapshot = self.leaderboard_snapshots.get_snapshot(game['game_id'])
+        if snapshot and self.clock() - float(snapshot['taken_at']) <= LEADERBOARD_SNAPSHOT_MAX_AGE:
+            return Leaderboard.from_snapshot(snapshot['leaderboard'])
+        return Leaderboard.from_players(
+            self.players.query_players_by_score(game['game_id'], ['player_id', 'score'], active=True))
@@ -0,0 +1,122 @@
+from dynamodb.player_events import player_id_of
+from decimal import Decimal
+import numpy as np
+
+# response_type column codes
+RESPONSE_CODES = {'CORRECT': 0, 'WRONG': 1, 'ERROR_RESPONSE': 2, 'NO_SERVER_RESPONSE': 3}
+CORRECT = RESPONSE_CODES['CORRECT']
+# Answers of the warmup don't count towards the stats, an event's difficulty is the round it was asked in
+WARMUP_ROUND = 0
+
+# A streak is a run of at least 2 correct answers, a player is on fire during a streak of more than 6
+MIN_STREAK_LENGTH = 2
+ON_FIRE_STREAK_LENGTH = 7
+
+
+class EventColumns:
+    """ A game's player events as NumPy columns sorted by player, timestamp, then request index. Timestamps
+        only have a one-second resolution, the request index orders the answers of one second """
+
+    def __init__(self, player, timestamp, points_gained, response_type, request_index=None):
+        if request_index is None:
+            request_index = np.zeros(len(player), dtype=np.int64)
+        # lexsort is stable, events without a request index keep their given order
+        order = np.lexsort((request_index, timestamp, player))
+        self.player = player[order]
+        self.timestamp = timestamp[order]
+        self.points_gained = points_gained[order]
+        self.response_type = response_type[order]
+
+    @classmethod
+    def from_events(cls, events, player_ids):
+        """ Builds columns from player_events items with player_event_id, timestamp, difficulty, points_gained,
+            response_type and, when recorded, request_index. Players are indexed by their position in player_ids.
+            Only answers after the warmup are kept, not e.g. the WARMUP_ENDED events """
+        index = {pid: i for i, pid in enumerate(player_ids)}
+        player, timestamp, request_index, points_gained, response_type = [], [], [], [], []
+        for event in events:
+            player_id = player_id_of(event['player_event_id'])
+            if player_id not in index or event['response_type'] not in RESPONSE_CODES \
+                    or int(event['difficulty']) == WARMUP_ROUND:
+                continue
+            player.append(index[player_id])
+            timestamp.append(event['timestamp'])
+            request_index.append(int(event.get('request_index', 0)))
+            points_gained.append(int(event['points_gained']))
+            response_type.append(RESPONSE_CODES[event['response_type']])
+
+        return cls(
+            np.array(player, dtype=np.int64),
+            np.array(timestamp, dtype='datetime64[s]').astype(np.int64),
+            np.array(points_gained, dtype=np.int64),
+            np.array(response_type, dtype=np.int8),
+            np.array(request_index, dtype=np.int64),
+        )
+
+    def __len__(self):
+        return len(self.player)
+
+    def correct_runs(self):
+        """ Run-length encodes the correct answers of every player.
+            Returns (player, length, duration in seconds) of each run """
+        correct = self.response_type == CORRECT
+        same_player = self.player[1:] == self.player[:-1]
+        continues_prev = np.concatenate(([False], correct[:-1] & same_player))
+        continues_next = np.concatenate((correct[1:] & same_player, [False]))
+
+        starts = np.flatnonzero(correct & ~continues_prev)
+        ends = np.flatnonzero(correct & ~continues_next)
+        return self.player[starts], ends - starts + 1, self.timestamp[ends] - self.timestamp[starts]
+
+
+def generate_game_stats(columns, names):
+    """ Returns the final stats of a game from its EventColumns. names lists the players' names by index """
+    num_players = len(names)
+    run_player, run_length, run_duration = columns.correct_runs()
+
+    # average length of the streaks of each player, players without streaks count as 0
+    streak = run_length >= MIN_STREAK_LENGTH
+    streak_total = np.bincount(run_player[streak], weights=run_length[streak], minlength=num_players)
+    streak_count = np.bincount(run_player[streak], minlength=num_players)
+    player_avg_streak = streak_total / np.maximum(streak_count, 1)
+
+    requests = np.bincount(columns.player, minlength=num_players)
+    correct = np.bincount(columns.player, weights=columns.response_type == CORRECT, minlength=num_players)
+    success_rate = correct / np.maximum(requests, 1)
+
+    on_fire = run_length >= ON_FIRE_STREAK_LENGTH
+    stats = {
+        "num_players": num_players,
+        "total_requests": len(columns),
+        "average_streak": float(player_avg_streak.mean()) if num_players else 0.0,
+        "longest_streak": int(run_length.max()) if len(run_length) else 0,
+        "average_success_rate": float(success_rate.mean()) if num_players else 0.0,
+        "best_success_rate": {"team": None, "value": 0.0},
+        "average_on_fire_duration": float(run_duration[on_fire].mean()) if on_fire.any() else 0.0,
+        "longest_on_fire_duration": {"achieved_by_team": None, "duration": 0, "streak_len": 0},
+    }
+
+    if num_players:
+        best = int(np.argmax(success_rate))
+        stats["best_success_rate"] = {"team": names[best], "value": float(success_rate[best])}
+
+    if on_fire.any():
+        # the longest on fire streak, ties broken by duration
+        fires = np.flatnonzero(on_fire)
+        longest = fires[np.lexsort((run_duration[fires], run_length[fires]))[-1]]
+        stats["longest_on_fire_duration"] = {
+            "achieved_by_team": names[run_player[longest]],
+            "duration": int(run_duration[longest]),
+            "streak_len": int(run_length[longest]),
+        }
+
+    return stats
+
+
+def as_item(value):
+    """ Converts floats of the stats to Decimal so they can be stored in DynamoDB """
+    if isinstance(value, float):
+        return Decimal(str(round(value, 4)))
+    if isinstance(value, dict):
+        return {k: as_item(v) for k, v in value.items()}
+    return value
@@ -1,38 +1,40 @@
 import json
-import boto3
+from shared import aws
 from shared.question_factory import MAX_ROUND
 from dynamodb.games import Games
 from dynamodb.players import Players
-from dynamodb.player_events import PlayerEvents
+from dynamodb.player_events import PlayerEvents, player_id_of, EVENT_ID_LENGTH
 from dynamodb.game_events import GameEvents
-from uuid import uuid4
-
-sqs_client = boto3.client('sqs')
-sqs_resource = boto3.resource('sqs')
+from dynamodb.latency_metrics import LatencyMetrics
+from shared.running_totals import RunningTotals
+from shared.round_transition import advance_players
+from shared.latency import game_latency
+import time
 
 DEFAULT_DELAY = 5
 
-dynamodb = boto3.resource('dynamodb')
-sqs = boto3.resource('sqs')
-
 
 class GamesManager:
     """ Game manager class for lambda functions and backend server to interface with the DynamoDB """
 
-    def __init__(self):
-        try:
-            self.administer_question_tasks = sqs_resource.create_queue(QueueName='administer_question_tasks')
-        except sqs_client.exceptions.QueueNameExists:
-            self.administer_question_tasks = sqs_resource.get_queue_by_name(QueueName='administer_question_tasks')
-        except sqs_client.exceptions.QueueDeletedRecently:
-            raise
-
+    def __init__(self, clock=time.time, dynamodb=None):
+        # boto3 resources and queue URLs are process-wide and resolved on first use, see shared.aws,
+        # unless a DynamoDB resource of its own is given
+        dynamodb = dynamodb if dynamodb is not None else aws.dynamodb()
         self.games = Games(dynamodb)
         self.players = Players(dynamodb)
-        self.player_events = PlayerEvents(dynamodb)
-        self.game_events = GameEvents(dynamodb)
-        self.administer_question_queue = sqs.get_queue_by_name(QueueName='administer_question_tasks')
-        self.game_monitor_queue = sqs.get_queue_by_name(QueueName='game_monitor_tasks')
+        self.player_events = PlayerEvents(dynamodb, clock)
+        self.game_events = GameEvents(dynamodb, clock)
+        self.latency_metrics = LatencyMetrics(dynamodb)
+        self.running_totals = {}  # game_id -> RunningTotals
+
+    @property
+    def administer_question_queue(self):
+        return aws.queue('administer_question_tasks')
+
+    @property
+    def game_monitor_queue(self):
+        return aws.queue('game_monitor_tasks')
 
     # GAME MANAGEMENT
 
@@ -91,29 +93,14 @@ class GamesManager:
 
     def game_in_last_round(self, game_id) -> bool:
         """ Check if game is in its final round """
-        return self.games.get_game(game_id)['round'] == MAX_ROUND
+        return self.games.get_game(game_id, consistent=True)['round'] == MAX_ROUND
 
     def advance_game_round(self, game_id):
         """ Advances game round """
         game = self.games.update_round(game_id)
         players = self.players.query_players(game_id, ['player_id'], active=True)
-        for player in players:
-            attributes = {'round_index': 0}
-            if game['round'] == 1:
-                attributes['streak'] = ""
-                attributes['correct_tally'] = attributes['incorrect_tally'] = 0
-                attributes['request_counts'] = attributes['score'] = 0
-                self.player_events.add_event(game_id, player['player_id'], 0, "WARMUP_ENDED", 1, 0, "")
-                attributes['modification_hash'] = uuid4().hex[:6]
-                self.players.update_player_attribute(game_id, player['player_id'], **attributes)
-                self.administer_question_queue.send_message(
-                    MessageBody=json.dumps({
-                        "game_id": game_id,
-                        "player_id": player['player_id'],
-                        "modification_hash": attributes['modification_hash'],
-                }), DelaySeconds=0,)
-            else:
-                self.players.update_player_attribute(game_id, player['player_id'], **attributes)
+        advance_players(self.players, self.player_events, game_id, game['round'],
+            [player['player_id'] for player in players])
 
 
     def pause_game(self, game_id):
@@ -122,7 +109,7 @@ class GamesManager:
 
     def unpause_game(self, game_id):
         """ Unpause a game """
-        game = self.games.get_game(game_id)
+        game = self.games.get_game(game_id, consistent=True)
         self.games.update_games_attribute(game_id, running=True)
         self.game_monitor_queue.send_message(
             MessageBody=json.dumps({
@@ -136,19 +123,12 @@ class GamesManager:
     def end_game(self, game_id):
         """ Ends a game """
         self.games.update_games_attribute(game_id, ended=True)
+        self.games.update_games_attribute(game_id, stat=self.generate_game_stats(game_id))
 
     def set_auto_mode(self, game_id):
         """ Turns on auto advance round """
+        # the running game's monitor tick picks auto mode up on its next read of the game
         self.games.update_games_attribute(game_id, auto_mode=True)
-        game = self.games.get_game(game_id)
-        self.game_monitor_queue.send_message(
-            MessageBody=json.dumps({
-                "game_id": game_id,
-                "type": "AUTO_INCREMENT",
-                "modification_hash": game['modification_hash']
-        }),
-            DelaySeconds=0,
-        )
 
     def clear_auto_mode(self, game_id):
         """ Turns off auto advance round """
@@ -163,32 +143,45 @@ class GamesManager:
             temp = {}
             for pid in list(player_id):
                 temp[pid] =  self.players.get_player(game_id, pid)
-                events = self.player_events.query_events_by_timestamp(game_id, player_id=pid)
-                for event in events:
-                    event['player_id'] = event['player_event_id'][:8]
-                    event['event_id'] = event['player_event_id'][8:]
-                temp[pid]['events']= events
+                temp[pid]['events'] = self.__with_event_ids(self.player_events.query_events_for_player(game_id, pid))
             return temp
         else:
             players = self.players.query_players(game_id, active=True)
+            events_by_player = self.player_events.query_events_by_player(game_id)
             for player in players:
-                events = self.player_events.query_events_by_timestamp(game_id, player_id=player['player_id'])
-                for event in events:
-                    event['player_id'] = event['player_event_id'][:8]
-                    event['event_id'] = event['player_event_id'][8:]
-                player['events']= events
+                player['events'] = self.__with_event_ids(events_by_player.get(player['player_id'], []))
             return players
 
+    def __with_event_ids(self, events):
+        for event in events:
+            event['player_id'] = player_id_of(event['player_event_id'])
+            event['event_id'] = event['player_event_id'][-EVENT_ID_LENGTH:]
+        return events
+
     def player_exists(self, game_id, player_id) -> bool:
         """ Checks if player_id exists in the given game """
         return self.players.get_player(game_id, player_id) is not None
 
 
-    def get_game_running_totals(self, game_id) -> list:
-        """ Gets list of objects in the form {"time": timestamp, "pid": score} """
-        game_events = self.player_events.query_events_by_timestamp(game_id, projection=['timestamp', 'player_event_id', 'score'], forward=True)
-        ls = [ {"time": event['timestamp'], event['player_event_id'][:8]: event['score']} for event in game_events]
-        ls.insert(0, {'time': ls[0]['time']})
+    def get_game_running_totals(self, game_id, limit=None, cursor=None, since=None):
+        """ Gets the score chart as a list of buckets in the form {"time": timestamp, "pid": score, ...}.
+            If since is given, returns only the buckets from since onwards. If limit is given, returns one
+            page of at most limit raw events in the form {"totals": [...], "cursor": cursor of next page} """
+        projection = ['timestamp', 'player_event_id', 'score']
+        if limit is not None:
+            game_events, next_cursor = self.player_events.query_events_by_timestamp_page(
+                game_id, limit, cursor, projection=projection, forward=True)
+            return {"totals": [ {"time": event['timestamp'], player_id_of(event['player_event_id']): event['score']} for event in game_events],
+                    "cursor": next_cursor}
+
+        # only the events of the buckets that have not settled are read again
+        totals = self.running_totals.setdefault(game_id, RunningTotals())
+        totals.update(self.player_events.iter_events_by_timestamp(
+            game_id, projection=projection, forward=True, since=totals.since()))
+
+        ls = totals.buckets(since)
+        if ls and since is None:
+            ls.insert(0, {'time': ls[0]['time']})
         return ls
 
     def get_score_for_player(self, game_id, player_id) -> int:
@@ -196,9 +189,9 @@ class GamesManager:
         """ Returns a player's score """
         return self.players.get_player(game_id, player_id)['score']
 
-    def add_player_to_game(self, game_id, name, api) -> dict:
-        """ Adds a player to a game and returns newly added player """
-        new_player = self.players.add_player(game_id, name, api)
+    def add_player_to_game(self, game_id, name, api, player_id=None) -> dict:
+        """ Adds a player to a game and returns newly added player. player_id is generated unless given """
+        new_player = self.players.add_player(game_id, name, api, player_id)
 
         self.administer_question_queue.send_message(
             MessageBody=json.dumps({
@@ -244,7 +237,7 @@ class GamesManager:
 
     def get_player_events(self, game_id, player_id) -> list:
         """ Returns list of event objects for a player """
-        return self.player_events.query_events_for_player(game_id, player_id)
+        return self.__with_event_ids(self.player_events.query_events_for_player(game_id, player_id))
 
     def get_player_event(self, game_id, player_id, event_id) -> list:
         """ Returns list of event objects for a player """
@@ -272,10 +265,28 @@ class GamesManager:
 
         for gid in list(gids):
             # this will stop all game_monitor and administer_question task
-            self.games.update_games_attribute(gid, ended=True, stat=GAME_STAT_PROTOTYPE)
+            self.games.update_games_attribute(gid, ended=True)
+            self.games.update_games_attribute(gid, stat=self.generate_game_stats(gid))
             print("deleted game ", gid)
             
 
+    def generate_game_stats(self, game_id):
+        """ Computes the final stats of a game from all its player events """
+        # numpy is only needed once a game ends, so it isn't loaded on the cold start of every API lambda
+        from shared.game_stats import EventColumns, generate_game_stats, as_item
+
+        players = self.players.query_players(game_id, ['player_id', 'name'])
+        events = self.player_events.iter_events(game_id,
+            ['player_event_id', 'timestamp', 'difficulty', 'request_index', 'points_gained', 'response_type'])
+        columns = EventColumns.from_events(events, [player['player_id'] for player in players])
+        return as_item(generate_game_stats(columns, [player['name'] for player in players]))
+
+    def get_latency_metrics(self, game_id) -> dict:
+        """ Returns count, mean, percentiles and max (in ms) of every step of the game's questions,
+            and of every player's server, slowest first. Merged from the histograms of every game runner """
+        names = {player['player_id']: player['name'] for player in self.players.query_players(game_id, ['player_id', 'name'])}
+        return game_latency(self.latency_metrics.query_metrics(game_id)).summary(names)
+
     def review_exists(self, game_id):
         game = self.games.get_game(game_id)
         return game['ended']
@@ -293,38 +304,9 @@ class GamesManager:
     def review_stats(self, game_id):
         return self.games.get_game(game_id)['stat']
 
-    def review_analysis(self, game_id):
+    def review_analysis(self, game_id, limit=None, cursor=None):
+        """ Returns game events, or if limit is given one page of them in the form {"events": [...], "cursor": cursor of next page} """
+        if limit is not None:
+            game_events, next_cursor = self.game_events.query_game_events_by_timestamp_page(game_id, limit, cursor)
+            return {"events": game_events, "cursor": next_cursor}
         return self.game_events.query_game_events_by_timestamp(game_id)
-
-
-GAME_STAT_PROTOTYPE = {
-    "total_requests": 0,
-    "average_streak": 1,
-    "average_on_fire_duration": 0,
-    "longest_on_fire_duration": {
-        "achieved_by_team": "John",
-        "value": 27,
-    },
-    "longest_streak": 10,
-    "average_success_rate": 5,
-    "best_success_rate": {
-        "achieved_by_team": "John",
-        "value": 3,
-        },
-    "most_epic_comeback": {
-        "achieved_by_team": "John",
-        "points_gained_during_that_streak": 2,
-        "duration": 3,
-        "start_position": 10,
-        "final_achieved_position": 1,
-    },
-    "most_epic_fail": {
-        "achieved_by_team": "Osc",
-        "points_lost_during_that_streak": 3,
-        "duration": 2,
-        "start_position": 3,
-        "final_achieved_position": 20
-    },
-    "avg_time_to_solve_new_question": [2, 4, 6, 8, 9],
-    "time_per_round": [1, 3, 5, 7]
-}
@@ -0,0 +1,256 @@
+"""
+Per-question latency histograms.
+
+QuizMaster times the steps of every question it asks (spans) and records them in HDR-style histograms,
+per game and, for the spans that depend on the team, per player. Each process writes its own cumulative
+histograms to the latency_metrics table, one item per game and one per player; readers merge the items of
+every process.
+
+Offline dump of a game's histograms:
+
+    python -m shared.latency <game_id> [--players N] [--json FILE]
+"""
+from contextlib import contextmanager
+from uuid import uuid4
+import threading
+import time
+
+# Spans of one question, in the order they happen
+SPANS = [
+    "get_game",             # game fetch, once per batch of questions
+    "validate_hash",        # player read whose modification_hash is checked
+    "next_question",        # question generation
+    "ask_player",           # HTTP call to the team's server
+    "leaderboard_rank",     # player's position, used to score a wrong answer
+    "record_answer",        # DynamoDB transaction writing the answer, and the event unless buffered
+    "write_leaderboard",    # DynamoDB write of the leaderboard snapshot, when due
+    "reschedule",           # SQS message of the player's next question
+    "question",             # whole question, from the start of its batch until its answer is recorded
+]
+# Spans also kept per player, the ones that show which team servers are slow
+PLAYER_SPANS = ("ask_player", "question")
+
+# Values below 2**SUB_BUCKET_BITS microseconds are exact, larger ones are bucketed with a relative error of
+# at most 2**-SUB_BUCKET_BITS (6%), whatever their magnitude
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Seconds between two writes of a process' histograms
+FLUSH_INTERVAL = 10
+PERCENTILES = (50, 90, 99)
+
+
+def bucket_of(value):
+    """ Returns the bucket of a value in microseconds """
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - 1 - SUB_BUCKET_BITS
+    return SUB_BUCKETS * (shift + 1) + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_range(bucket):
+    """ Returns (lowest value, width) of a bucket """
+    if bucket < SUB_BUCKETS:
+        return bucket, 1
+    shift = bucket // SUB_BUCKETS - 1
+    return (bucket % SUB_BUCKETS + SUB_BUCKETS) << shift, 1 << shift
+
+
+class Histogram:
+    """ Log-linear histogram of latencies in microseconds, a sparse bucket -> count map that can be merged """
+
+    def __init__(self, counts=None, total=0, max=0):
+        self.counts = counts if counts is not None else {}
+        self.total = total
+        self.max = max
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def record(self, seconds):
+        value = max(0, int(seconds * 1_000_000))
+        bucket = bucket_of(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.total += value
+        self.max = value if value > self.max else self.max
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q):
+        """ Returns the q-th percentile (0-100) in microseconds, the middle of the bucket it falls in """
+        count = len(self)
+        if count == 0:
+            return 0
+        rank = max(1, round(q / 100 * count))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                low, width = bucket_range(bucket)
+                return min(self.max, low + (width - 1) / 2)
+        return self.max
+
+    def summary(self):
+        """ Returns count, mean, percentiles and max in milliseconds """
+        count = len(self)
+        summary = {"count": count, "mean_ms": round(self.total / count / 1000, 3) if count else 0}
+        for q in PERCENTILES:
+            summary[f"p{q}_ms"] = round(self.percentile(q) / 1000, 3)
+        summary["max_ms"] = round(self.max / 1000, 3)
+        return summary
+
+    def to_item(self):
+        # DynamoDB map keys are strings
+        return {"counts": {str(bucket): count for bucket, count in self.counts.items()},
+                "total": self.total, "max": self.max}
+
+    @classmethod
+    def from_item(cls, item):
+        return cls({int(bucket): int(count) for bucket, count in item["counts"].items()},
+                   int(item["total"]), int(item["max"]))
+
+
+class GameLatency:
+    """ Histograms of one game: span -> Histogram, and player_id -> span -> Histogram """
+
+    def __init__(self):
+        self.spans = {}
+        self.players = {}
+
+    def record(self, span, seconds, player_id=None):
+        self.spans.setdefault(span, Histogram()).record(seconds)
+        if player_id is not None and span in PLAYER_SPANS:
+            self.players.setdefault(player_id, {}).setdefault(span, Histogram()).record(seconds)
+
+    def merge_item(self, item):
+        """ Adds the histograms of a latency_metrics item, of the game or of one of its players """
+        spans = self.players.setdefault(item["player_id"], {}) if "player_id" in item else self.spans
+        for span, histogram in item.get("spans", {}).items():
+            spans.setdefault(span, Histogram()).merge(Histogram.from_item(histogram))
+        return self
+
+    def summary(self, names=None):
+        """ Returns the summary of every span, and of every player's spans slowest first. names maps
+            player_id to the player's name """
+        names = names or {}
+        order = {span: i for i, span in enumerate(SPANS)}
+        players = [
+            {"player_id": player_id, "name": names.get(player_id, ""),
+             **{span: histogram.summary() for span, histogram in spans.items()}}
+            for player_id, spans in self.players.items()
+        ]
+        players.sort(key=lambda player: player.get("ask_player", {}).get("p99_ms", 0), reverse=True)
+        return {
+            "spans": {span: self.spans[span].summary() for span in sorted(self.spans, key=lambda s: order.get(s, len(order)))},
+            "players": players,
+        }
+
+
+class LatencyRecorder:
+    """ Latency histograms of the games run by one process, written to the latency_metrics table at most
+        every FLUSH_INTERVAL. Every process writes its own items per game, under its source id, and only
+        rewrites the items of the players recorded since the last flush """
+
+    def __init__(self, table=None, flush_interval=FLUSH_INTERVAL, clock=time.time, timer=time.perf_counter):
+        self.table = table      # LatencyMetrics, or None to only keep the histograms in memory
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.timer = timer
+        self.source = uuid4().hex[:8]
+        self.lock = threading.Lock()
+        self.games = {}         # game_id -> GameLatency
+        self.changed = {}       # game_id -> player_ids recorded since the last flush
+        self.last_flush = clock()
+
+    def record(self, game_id, span, seconds, player_id=None):
+        with self.lock:
+            self.games.setdefault(game_id, GameLatency()).record(span, seconds, player_id)
+            players = self.changed.setdefault(game_id, set())
+            if player_id is not None and span in PLAYER_SPANS:
+                players.add(player_id)
+        self.flush_if_due()
+
+    @contextmanager
+    def span(self, game_id, span, player_id=None):
+        """ Records the time spent in the with block """
+        start = self.timer()
+        try:
+            yield
+        finally:
+            self.record(game_id, span, self.timer() - start, player_id)
+
+    def game(self, game_id):
+        return self.games.get(game_id)
+
+    def flush_if_due(self):
+        if self.changed and self.clock() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """ Writes the histograms of every game recorded since the last flush """
+        with self.lock:
+            self.last_flush = self.clock()
+            changed, self.changed = self.changed, {}
+            items = {game_id: (
+                {span: histogram.to_item() for span, histogram in self.games[game_id].spans.items()},
+                {player_id: {span: histogram.to_item() for span, histogram in self.games[game_id].players[player_id].items()}
+                 for player_id in player_ids},
+            ) for game_id, player_ids in changed.items()}
+        if self.table is None:
+            return
+        for game_id, (spans, players) in items.items():
+            try:
+                self.table.put_metrics(game_id, self.source, spans, players, self.last_flush)
+            except Exception as err:
+                # written again with the next flush, histograms are cumulative
+                print("Couldn't write latency metrics of game", game_id, err)
+                with self.lock:
+                    self.changed.setdefault(game_id, set()).update(players)
+
+
+def game_latency(items):
+    """ Merges the latency_metrics items of every process of a game """
+    latency = GameLatency()
+    for item in items:
+        latency.merge_item(item)
+    return latency
+
+
+def print_summary(summary, players):
+    print(f"{'span':<20}{'count':>9}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}   (ms)")
+    for span, stats in summary["spans"].items():
+        print(f"{span:<20}{stats['count']:>9}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+              f"{stats['p90_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}")
+    if players and summary["players"]:
+        print(f"\nslowest team servers, by p99 of ask_player")
+        for player in summary["players"][:players]:
+            stats = player.get("ask_player", {})
+            print(f"{player['name'] or player['player_id']:<20}{stats.get('count', 0):>9}{stats.get('p50_ms', 0):>10.2f}"
+                  f"{stats.get('p99_ms', 0):>10.2f}")
+
+
+def main():
+    import argparse
+    import json
+    from shared.games_manager import GamesManager
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("game_id")
+    parser.add_argument("--players", type=int, default=10, help="slowest players shown")
+    parser.add_argument("--json", help="write the summary to this file as JSON")
+    args = parser.parse_args()
+
+    summary = GamesManager().get_latency_metrics(args.game_id)
+    print_summary(summary, args.players)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from sortedcontainers import SortedList
+from math import floor, ceil
+
+
+class Leaderboard:
+    """ In-memory leaderboard of a game, ordered by descending score (ties broken by player_id).
+        Score updates and rank lookups are O(log N), so it can be kept in sync on every answer
+        instead of querying the score-index and scanning the result """
+
+    def __init__(self, scores=None):
+        self.scores = {}
+        self.ranking = SortedList()
+        for player_id, score in (scores or {}).items():
+            self.update(player_id, score)
+
+    @classmethod
+    def from_players(cls, players):
+        """ Builds leaderboard from player items with player_id and score """
+        return cls({player['player_id']: player['score'] for player in players})
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """ Builds leaderboard from the output of snapshot() """
+        return cls({entry['player_id']: entry['score'] for entry in snapshot})
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __contains__(self, player_id):
+        return player_id in self.scores
+
+    def update(self, player_id, score):
+        """ Sets player's score, adding the player if not on the leaderboard yet """
+        if player_id in self.scores:
+            self.ranking.remove((-self.scores[player_id], player_id))
+        self.scores[player_id] = score
+        self.ranking.add((-score, player_id))
+
+    def increment(self, player_id, delta):
+        """ Adds delta to player's score and returns the new score """
+        score = self.scores.get(player_id, 0) + delta
+        self.update(player_id, score)
+        return score
+
+    def remove(self, player_id):
+        if player_id in self.scores:
+            self.ranking.remove((-self.scores.pop(player_id), player_id))
+
+    def score(self, player_id):
+        return self.scores[player_id]
+
+    def rank(self, player_id):
+        """ Returns 1-based leaderboard position of player, raises ValueError if player not on leaderboard """
+        if player_id not in self.scores:
+            raise ValueError(f"{player_id} is not on the leaderboard")
+        return self.ranking.index((-self.scores[player_id], player_id)) + 1
+
+    def player_ids(self, start=0, end=None):
+        """ Returns player_ids from position start to end (0-based, exclusive) in leaderboard order """
+        return [player_id for _, player_id in self.ranking.islice(start, end)]
+
+    def leader(self):
+        return self.ranking[0][1] if self.ranking else None
+
+    def last(self):
+        return self.ranking[-1][1] if self.ranking else None
+
+    def top_percentile_players(self, k):
+        """ Returns player_ids of the top k percentile, in leaderboard order """
+        return self.player_ids(0, floor(len(self) * k / 100))
+
+    def bottom_percentile_players(self, k):
+        """ Returns player_ids of the bottom k percentile, in leaderboard order """
+        return self.player_ids(ceil(len(self) * (100 - k) / 100), len(self))
+
+    def snapshot(self):
+        """ Returns leaderboard as a list of {player_id, score} in leaderboard order """
+        return [{'player_id': player_id, 'score': -negated_score} for negated_score, player_id in self.ranking]
@@ -0,0 +1,1066 @@
+"""
+In-process stand-ins for DynamoDB and SQS, selected with EXTREME_STARTUP_BACKEND=memory (see shared.aws).
+
+They implement the subset of the boto3 resource/client API used by the dynamodb package, GamesManager,
+QuizMaster, GameMonitor and Worker, with the same error codes, so the whole game loop runs on a
+laptop without network. Tables are created from dynamodb.schema, including their secondary indexes,
+and hold items as the DynamoDB resource returns them: numbers are Decimal and floats are rejected.
+Queues honour DelaySeconds and visibility timeouts against an injectable clock.
+
+Like the resource's client, the DynamoDB client takes and returns Python types, not typed
+attribute values. Every call emits botocore-style provide-client-params/before-call/after-call events on
+meta.events.
+"""
+from boto3.dynamodb.conditions import AttributeBase, ConditionBase
+from botocore.exceptions import ClientError
+from dynamodb.schema import TABLES
+from decimal import Decimal
+import copy
+import functools
+import itertools
+import math
+import re
+import threading
+import time
+import uuid
+
+# Limits enforced by the real services
+BATCH_WRITE_LIMIT = 25
+TRANSACT_WRITE_LIMIT = 100
+SQS_BATCH_LIMIT = 10
+SQS_MAX_DELAY = 900
+DEFAULT_VISIBILITY_TIMEOUT = 30
+
+
+def error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class Events:
+    """ Minimal botocore event emitter, so handlers registered on client.meta.events (e.g. call
+        counters) work with both backends """
+
+    def __init__(self):
+        self.handlers = []
+
+    def register(self, event_name, handler, unique_id=None):
+        self.handlers.append((event_name, handler))
+
+    def emit(self, event_name, **kwargs):
+        for name, handler in list(self.handlers):
+            if event_name == name or event_name.startswith(name + '.'):
+                handler(event_name=event_name, **kwargs)
+
+
+class OperationModel:
+    def __init__(self, name):
+        self.name = name
+
+
+class ClientMeta:
+    def __init__(self, service_name):
+        self.service_name = service_name
+        self.events = Events()
+
+
+class ResourceMeta:
+    def __init__(self, client):
+        self.client = client
+
+
+class MemoryClient:
+    """ Base of the fake clients: runs every operation under one lock, between its events """
+
+    def __init__(self, service_name):
+        self.meta = ClientMeta(service_name)
+        self.lock = threading.RLock()
+
+    def call(self, operation, params, run):
+        model = OperationModel(operation)
+        service = self.meta.service_name
+        # shared by the events of one call, as botocore's request context
+        context = {}
+        self.meta.events.emit(f'provide-client-params.{service}.{operation}', params=params, model=model,
+                              context=context)
+        self.meta.events.emit(f'before-call.{service}.{operation}', model=model, params=params, context=context)
+        try:
+            with self.lock:
+                response = run(**params)
+        except ClientError as err:
+            # botocore emits after-call with the parsed error before raising it
+            self.meta.events.emit(f'after-call.{service}.{operation}', model=model, params=params,
+                                  parsed=err.response, context=context)
+            raise
+        response.setdefault('ResponseMetadata', {'HTTPStatusCode': 200})
+        self.meta.events.emit(f'after-call.{service}.{operation}', model=model, params=params,
+                              parsed=response, context=context)
+        return response
+
+    def view(self):
+        """ Returns a client sharing the tables or queues of this one, with event handlers of its own """
+        view = copy.copy(self)
+        view.meta = ClientMeta(self.meta.service_name)
+        return view
+
+
+# DYNAMODB VALUES
+
+
+SCALARS = (str, Decimal, bool, bytes, type(None))
+CONTAINERS = (dict, list, set)
+
+
+def to_item(value):
+    """ Returns a copy of value as DynamoDB stores it: integers become Decimal, floats are rejected as boto3 does """
+    if type(value) in SCALARS:
+        return value
+    if isinstance(value, int):
+        return Decimal(value)
+    if isinstance(value, float):
+        raise TypeError("Float types are not supported. Use Decimal types instead.")
+    if isinstance(value, dict):
+        return {k: to_item(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_item(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return {to_item(v) for v in value}
+    raise TypeError(f"Unsupported type {type(value)} for value {value}")
+
+
+def copy_value(value):
+    """ Returns a deep copy of an item or attribute value. Leaves are immutable, so only containers are copied """
+    # leaves are checked inline, items are mostly flat
+    if isinstance(value, dict):
+        return {k: copy_value(v) if isinstance(v, CONTAINERS) else v for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_value(v) if isinstance(v, CONTAINERS) else v for v in value]
+    if isinstance(value, set):
+        return set(value)
+    return value
+
+
+def item_size(value):
+    """ Approximate size in bytes of an item or attribute value, as billed by DynamoDB """
+    if isinstance(value, dict):
+        return sum(len(k) + item_size(v) for k, v in value.items())
+    if isinstance(value, (list, set)):
+        return 3 + sum(item_size(v) + 1 for v in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, Decimal):
+        return 1 + math.ceil(len(value.as_tuple().digits) / 2)
+    return 1
+
+
+# DYNAMODB EXPRESSIONS
+
+TOKEN = re.compile(r"\s*(#\w+|:\w+|[A-Za-z_][\w.]*|<>|<=|>=|[=<>(),+\-])")
+COMPARATORS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+MISSING = object()
+
+
+def tokenize(expression):
+    tokens, position = [], 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if not match:
+            raise error('ValidationException', f"Invalid expression: {expression}", 'Expression')
+        tokens.append(match.group(1))
+        position = match.end()
+    return tokens
+
+
+class ExpressionParser:
+    """ Parses condition, update and projection expressions into closures over an item and the
+        expression attribute values. Names are resolved while parsing, values when evaluating, so a
+        parsed expression is reused by every call with the same expression and names (see parse) """
+
+    def __init__(self, expression, names=None):
+        self.tokens = tokenize(expression)
+        self.position = 0
+        self.names = names or {}
+
+    def peek(self, offset=0):
+        i = self.position + offset
+        return self.tokens[i] if i < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected is not None and token.upper() != expected):
+            raise error('ValidationException', f"Invalid expression, expected {expected} at {token}", 'Expression')
+        self.position += 1
+        return token
+
+    def done(self):
+        return self.position >= len(self.tokens)
+
+    def path(self):
+        token = self.take()
+        if token.startswith('#'):
+            if token not in self.names:
+                raise error('ValidationException', f"Undefined attribute name {token}", 'Expression')
+            return self.names[token]
+        return token
+
+    def operand(self):
+        """ Returns a function of the item and values giving the operand's value, MISSING if absent """
+        token = self.peek()
+        if token.startswith(':'):
+            self.take()
+            return lambda item, values: value(values, token)
+        if token.lower() == 'if_not_exists':
+            self.take(); self.take('(')
+            name = self.path(); self.take(',')
+            default = self.operand(); self.take(')')
+            return lambda item, values: item[name] if name in item else default(item, values)
+        if token.lower() == 'list_append':
+            self.take(); self.take('(')
+            first = self.operand(); self.take(',')
+            second = self.operand(); self.take(')')
+            return lambda item, values: list(first(item, values)) + list(second(item, values))
+        name = self.path()
+        return lambda item, values: item.get(name, MISSING)
+
+    # Conditions: or_condition := and_condition (OR and_condition)*
+
+    def condition(self):
+        left = self.and_condition()
+        while self.peek() and self.peek().upper() == 'OR':
+            self.take()
+            left = (lambda a, b: lambda item, values: a(item, values) or b(item, values))(left, self.and_condition())
+        return left
+
+    def and_condition(self):
+        left = self.not_condition()
+        while self.peek() and self.peek().upper() == 'AND':
+            self.take()
+            left = (lambda a, b: lambda item, values: a(item, values) and b(item, values))(left, self.not_condition())
+        return left
+
+    def not_condition(self):
+        if self.peek().upper() == 'NOT':
+            self.take()
+            inner = self.not_condition()
+            return lambda item, values: not inner(item, values)
+        return self.comparison()
+
+    def comparison(self):
+        token = self.peek()
+        if token == '(':
+            self.take()
+            inner = self.condition()
+            self.take(')')
+            return inner
+        function = token.lower()
+        if function in ('attribute_exists', 'attribute_not_exists') and self.peek(1) == '(':
+            self.take(); self.take('(')
+            name = self.path()
+            self.take(')')
+            exists = function == 'attribute_exists'
+            return lambda item, values: (name in item) == exists
+        if function in ('begins_with', 'contains') and self.peek(1) == '(':
+            self.take(); self.take('(')
+            left = self.operand(); self.take(',')
+            right = self.operand(); self.take(')')
+            if function == 'begins_with':
+                return lambda item, values: isinstance(left(item, values), str) and left(item, values).startswith(right(item, values))
+            return lambda item, values: left(item, values) is not MISSING and right(item, values) in left(item, values)
+
+        left = self.operand()
+        operator = self.take().upper()
+        if operator == 'BETWEEN':
+            low = self.operand(); self.take('AND')
+            high = self.operand()
+            return lambda item, values: compare('>=', left(item, values), low(item, values)) and compare('<=', left(item, values), high(item, values))
+        if operator not in COMPARATORS:
+            raise error('ValidationException', f"Unsupported operator {operator}", 'Expression')
+        right = self.operand()
+        return lambda item, values: compare(operator, left(item, values), right(item, values))
+
+    # Updates: SET path = value [+|- value], ... REMOVE path, ... ADD path value, ...
+
+    def updates(self):
+        """ Returns [(action, name, function of the item and values)] """
+        actions = []
+        while not self.done():
+            clause = self.take().upper()
+            while True:
+                name = self.path()
+                if clause == 'SET':
+                    self.take('=')
+                    value = self.operand()
+                    if self.peek() in ('+', '-'):
+                        operator = self.take()
+                        value = (lambda a, b, sign: lambda item, values: add(a(item, values), b(item, values), sign))(
+                            value, self.operand(), 1 if operator == '+' else -1)
+                    actions.append(('SET', name, value))
+                elif clause == 'REMOVE':
+                    actions.append(('REMOVE', name, None))
+                elif clause == 'ADD':
+                    actions.append(('ADD', name, self.operand()))
+                else:
+                    raise error('ValidationException', f"Unsupported update clause {clause}", 'UpdateItem')
+                if self.peek() != ',':
+                    break
+                self.take(',')
+        return actions
+
+    def projection(self):
+        names = [self.path()]
+        while not self.done():
+            self.take(',')
+            names.append(self.path())
+        return names
+
+
+def compare(operator, left, right):
+    if left is MISSING or right is MISSING or isinstance(left, bool) != isinstance(right, bool):
+        # a missing attribute, or one of another type, is different from every value
+        return operator == '<>'
+    try:
+        return COMPARATORS[operator](left, right)
+    except TypeError:
+        return operator == '<>'
+
+
+def value(values, token):
+    if token not in values:
+        raise error('ValidationException', f"Undefined attribute value {token}", 'Expression')
+    return values[token]
+
+
+def add(left, right, sign):
+    if left is MISSING or right is MISSING:
+        raise error('ValidationException',
+                    "The provided expression refers to an attribute that does not exist in the item", 'UpdateItem')
+    return left + sign * right
+
+
+def evaluate_condition(condition, item):
+    """ Evaluates a boto3 condition object (Key/Attr) against item """
+    expression = condition.get_expression()
+    operator, operands = expression['operator'], expression['values']
+    if operator == 'AND':
+        return all(evaluate_condition(operand, item) for operand in operands)
+    if operator == 'OR':
+        return any(evaluate_condition(operand, item) for operand in operands)
+    if operator == 'NOT':
+        return not evaluate_condition(operands[0], item)
+
+    values = [item.get(v.name, MISSING) if isinstance(v, AttributeBase) else to_item(v) for v in operands]
+    if operator in COMPARATORS:
+        return compare(operator, values[0], values[1])
+    if operator == 'BETWEEN':
+        return compare('>=', values[0], values[1]) and compare('<=', values[0], values[2])
+    if operator == 'begins_with':
+        return isinstance(values[0], str) and values[0].startswith(values[1])
+    if operator == 'contains':
+        return values[0] is not MISSING and values[1] in values[0]
+    if operator == 'IN':
+        return values[0] in values[1]
+    if operator == 'attribute_exists':
+        return values[0] is not MISSING
+    if operator == 'attribute_not_exists':
+        return values[0] is MISSING
+    raise error('ValidationException', f"Unsupported condition {operator}", 'Expression')
+
+
+def condition_function(condition, names, values):
+    if condition is None:
+        return lambda item: True
+    if isinstance(condition, ConditionBase):
+        return lambda item: evaluate_condition(condition, item)
+    function = parse(condition, names, 'condition')
+    values = to_item(values or {})
+    return lambda item: function(item, values)
+
+
+def parse(expression, names, kind):
+    """ Returns the parsed condition, updates or projection of expression """
+    return parse_cached(expression, tuple(sorted((names or {}).items())), kind)
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_cached(expression, names, kind):
+    # expressions are few and repeated with different values, so each is parsed once
+    parser = ExpressionParser(expression, dict(names))
+    parsed = getattr(parser, kind)()
+    if not parser.done():
+        raise error('ValidationException', f"Invalid {kind} {expression}", 'Expression')
+    return parsed
+
+
+def hash_key_value(condition, hash_key):
+    """ Returns the value the key condition sets the partition key to """
+    expression = condition.get_expression()
+    if expression['operator'] == 'AND':
+        for operand in expression['values']:
+            value = hash_key_value(operand, hash_key)
+            if value is not None:
+                return value
+    elif expression['operator'] == '=' and expression['values'][0].name == hash_key:
+        return expression['values'][1]
+    return None
+
+
+# DYNAMODB
+
+
+class MemoryTableData:
+    """ Items of one table, by partition key then sort key """
+
+    def __init__(self, definition):
+        self.name = definition['TableName']
+        self.definition = definition
+        self.hash_key, self.range_key = self.key_schema(definition['KeySchema'])
+        self.indexes = {
+            index['IndexName']: self.key_schema(index['KeySchema'])
+            for index in definition.get('GlobalSecondaryIndexes', []) + definition.get('LocalSecondaryIndexes', [])
+        }
+        self.global_indexes = {index['IndexName'] for index in definition.get('GlobalSecondaryIndexes', [])}
+        self.partitions = {}
+
+    @staticmethod
+    def key_schema(schema):
+        keys = {key['KeyType']: key['AttributeName'] for key in schema}
+        return keys['HASH'], keys.get('RANGE')
+
+    def check_consistent_read(self, index_name, consistent_read, operation):
+        if consistent_read and index_name in self.global_indexes:
+            raise error('ValidationException', "Consistent reads are not supported on global secondary indexes",
+                        operation)
+
+    def key(self, item, operation):
+        try:
+            hash_value = item[self.hash_key]
+            range_value = item[self.range_key] if self.range_key else None
+        except KeyError:
+            raise error('ValidationException', "The provided key element does not match the schema", operation)
+        return hash_value, range_value
+
+    def key_item(self, item):
+        return {k: item[k] for k in (self.hash_key, self.range_key) if k}
+
+    def get(self, key):
+        hash_value, range_value = key
+        return self.partitions.get(hash_value, {}).get(range_value)
+
+    def put(self, item):
+        hash_value, range_value = self.key(item, 'PutItem')
+        self.partitions.setdefault(hash_value, {})[range_value] = item
+
+    def delete(self, key):
+        hash_value, range_value = key
+        partition = self.partitions.get(hash_value, {})
+        partition.pop(range_value, None)
+        if not partition:
+            self.partitions.pop(hash_value, None)
+
+    def describe(self):
+        return {**self.definition, 'TableStatus': 'ACTIVE',
+                'ItemCount': sum(len(partition) for partition in self.partitions.values())}
+
+
+class MemoryDynamoDBClient(MemoryClient):
+    """ DynamoDB client. Tables of dynamodb.schema exist from the start """
+
+    def __init__(self, tables=TABLES):
+        super().__init__('dynamodb')
+        self.tables = {}
+        for definition in tables:
+            self.tables[definition['TableName']] = MemoryTableData(copy.deepcopy(definition))
+
+    def table(self, name, operation):
+        if name not in self.tables:
+            raise error('ResourceNotFoundException', f"Requested resource not found: Table: {name} not found", operation)
+        return self.tables[name]
+
+    # Control plane
+
+    def create_table(self, **params):
+        def run(**definition):
+            if definition['TableName'] in self.tables:
+                raise error('ResourceInUseException', f"Table already exists: {definition['TableName']}", 'CreateTable')
+            table = self.tables[definition['TableName']] = MemoryTableData(copy.deepcopy(definition))
+            return {'TableDescription': table.describe()}
+        return self.call('CreateTable', params, run)
+
+    def delete_table(self, **params):
+        def run(TableName):
+            table = self.table(TableName, 'DeleteTable')
+            del self.tables[TableName]
+            return {'TableDescription': table.describe()}
+        return self.call('DeleteTable', params, run)
+
+    def describe_table(self, **params):
+        return self.call('DescribeTable', params,
+                         lambda TableName: {'Table': self.table(TableName, 'DescribeTable').describe()})
+
+    def list_tables(self, **params):
+        return self.call('ListTables', params, lambda **kwargs: {'TableNames': sorted(self.tables)})
+
+    # Items
+
+    def get_item(self, **params):
+        def run(TableName, Key, ConsistentRead=False, ProjectionExpression=None, ExpressionAttributeNames=None,
+                ReturnConsumedCapacity='NONE'):
+            table = self.table(TableName, 'GetItem')
+            item = table.get(table.key(to_item(Key), 'GetItem'))
+            response = {}
+            if item is not None:
+                response['Item'] = project(item, ProjectionExpression, ExpressionAttributeNames)
+            return with_capacity(response, ReturnConsumedCapacity, TableName,
+                                 lambda: read_units(item_size(item) if item else 0, ConsistentRead))
+        return self.call('GetItem', params, run)
+
+    def put_item(self, **params):
+        def run(TableName, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity='NONE'):
+            table = self.table(TableName, 'PutItem')
+            item = to_item(Item)
+            old = table.get(table.key(item, 'PutItem'))
+            check(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, old, 'PutItem')
+            table.put(item)
+            response = {'Attributes': copy_value(old)} if ReturnValues == 'ALL_OLD' and old else {}
+            return with_capacity(response, ReturnConsumedCapacity, TableName, lambda: write_units(item, old))
+        return self.call('PutItem', params, run)
+
+    def update_item(self, **params):
+        def run(TableName, Key, UpdateExpression=None, ConditionExpression=None, ExpressionAttributeNames=None,
+                ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity='NONE'):
+            table = self.table(TableName, 'UpdateItem')
+            key = table.key(to_item(Key), 'UpdateItem')
+            old = table.get(key)
+            check(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, old, 'UpdateItem')
+            new, updated = apply_updates(table, old if old is not None else to_item(Key), UpdateExpression,
+                                         ExpressionAttributeNames, ExpressionAttributeValues)
+            table.put(new)
+            response = {}
+            if ReturnValues == 'ALL_NEW':
+                response['Attributes'] = copy_value(new)
+            elif ReturnValues == 'ALL_OLD' and old:
+                response['Attributes'] = copy_value(old)
+            elif ReturnValues == 'UPDATED_NEW':
+                response['Attributes'] = {k: copy_value(new[k]) for k in updated if k in new}
+            elif ReturnValues == 'UPDATED_OLD' and old:
+                response['Attributes'] = {k: copy_value(old[k]) for k in updated if k in old}
+            return with_capacity(response, ReturnConsumedCapacity, TableName, lambda: write_units(new, old))
+        return self.call('UpdateItem', params, run)
+
+    def delete_item(self, **params):
+        def run(TableName, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                ExpressionAttributeValues=None, ReturnValues='NONE', ReturnConsumedCapacity='NONE'):
+            table = self.table(TableName, 'DeleteItem')
+            key = table.key(to_item(Key), 'DeleteItem')
+            old = table.get(key)
+            check(ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, old, 'DeleteItem')
+            table.delete(key)
+            response = {'Attributes': copy_value(old)} if ReturnValues == 'ALL_OLD' and old else {}
+            return with_capacity(response, ReturnConsumedCapacity, TableName, lambda: write_units(old))
+        return self.call('DeleteItem', params, run)
+
+    def query(self, **params):
+        def run(TableName, KeyConditionExpression, IndexName=None, ScanIndexForward=True, **options):
+            table = self.table(TableName, 'Query')
+            table.check_consistent_read(IndexName, options.get('ConsistentRead'), 'Query')
+            hash_key, range_key = table.indexes[IndexName] if IndexName else (table.hash_key, table.range_key)
+            hash_value = to_item(hash_key_value(KeyConditionExpression, hash_key))
+            if hash_value is None:
+                raise error('ValidationException', "Query condition missed key schema element", 'Query')
+
+            if IndexName and hash_key != table.hash_key:
+                candidates = [item for partition in table.partitions.values() for item in partition.values()
+                              if item.get(hash_key) == hash_value]
+            else:
+                candidates = list(table.partitions.get(hash_value, {}).values())
+            if range_key:
+                # indexes only hold items with their key attributes
+                candidates = [item for item in candidates if range_key in item]
+            order = lambda item: tuple(item[k] for k in (range_key, table.range_key) if k)
+            candidates.sort(key=order, reverse=not ScanIndexForward)
+
+            key_condition = condition_function(KeyConditionExpression, None, None)
+            candidates = [item for item in candidates if key_condition(item)]
+            index_keys = [k for k in (hash_key, range_key) if k]
+            return read_page(table, TableName, candidates, order, not ScanIndexForward, index_keys, **options)
+        return self.call('Query', params, run)
+
+    def scan(self, **params):
+        def run(TableName, IndexName=None, **options):
+            table = self.table(TableName, 'Scan')
+            table.check_consistent_read(IndexName, options.get('ConsistentRead'), 'Scan')
+            order = lambda item: tuple(item[k] for k in (table.hash_key, table.range_key) if k)
+            candidates = sorted((item for partition in table.partitions.values() for item in partition.values()),
+                                key=order)
+            index_keys = [k for k in table.indexes[IndexName] if k] if IndexName else []
+            if index_keys:
+                candidates = [item for item in candidates if all(k in item for k in index_keys)]
+            return read_page(table, TableName, candidates, order, False, index_keys, **options)
+        return self.call('Scan', params, run)
+
+    def batch_write_item(self, **params):
+        def run(RequestItems, ReturnConsumedCapacity='NONE'):
+            if sum(len(requests) for requests in RequestItems.values()) > BATCH_WRITE_LIMIT:
+                raise error('ValidationException',
+                            f"Too many items requested for the BatchWriteItem call, max {BATCH_WRITE_LIMIT}",
+                            'BatchWriteItem')
+            capacity = {}
+            for table_name, requests in RequestItems.items():
+                table = self.table(table_name, 'BatchWriteItem')
+                for request in requests:
+                    if 'PutRequest' in request:
+                        item = to_item(request['PutRequest']['Item'])
+                        old = table.get(table.key(item, 'BatchWriteItem'))
+                        table.put(item)
+                    else:
+                        key = table.key(to_item(request['DeleteRequest']['Key']), 'BatchWriteItem')
+                        item = old = table.get(key)
+                        table.delete(key)
+                    if ReturnConsumedCapacity != 'NONE':
+                        capacity[table_name] = capacity.get(table_name, 0) + write_units(item, old)
+            response = {'UnprocessedItems': {}}
+            if ReturnConsumedCapacity != 'NONE':
+                response['ConsumedCapacity'] = [
+                    {'TableName': name, 'CapacityUnits': units} for name, units in capacity.items()]
+            return response
+        return self.call('BatchWriteItem', params, run)
+
+    def transact_write_items(self, **params):
+        def run(TransactItems, ReturnConsumedCapacity='NONE', ClientRequestToken=None):
+            if len(TransactItems) > TRANSACT_WRITE_LIMIT:
+                raise error('ValidationException', "Too many items in the transaction", 'TransactWriteItems')
+            # every condition is checked before anything is written, so the transaction applies whole or not at all
+            reasons, writes = [], []
+            for action in TransactItems:
+                (kind, request), = action.items()
+                table = self.table(request['TableName'], 'TransactWriteItems')
+                key = table.key(to_item(request['Item'] if kind == 'Put' else request['Key']), 'TransactWriteItems')
+                old = table.get(key)
+                passed = condition_function(request.get('ConditionExpression'), request.get('ExpressionAttributeNames'),
+                                            request.get('ExpressionAttributeValues'))(old or {})
+                reasons.append({'Code': 'None'} if passed else
+                               {'Code': 'ConditionalCheckFailed', 'Message': 'The conditional request failed'})
+                writes.append((kind, request, table, key, old))
+            if any(reason['Code'] != 'None' for reason in reasons):
+                err = error('TransactionCanceledException',
+                            "Transaction cancelled, please refer cancellation reasons for specific reasons [%s]"
+                            % ", ".join(reason['Code'] for reason in reasons), 'TransactWriteItems')
+                err.response['CancellationReasons'] = reasons
+                raise err
+
+            capacity = {}
+            for kind, request, table, key, old in writes:
+                if kind == 'Put':
+                    item = to_item(request['Item'])
+                    table.put(item)
+                elif kind == 'Update':
+                    item, _ = apply_updates(table, old if old is not None else to_item(request['Key']),
+                                            request['UpdateExpression'], request.get('ExpressionAttributeNames'),
+                                            request.get('ExpressionAttributeValues'))
+                    table.put(item)
+                elif kind == 'Delete':
+                    item = old
+                    table.delete(key)
+                else:
+                    continue
+                if ReturnConsumedCapacity != 'NONE':
+                    # transactional writes cost twice as much
+                    capacity[table.name] = capacity.get(table.name, 0) + 2 * write_units(item, old)
+            response = {}
+            if ReturnConsumedCapacity != 'NONE':
+                response['ConsumedCapacity'] = [
+                    {'TableName': name, 'CapacityUnits': units} for name, units in capacity.items()]
+            return response
+        return self.call('TransactWriteItems', params, run)
+
+
+def check(condition, names, values, old, operation):
+    if condition is not None and not condition_function(condition, names, values)(old or {}):
+        raise error('ConditionalCheckFailedException', "The conditional request failed", operation)
+
+
+def apply_updates(table, item, expression, names, values):
+    """ Returns (updated copy of item, names of the updated attributes) """
+    # stored values are replaced rather than changed in place, so the old and new item can share them
+    new = dict(item)
+    if expression is None:
+        return new, []
+    actions = parse(expression, names, 'updates')
+    values = to_item(values or {})
+    key_names = {table.hash_key, table.range_key}
+    # every value is computed from the item before the update
+    results = [(action, name, function(item, values) if function else None) for action, name, function in actions]
+    for action, name, value in results:
+        if name in key_names:
+            raise error('ValidationException', f"Cannot update attribute {name}. This attribute is part of the key",
+                        'UpdateItem')
+        if action == 'SET':
+            new[name] = value
+        elif action == 'REMOVE':
+            new.pop(name, None)
+        elif isinstance(value, set):
+            new[name] = new.get(name, set()) | value
+        else:
+            new[name] = new.get(name, Decimal(0)) + value
+    return new, [name for _, name, _ in results]
+
+
+def project(item, projection, names):
+    if not projection:
+        return copy_value(item)
+    attributes = parse(projection, names, 'projection')
+    return {name: copy_value(item[name]) for name in attributes if name in item}
+
+
+def read_page(table, table_name, candidates, order, reverse, index_keys, FilterExpression=None,
+              ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None,
+              Limit=None, ExclusiveStartKey=None, ConsistentRead=False, Select='ALL_ATTRIBUTES',
+              ReturnConsumedCapacity='NONE'):
+    """ Reads candidates, sorted by order, after ExclusiveStartKey. Limit counts items read before filtering """
+    if ExclusiveStartKey is not None:
+        # positioned by key value rather than by item, so the start item may have been deleted since
+        start = order(to_item(ExclusiveStartKey))
+        candidates = [item for item in candidates if (order(item) < start if reverse else order(item) > start)]
+
+    evaluated = candidates[:Limit] if Limit else candidates
+    matches = condition_function(FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+    items = [item for item in evaluated if matches(item)]
+
+    response = {'Count': len(items), 'ScannedCount': len(evaluated)}
+    if Select != 'COUNT':
+        response['Items'] = [project(item, ProjectionExpression, ExpressionAttributeNames) for item in items]
+    if Limit and len(candidates) > Limit:
+        last = evaluated[-1]
+        response['LastEvaluatedKey'] = {**table.key_item(last), **{k: last[k] for k in index_keys}}
+    return with_capacity(response, ReturnConsumedCapacity, table_name,
+                         lambda: read_units(sum(item_size(item) for item in evaluated), ConsistentRead))
+
+
+def read_units(size, consistent):
+    units = max(1, math.ceil(size / 4096))
+    return units if consistent else units / 2
+
+
+def write_units(*items):
+    return max(1, math.ceil(max(item_size(item) if item else 0 for item in items) / 1024))
+
+
+def with_capacity(response, return_consumed_capacity, table_name, units):
+    # units is a function, item sizes are only computed when the consumed capacity is asked for
+    if return_consumed_capacity and return_consumed_capacity != 'NONE':
+        response['ConsumedCapacity'] = {'TableName': table_name, 'CapacityUnits': units()}
+    return response
+
+
+class MemoryTable:
+    """ Table resource """
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = self.table_name = name
+
+    def get_item(self, **params):
+        return self.client.get_item(TableName=self.name, **params)
+
+    def put_item(self, **params):
+        return self.client.put_item(TableName=self.name, **params)
+
+    def update_item(self, **params):
+        return self.client.update_item(TableName=self.name, **params)
+
+    def delete_item(self, **params):
+        return self.client.delete_item(TableName=self.name, **params)
+
+    def query(self, **params):
+        return self.client.query(TableName=self.name, **params)
+
+    def scan(self, **params):
+        return self.client.scan(TableName=self.name, **params)
+
+    def wait_until_exists(self):
+        self.client.describe_table(TableName=self.name)
+
+
+class MemoryDynamoDB:
+    """ DynamoDB service resource """
+
+    def __init__(self, client):
+        self.meta = ResourceMeta(client)
+
+    def Table(self, name):
+        return MemoryTable(self.meta.client, name)
+
+    def create_table(self, **definition):
+        self.meta.client.create_table(**definition)
+        return self.Table(definition['TableName'])
+
+    def batch_write_item(self, **params):
+        return self.meta.client.batch_write_item(**params)
+
+
+# SQS
+
+
+class MemoryMessage:
+    def __init__(self, body, visible_at, sequence):
+        self.message_id = str(uuid.uuid4())
+        self.body = body
+        self.visible_at = visible_at
+        self.sequence = sequence
+        self.receipt_handle = None
+        self.receive_count = 0
+
+
+class MemorySQSClient(MemoryClient):
+    """ SQS client of standard queues. Delayed and in-flight messages become visible on the clock,
+        long polls wait in real time for a message to be sent or become visible """
+
+    def __init__(self, clock=time.time):
+        super().__init__('sqs')
+        self.clock = clock
+        self.queues = {}    # url -> [MemoryMessage]
+        self.names = {}     # name -> url
+        self.sequence = itertools.count()
+        self.changed = threading.Condition(self.lock)
+
+    def queue(self, url, operation):
+        if url not in self.queues:
+            raise error('AWS.SimpleQueueService.NonExistentQueue', "The specified queue does not exist.", operation)
+        return self.queues[url]
+
+    def create_queue(self, **params):
+        def run(QueueName, Attributes=None, tags=None):
+            if QueueName not in self.names:
+                url = f"memory://sqs/{QueueName}"
+                self.names[QueueName] = url
+                self.queues[url] = []
+            return {'QueueUrl': self.names[QueueName]}
+        return self.call('CreateQueue', params, run)
+
+    def get_queue_url(self, **params):
+        def run(QueueName, QueueOwnerAWSAccountId=None):
+            if QueueName not in self.names:
+                raise error('AWS.SimpleQueueService.NonExistentQueue', "The specified queue does not exist.",
+                            'GetQueueUrl')
+            return {'QueueUrl': self.names[QueueName]}
+        return self.call('GetQueueUrl', params, run)
+
+    def delete_queue(self, **params):
+        def run(QueueUrl):
+            self.queue(QueueUrl, 'DeleteQueue')
+            del self.queues[QueueUrl]
+            self.names = {name: url for name, url in self.names.items() if url != QueueUrl}
+            return {}
+        return self.call('DeleteQueue', params, run)
+
+    def purge_queue(self, **params):
+        def run(QueueUrl):
+            self.queue(QueueUrl, 'PurgeQueue').clear()
+            return {}
+        return self.call('PurgeQueue', params, run)
+
+    def get_queue_attributes(self, **params):
+        def run(QueueUrl, AttributeNames=('All',)):
+            messages = self.queue(QueueUrl, 'GetQueueAttributes')
+            now = self.clock()
+            attributes = {
+                'ApproximateNumberOfMessages': sum(
+                    1 for m in messages if m.visible_at <= now),
+                'ApproximateNumberOfMessagesNotVisible': sum(
+                    1 for m in messages if m.visible_at > now and m.receipt_handle),
+                'ApproximateNumberOfMessagesDelayed': sum(
+                    1 for m in messages if m.visible_at > now and not m.receipt_handle),
+            }
+            if 'All' not in AttributeNames:
+                attributes = {k: v for k, v in attributes.items() if k in AttributeNames}
+            return {'Attributes': {k: str(v) for k, v in attributes.items()}}
+        return self.call('GetQueueAttributes', params, run)
+
+    def send_message(self, **params):
+        def run(QueueUrl, MessageBody, DelaySeconds=0, MessageAttributes=None):
+            message = self.__enqueue(QueueUrl, MessageBody, DelaySeconds, 'SendMessage')
+            return {'MessageId': message.message_id}
+        return self.call('SendMessage', params, run)
+
+    def send_message_batch(self, **params):
+        def run(QueueUrl, Entries):
+            if len(Entries) > SQS_BATCH_LIMIT:
+                raise error('AWS.SimpleQueueService.TooManyEntriesInBatchRequest',
+                            f"Maximum number of entries per request are {SQS_BATCH_LIMIT}", 'SendMessageBatch')
+            successful = []
+            for entry in Entries:
+                message = self.__enqueue(QueueUrl, entry['MessageBody'], entry.get('DelaySeconds', 0), 'SendMessageBatch')
+                successful.append({'Id': entry['Id'], 'MessageId': message.message_id})
+            return {'Successful': successful, 'Failed': []}
+        return self.call('SendMessageBatch', params, run)
+
+    def receive_message(self, **params):
+        def run(QueueUrl, MaxNumberOfMessages=1, WaitTimeSeconds=0, VisibilityTimeout=DEFAULT_VISIBILITY_TIMEOUT,
+                AttributeNames=None, MessageAttributeNames=None, MessageSystemAttributeNames=None):
+            messages = self.queue(QueueUrl, 'ReceiveMessage')
+            deadline = time.monotonic() + WaitTimeSeconds
+            while True:
+                now = self.clock()
+                visible = sorted((m for m in messages if m.visible_at <= now), key=lambda m: (m.visible_at, m.sequence))
+                received = visible[:MaxNumberOfMessages]
+                remaining = deadline - time.monotonic()
+                if received or remaining <= 0:
+                    break
+                upcoming = [m.visible_at - now for m in messages]
+                self.changed.wait(min([remaining] + upcoming))
+                messages = self.queue(QueueUrl, 'ReceiveMessage')
+
+            for message in received:
+                message.visible_at = now + VisibilityTimeout
+                message.receipt_handle = str(uuid.uuid4())
+                message.receive_count += 1
+            return {'Messages': [
+                {'MessageId': m.message_id, 'ReceiptHandle': m.receipt_handle, 'Body': m.body,
+                 'Attributes': {'ApproximateReceiveCount': str(m.receive_count)}}
+                for m in received
+            ]} if received else {}
+        return self.call('ReceiveMessage', params, run)
+
+    def delete_message(self, **params):
+        def run(QueueUrl, ReceiptHandle):
+            self.__delete(QueueUrl, ReceiptHandle, 'DeleteMessage')
+            return {}
+        return self.call('DeleteMessage', params, run)
+
+    def delete_message_batch(self, **params):
+        def run(QueueUrl, Entries):
+            if len(Entries) > SQS_BATCH_LIMIT:
+                raise error('AWS.SimpleQueueService.TooManyEntriesInBatchRequest',
+                            f"Maximum number of entries per request are {SQS_BATCH_LIMIT}", 'DeleteMessageBatch')
+            for entry in Entries:
+                self.__delete(QueueUrl, entry['ReceiptHandle'], 'DeleteMessageBatch')
+            return {'Successful': [{'Id': entry['Id']} for entry in Entries], 'Failed': []}
+        return self.call('DeleteMessageBatch', params, run)
+
+    def change_message_visibility(self, **params):
+        def run(QueueUrl, ReceiptHandle, VisibilityTimeout):
+            for message in self.queue(QueueUrl, 'ChangeMessageVisibility'):
+                if message.receipt_handle == ReceiptHandle:
+                    message.visible_at = self.clock() + VisibilityTimeout
+                    self.changed.notify_all()
+                    return {}
+            raise error('ReceiptHandleIsInvalid', "The input receipt handle is invalid.", 'ChangeMessageVisibility')
+        return self.call('ChangeMessageVisibility', params, run)
+
+    def change_message_visibility_batch(self, **params):
+        def run(QueueUrl, Entries):
+            if len(Entries) > SQS_BATCH_LIMIT:
+                raise error('AWS.SimpleQueueService.TooManyEntriesInBatchRequest',
+                            f"Maximum number of entries per request are {SQS_BATCH_LIMIT}", 'ChangeMessageVisibilityBatch')
+            messages = {m.receipt_handle: m for m in self.queue(QueueUrl, 'ChangeMessageVisibilityBatch') if m.receipt_handle}
+            successful, failed = [], []
+            for entry in Entries:
+                message = messages.get(entry['ReceiptHandle'])
+                if message is None:
+                    failed.append({'Id': entry['Id'], 'Code': 'ReceiptHandleIsInvalid', 'SenderFault': True,
+                                   'Message': "The input receipt handle is invalid."})
+                    continue
+                message.visible_at = self.clock() + entry['VisibilityTimeout']
+                successful.append({'Id': entry['Id']})
+            self.changed.notify_all()
+            return {'Successful': successful, 'Failed': failed}
+        return self.call('ChangeMessageVisibilityBatch', params, run)
+
+    def next_visible_at(self, QueueUrl):
+        """ Returns the clock time at which the next message of the queue becomes visible, or None if the
+            queue is empty. Not an SQS operation, it lets a simulation advance a virtual clock to the next message """
+        with self.lock:
+            return min((m.visible_at for m in self.queue(QueueUrl, 'NextVisibleAt')), default=None)
+
+    def __enqueue(self, url, body, delay, operation):
+        if not 0 <= delay <= SQS_MAX_DELAY:
+            raise error('InvalidParameterValue', f"DelaySeconds must be between 0 and {SQS_MAX_DELAY}", operation)
+        message = MemoryMessage(body, self.clock() + delay, next(self.sequence))
+        self.queue(url, operation).append(message)
+        self.changed.notify_all()
+        return message
+
+    def __delete(self, url, receipt_handle, operation):
+        messages = self.queue(url, operation)
+        # deleting with a stale receipt handle succeeds without deleting, as on SQS
+        messages[:] = [m for m in messages if m.receipt_handle != receipt_handle]
+
+
+class MemoryQueue:
+    """ Queue resource """
+
+    def __init__(self, client, url):
+        self.client = client
+        self.url = url
+
+    @property
+    def attributes(self):
+        return self.client.get_queue_attributes(QueueUrl=self.url)['Attributes']
+
+    def send_message(self, **params):
+        return self.client.send_message(QueueUrl=self.url, **params)
+
+    def send_messages(self, **params):
+        return self.client.send_message_batch(QueueUrl=self.url, **params)
+
+    def purge(self):
+        return self.client.purge_queue(QueueUrl=self.url)
+
+
+class MemorySQS:
+    """ SQS service resource """
+
+    def __init__(self, client):
+        self.meta = ResourceMeta(client)
+
+    def Queue(self, url):
+        return MemoryQueue(self.meta.client, url)
+
+    def create_queue(self, **params):
+        return self.Queue(self.meta.client.create_queue(**params)['QueueUrl'])
+
+    def get_queue_by_name(self, **params):
+        return self.Queue(self.meta.client.get_queue_url(**params)['QueueUrl'])
+
+
+# Backend interface, the same as boto3's: resource(service_name) and client(service_name). State is
+# process-wide, so every resource and client of a service sees the same tables and queues. As with boto3,
+# every resource has a client of its own, so event handlers registered on it only see its calls
+
+RESOURCES = {'dynamodb': MemoryDynamoDB, 'sqs': MemorySQS}
+CLIENTS = {'dynamodb': lambda clock: MemoryDynamoDBClient(), 'sqs': lambda clock: MemorySQSClient(clock)}
+
+_lock = threading.Lock()
+_clients = {}
+_clock = time.time
+
+
+def client(service_name, **kwargs):
+    with _lock:
+        if service_name not in _clients:
+            if service_name not in CLIENTS:
+                raise ValueError(f"The in-memory backend has no {service_name} service")
+            _clients[service_name] = CLIENTS[service_name](_clock)
+        return _clients[service_name]
+
+
+def resource(service_name, **kwargs):
+    if service_name not in RESOURCES:
+        raise ValueError(f"The in-memory backend has no {service_name} service")
+    return RESOURCES[service_name](client(service_name).view())
+
+
+def reset(clock=time.time):
+    """ Drops every table item and queue. Queue delays and visibility timeouts then run on clock """
+    global _clock
+    with _lock:
+        _clients.clear()
+        _clock = clock
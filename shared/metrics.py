@@ -0,0 +1,304 @@
+"""
+Process metrics in the Prometheus text format, scraped from the Flask app's /metrics endpoint.
+
+Counters, gauges and histograms with labels, kept in a Registry, and the instrumentation hooked into
+the app: request counts and durations per route, calls and durations per GamesManager method, and
+calls, errors (e.g. throttling) and consumed capacity per DynamoDB table and operation, counted from
+the botocore events of the client so every table class is covered. Values that are cheap to read at
+scrape time (GameCache lookups, queue depths) are refreshed by collectors when the registry is exposed.
+
+The text format (version 0.0.4) is written here, the app doesn't depend on prometheus_client.
+"""
+from botocore.exceptions import ClientError
+from dynamodb.games import Games
+from shared import aws
+import functools
+import inspect
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds, the default buckets of the Prometheus clients
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# DynamoDB operations that report the capacity they consume when asked to
+CAPACITY_OPERATIONS = {
+    "GetItem", "PutItem", "UpdateItem", "DeleteItem", "Query", "Scan",
+    "BatchGetItem", "BatchWriteItem", "TransactGetItems", "TransactWriteItems",
+}
+
+# SQS attributes of a queue's depth, exposed as the state label of sqs_queue_messages
+QUEUE_ATTRIBUTES = {
+    "ApproximateNumberOfMessages": "visible",
+    "ApproximateNumberOfMessagesNotVisible": "in_flight",
+    "ApproximateNumberOfMessagesDelayed": "delayed",
+}
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """ Samples of one metric, label values -> value """
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def value(self, **labels):
+        return self.samples.get(self.key(labels), 0)
+
+    def lines(self):
+        with self.lock:
+            samples = sorted(self.samples.items())
+        return [f"{self.name}{format_labels(self.labels, key)} {format_value(value)}" for key, value in samples]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def set(self, total, **labels):
+        """ Sets the total of a count kept elsewhere, read by a collector at scrape time """
+        key = self.key(labels)
+        with self.lock:
+            self.samples[key] = total
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.samples[key] = value
+
+
+class Histogram(Metric):
+    """ Samples are [bucket counts..., sum, count], bucket counts aren't cumulative until exposed """
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            sample = self.samples.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[i] += 1
+                    break
+            sample[-2] += value
+            sample[-1] += 1
+
+    def value(self, **labels):
+        """ Returns (count, sum) """
+        sample = self.samples.get(self.key(labels))
+        return (sample[-1], sample[-2]) if sample else (0, 0)
+
+    def lines(self):
+        with self.lock:
+            samples = sorted((key, list(sample)) for key, sample in self.samples.items())
+        lines = []
+        for key, sample in samples:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), sample[:-2] + [sample[-1] - sum(sample[:-2])]):
+                cumulative += count
+                labels = format_labels(self.labels, key, [("le", format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {format_value(sample[-2])}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {sample[-1]}")
+        return lines
+
+
+class Registry:
+    """ Metrics of the process, by name, and the collectors refreshing metrics before they're exposed """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+
+    def register(self, metric):
+        with self.lock:
+            existing = self.metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric) or existing.labels != metric.labels:
+            raise ValueError(f"Metric {metric.name} is already registered as another {existing.kind}")
+        return existing
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def collector(self, collect):
+        """ Adds a function called before every exposition """
+        self.collectors.append(collect)
+        return collect
+
+    def get(self, name):
+        return self.metrics.get(name)
+
+    def exposition(self):
+        """ Returns every metric in the Prometheus text format """
+        for collect in self.collectors:
+            try:
+                collect()
+            except Exception as err:
+                # a failing collector leaves its metrics at their last value
+                print("Couldn't collect metrics with", getattr(collect, "__name__", collect), err)
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.lines())
+        return "\n".join(lines) + "\n"
+
+
+def instrument_methods(obj, registry, prefix, timer=time.perf_counter):
+    """ Replaces the public methods of obj by wrappers counting their calls, errors and durations,
+        labelled by method """
+    duration = registry.histogram(f"{prefix}_call_duration_seconds", f"Duration of {prefix} method calls",
+                                  ["method"])
+    errors = registry.counter(f"{prefix}_call_errors_total", f"{prefix} method calls that raised", ["method"])
+
+    def wrap(name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            start = timer()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                errors.inc(method=name)
+                raise
+            finally:
+                duration.observe(timer() - start, method=name)
+        return wrapper
+
+    # properties (e.g. the queues) are left alone, only functions of the class are wrapped
+    for name, _ in inspect.getmembers(type(obj), inspect.isfunction):
+        if not name.startswith("_"):
+            setattr(obj, name, wrap(name, getattr(obj, name)))
+    return obj
+
+
+class DynamoDBMetrics:
+    """ Calls, errors, durations and consumed capacity of a DynamoDB client, per table and operation.
+        Operations that can report their consumed capacity are asked to, unless the caller did """
+
+    def __init__(self, registry, timer=time.perf_counter):
+        self.timer = timer
+        self.calls = registry.counter("dynamodb_calls_total", "DynamoDB calls", ["table", "operation"])
+        self.errors = registry.counter("dynamodb_errors_total", "DynamoDB calls that failed, by error code",
+                                       ["table", "operation", "code"])
+        self.duration = registry.histogram("dynamodb_call_duration_seconds", "Duration of DynamoDB calls",
+                                           ["table", "operation"])
+        self.capacity = registry.counter("dynamodb_consumed_capacity_units_total",
+                                         "Capacity units consumed, per table", ["table", "operation"])
+
+    def register(self, client):
+        client.meta.events.register("provide-client-params.dynamodb", self.before_call)
+        client.meta.events.register("after-call.dynamodb", self.after_call)
+        return self
+
+    def before_call(self, params, model, context, **kwargs):
+        if model.name in CAPACITY_OPERATIONS:
+            params.setdefault("ReturnConsumedCapacity", "TOTAL")
+        context["metrics_table"] = table_label(params)
+        context["metrics_start"] = self.timer()
+
+    def after_call(self, parsed, model, context, **kwargs):
+        table = context.get("metrics_table", "-")
+        operation = model.name
+        self.calls.inc(table=table, operation=operation)
+        if "metrics_start" in context:
+            self.duration.observe(self.timer() - context["metrics_start"], table=table, operation=operation)
+        if "Error" in parsed:
+            self.errors.inc(table=table, operation=operation, code=parsed["Error"].get("Code", "Unknown"))
+        capacity = parsed.get("ConsumedCapacity", [])
+        # one dict for single-table operations, a list for batches and transactions
+        for consumed in [capacity] if isinstance(capacity, dict) else capacity:
+            self.capacity.inc(float(consumed.get("CapacityUnits", 0)), table=consumed.get("TableName", table),
+                              operation=operation)
+
+
+def table_label(params):
+    """ Returns the table of a call, the tables of a batch or transaction joined with commas """
+    if "TableName" in params:
+        return params["TableName"]
+    if "RequestItems" in params:
+        return ",".join(sorted(params["RequestItems"]))
+    if "TransactItems" in params:
+        return ",".join(sorted({
+            request["TableName"] for item in params["TransactItems"] for request in item.values()
+        }))
+    return "-"
+
+
+def instrument_dynamodb(client, registry):
+    return DynamoDBMetrics(registry).register(client)
+
+
+def instrument_game_cache(registry):
+    """ Exposes the hits and misses of the process-wide GameCache """
+    lookups = registry.counter("game_cache_lookups_total", "GameCache lookups since the process started", ["result"])
+
+    @registry.collector
+    def collect_game_cache():
+        # read at scrape time, the cache can be swapped (e.g. by the simulator)
+        lookups.set(Games.cache.hits, result="hit")
+        lookups.set(Games.cache.misses, result="miss")
+
+
+def instrument_queues(registry, queue_names):
+    """ Exposes the approximate depth of every queue, read with one GetQueueAttributes call per scrape """
+    messages = registry.gauge("sqs_queue_messages", "Approximate messages of a queue", ["queue", "state"])
+
+    @registry.collector
+    def collect_queues():
+        sqs = aws.client("sqs")
+        for queue_name in queue_names:
+            try:
+                attributes = sqs.get_queue_attributes(QueueUrl=aws.queue_url(queue_name),
+                                                      AttributeNames=list(QUEUE_ATTRIBUTES))['Attributes']
+            except ClientError as err:
+                print("Couldn't get attributes of queue", queue_name, err.response['Error']['Code'])
+                continue
+            for attribute, state in QUEUE_ATTRIBUTES.items():
+                messages.set(int(attributes.get(attribute, 0)), queue=queue_name, state=state)
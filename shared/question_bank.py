@@ -0,0 +1,76 @@
+import json
+import os
+import random
+import tempfile
+import threading
+
+# Banks are found next to this module, so they load wherever the package is deployed
+YAML_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "yaml")
+# Compiled banks are cached here, /tmp being the only writable directory on Lambda. The cache is JSON, not
+# pickle, as anyone can write to /tmp: a planted file can't run code when loaded
+CACHE_DIR = os.environ.get("QUESTION_BANK_CACHE_DIR", tempfile.gettempdir())
+CACHE_VERSION = 2
+
+
+class QuestionBank:
+    """ Cards of a YAML question bank, parsed once per process and kept as one column per field,
+        so that sampling a card is O(1) """
+
+    def __init__(self, name, fields, yaml_dir=YAML_DIR, cache_dir=CACHE_DIR):
+        self.name = name
+        self.fields = fields
+        self.path = os.path.join(yaml_dir, f"{name}.yaml")
+        self.cache_path = os.path.join(cache_dir, f"question_bank_{name}.json")
+        self.columns = self.load()
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def sample(self, rng=random):
+        """ Returns the fields of a random card as a tuple """
+        i = rng.randrange(len(self))
+        return tuple(column[i] for column in self.columns)
+
+    def load(self):
+        """ Returns the bank's columns from the compiled cache if it matches the YAML file, else parses
+            the YAML file and compiles it """
+        stat = os.stat(self.path)
+        key = [CACHE_VERSION, self.path, stat.st_mtime_ns, stat.st_size, list(self.fields)]
+
+        try:
+            with open(self.cache_path, "r") as infile:
+                cached = json.load(infile)
+            if cached["key"] == key:
+                return tuple(tuple(column) for column in cached["columns"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        # only needed when the cache is stale, so not loaded on a cold start with a cached bank
+        import yaml
+        with open(self.path, "r") as infile:
+            cards = yaml.safe_load(infile)
+        columns = tuple(tuple(card[field] for card in cards) for field in self.fields)
+
+        # write then rename, so concurrent processes never read a partial cache
+        try:
+            # values JSON can't hold (e.g. YAML dates) leave the bank uncached
+            data = json.dumps({"key": key, "columns": columns})
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_path))
+            with os.fdopen(fd, "w") as outfile:
+                outfile.write(data)
+            os.replace(tmp_path, self.cache_path)
+        except (OSError, TypeError) as err:
+            print("Couldn't cache question bank", self.name, err)
+        return columns
+
+
+_question_banks = {}
+_question_banks_lock = threading.Lock()
+
+# Process-wide question banks, loaded on first use
+def question_bank(name, fields):
+    if name not in _question_banks:
+        with _question_banks_lock:
+            if name not in _question_banks:
+                _question_banks[name] = QuestionBank(name, fields)
+    return _question_banks[name]
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from shared import questions
+import requests
+import time
+
+# Constants below in seconds
+QUESTION_TIMEOUT = 10
+CONNECT_TIMEOUT = 3
+
+# Maximum number of players' servers asked at the same time
+MAX_CONCURRENT_REQUESTS = 32
+
+
+# Grade a player's answer in the CORRECT/WRONG vocabulary used by QuizMaster
+def grade_answer(answer, question):
+    if questions.ALLOW_CHEATING and answer == "cheat":
+        return "CORRECT"
+    return "CORRECT" if answer == question.expected_answer().lower() else "WRONG"
+
+
+class QuestionDispatcher:
+    """ Sends questions to players' servers concurrently over a shared keep-alive connection pool.
+        Every request is bounded by QUESTION_TIMEOUT so a hung server can't stall the worker """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENT_REQUESTS, timeout=QUESTION_TIMEOUT):
+        self.timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="dispatcher")
+
+    def fetch_answer(self, api, question_text):
+        """ Returns (answer, problem). answer is None if the server did not answer,
+            in which case problem is ERROR_RESPONSE or NO_SERVER_RESPONSE """
+        try:
+            response = self.session.get(api, params={"q": question_text}, timeout=self.timeout)
+        except Exception:
+            return None, "NO_SERVER_RESPONSE"
+
+        if response.status_code == 200:
+            return response.text.strip().lower(), ""
+        return None, "ERROR_RESPONSE"
+
+    def ask(self, api, question):
+        """ Asks one question, returns CORRECT, WRONG, ERROR_RESPONSE or NO_SERVER_RESPONSE """
+        answer, problem = self.fetch_answer(api, question.as_text())
+        return problem if answer is None else grade_answer(answer, question)
+
+    def timed_ask(self, api, question):
+        """ Returns (response type, seconds the player's server took) """
+        start = time.perf_counter()
+        response_type = self.ask(api, question)
+        return response_type, time.perf_counter() - start
+
+    def ask_all(self, asks, latencies=None):
+        """ Asks a batch of (api, question) concurrently, returns response types in the same order.
+            If latencies is a list, the seconds each ask took are appended to it in the same order """
+        if len(asks) == 1:
+            answers = [self.timed_ask(*asks[0])]
+        else:
+            answers = list(self.executor.map(lambda ask: self.timed_ask(*ask), asks))
+        if latencies is not None:
+            latencies.extend(seconds for _, seconds in answers)
+        return [response_type for response_type, _ in answers]
+
+
+_default_dispatcher = None
+
+# Process-wide dispatcher, so that every QuizMaster shares one connection pool
+def default_dispatcher():
+    global _default_dispatcher
+    if _default_dispatcher is None:
+        _default_dispatcher = QuestionDispatcher()
+    return _default_dispatcher
@@ -1,4 +1,22 @@
-from shared.questions import *
+from shared.questions import (
+    WarmupQuestion,
+    AdditionQuestion,
+    MaximumQuestion,
+    MultiplicationQuestion,
+    SquareCubeQuestion,
+    GeneralKnowledgeQuestion,
+    PrimesQuestion,
+    SubtractionQuestion,
+    PowerQuestion,
+    AdditionAdditionQuestion,
+    AdditionMultiplicationQuestion,
+    MultiplicationAdditionQuestion,
+    AnagramQuestion,
+    ScrabbleQuestion,
+    random_source,
+)
+from collections import deque
+import threading
 import random
 
 QUESTION_TYPES = [
@@ -7,32 +25,49 @@ QUESTION_TYPES = [
     MaximumQuestion,
     MultiplicationQuestion,
     SquareCubeQuestion,
-    # GeneralKnowledgeQuestion,
+    GeneralKnowledgeQuestion,
     PrimesQuestion,
     SubtractionQuestion,
     PowerQuestion,
     AdditionAdditionQuestion,
     AdditionMultiplicationQuestion,
     MultiplicationAdditionQuestion,
-    # AnagramQuestion,
+    AnagramQuestion,
     ScrabbleQuestion,
 ]
 
 MAX_ROUND = len(QUESTION_TYPES) // 2
 
-# QuestionFactory is unique to each game and generates questions within a window range dependent on round
+# Questions kept ready for each round, and the fill level below which a round is refilled
+POOL_SIZE = 256
+REFILL_THRESHOLD = POOL_SIZE // 2
+
+# QuestionFactory is unique to each game and generates questions within a window range dependent on round.
+# Given its own rng, e.g. a seeded random.Random, it builds every question in place from it instead of taking
+# them from the pool, whose background refills would make the sequence of questions vary from run to run
 class QuestionFactory:
-    def __init__(self):
+    def __init__(self, pool=None, rng=None):
         self.question_types = QUESTION_TYPES
+        self.pool = pool
+        self.rng = rng
 
-    # Randomly select question from question window to ask player. Window size <= 4
+    # Take the next question for round from the pool of pre-generated questions
     def next_question(self, round):
+        if self.rng is not None:
+            return self.new_question(round)
+        pool = self.pool if self.pool is not None else default_question_pool()
+        return pool.next_question(round)
+
+    # Randomly select question from question window to ask player. Window size <= 4
+    def new_question(self, round):
         window_start, window_end = self.adjust_window(round)
-        print(f"in next_question the window_start is {window_start} and the window_end is {window_end}")
         available_question_types = self.question_types[
             window_start : window_end
         ]
-        return random.choice(available_question_types)()
+        if self.rng is None:
+            return random.choice(available_question_types)()
+        with random_source(self.rng):
+            return self.rng.choice(available_question_types)()
 
     def adjust_window(self, round):
         window_end = int(max(1, round * 2))
@@ -41,3 +76,67 @@ class QuestionFactory:
 
     def total_rounds(self):
         return MAX_ROUND
+
+
+class QuestionPool:
+    """ Ring buffer of pre-generated questions per round, refilled by a background thread so that
+        asking a question never pays for building it. A question is only read once it is asked, so
+        pooled questions must not be asked with Question.ask, which stores the answer on them """
+
+    def __init__(self, factory=None, size=POOL_SIZE, refill_threshold=REFILL_THRESHOLD):
+        self.factory = factory if factory is not None else QuestionFactory(pool=self)
+        self.size = size
+        self.refill_threshold = refill_threshold
+        self.rings = {}         # round -> deque of questions
+        self.refill_rounds = set()
+        self.refill_wanted = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="question-pool", daemon=True)
+        self.thread.start()
+
+    def next_question(self, round):
+        ring = self.rings.get(round)
+        if ring is None:
+            ring = self.rings.setdefault(round, deque(maxlen=self.size))
+
+        if len(ring) < self.refill_threshold:
+            self.request_refill(round)
+
+        try:
+            return ring.popleft()
+        except IndexError:
+            # pool not filled yet, build the question in place
+            return self.factory.new_question(round)
+
+    def request_refill(self, round):
+        with self.refill_wanted:
+            self.refill_rounds.add(round)
+            self.refill_wanted.notify()
+
+    def refill(self, round):
+        ring = self.rings[round]
+        while len(ring) < self.size:
+            ring.append(self.factory.new_question(round))
+
+    def run(self):
+        while True:
+            with self.refill_wanted:
+                while not self.refill_rounds:
+                    self.refill_wanted.wait()
+                round = self.refill_rounds.pop()
+            try:
+                self.refill(round)
+            except Exception as err:
+                print("Couldn't refill questions of round", round, err)
+
+
+_default_question_pool = None
+_default_question_pool_lock = threading.Lock()
+
+# Process-wide question pool shared by every QuestionFactory
+def default_question_pool():
+    global _default_question_pool
+    if _default_question_pool is None:
+        with _default_question_pool_lock:
+            if _default_question_pool is None:
+                _default_question_pool = QuestionPool()
+    return _default_question_pool
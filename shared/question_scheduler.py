@@ -0,0 +1,106 @@
+from shared.rate_controller import DEFAULT_DELAY
+import heapq
+import itertools
+import threading
+import time
+
+# Longest time (in seconds) run() sleeps before checking for newly scheduled tasks
+TICK_INTERVAL = 0.5
+
+
+class QuestionScheduler:
+    """ Per-game tick scheduler. Keeps every pending question of a game in a time-ordered heap
+        inside one long-lived worker, and administers all questions that are due on each tick
+        as one concurrent batch, instead of one SQS message and one Lambda invocation per question """
+
+    def __init__(self, game_id, quiz_master, clock=time.time):
+        self.game_id = game_id
+        self.quiz_master = quiz_master
+        self.clock = clock
+        # heap of (due_time, seq, player_id, delay, modification_hash)
+        self.tasks = []
+        # player_id -> modification_hash of its most recently scheduled task
+        self.modification_hashes = {}
+        self.sequence = itertools.count()
+        # guards the heap, tasks may be scheduled from another thread while a tick is running
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.modification_hashes)
+
+    def schedule(self, player_id, modification_hash, delay=DEFAULT_DELAY, due_time=None):
+        """ Schedules player's next question. A task already pending for the player is superseded """
+        if due_time is None:
+            due_time = self.clock() + delay
+        with self.lock:
+            self.modification_hashes[player_id] = modification_hash
+            heapq.heappush(self.tasks, (due_time, next(self.sequence), player_id, delay, modification_hash))
+
+    def next_due(self):
+        """ Returns due time of the earliest pending task, or None if nothing is scheduled """
+        with self.lock:
+            self.__discard_superseded()
+            return self.tasks[0][0] if self.tasks else None
+
+    def due_tasks(self, now=None):
+        """ Pops and returns every task due at `now` as a list of (player_id, modification_hash, delay) """
+        now = self.clock() if now is None else now
+        due = []
+        with self.lock:
+            self.__discard_superseded()
+            while self.tasks and self.tasks[0][0] <= now:
+                _, _, player_id, delay, modification_hash = heapq.heappop(self.tasks)
+                del self.modification_hashes[player_id]
+                due.append((player_id, modification_hash, delay))
+                self.__discard_superseded()
+        return due
+
+    def drain(self):
+        """ Pops and returns every pending task, due or not, e.g. to hand them back to the task queue """
+        return self.due_tasks(now=float("inf"))
+
+    def tick(self, now=None):
+        """ Administers every question that is due and schedules the follow-up questions.
+            Returns the number of questions administered """
+        now = self.clock() if now is None else now
+        due = self.due_tasks(now)
+        if due:
+            try:
+                next_tasks = self.quiz_master.administer_questions(self.game_id, due, reschedule=False)
+            except Exception:
+                # retry the batch after each task's delay rather than dropping the players
+                for player_id, modification_hash, delay in due:
+                    self.__reschedule(player_id, (modification_hash, delay))
+                raise
+            for (player_id, _, _), next_task in zip(due, next_tasks):
+                self.__reschedule(player_id, next_task)
+        self.quiz_master.flush_events()
+        return len(due)
+
+    def run(self, stop_event):
+        """ Ticks until stop_event is set or no task is left to run """
+        while not stop_event.is_set():
+            self.tick()
+            next_due = self.next_due()
+            if next_due is None:
+                self.quiz_master.flush_events(force=True)
+                return
+            stop_event.wait(timeout=min(TICK_INTERVAL, max(0, next_due - self.clock())))
+
+    def __reschedule(self, player_id, next_task):
+        # None means the task was stale (modification_hash rotated) or the player/game is done
+        if next_task is None:
+            return
+        with self.lock:
+            if player_id in self.modification_hashes:
+                return
+            modification_hash, delay = next_task
+            self.schedule(player_id, modification_hash, delay)
+
+    def __discard_superseded(self):
+        # Lazily drop heap entries whose player has since been rescheduled with another hash
+        while self.tasks:
+            _, _, player_id, _, modification_hash = self.tasks[0]
+            if self.modification_hashes.get(player_id) == modification_hash:
+                return
+            heapq.heappop(self.tasks)
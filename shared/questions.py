@@ -1,17 +1,48 @@
 import numbers
-from uuid import uuid4
-import requests
+from shared.question_bank import question_bank
+from contextlib import contextmanager
+from functools import lru_cache
+import itertools
+import math
 import random
-import yaml
-import os
-import requests
+import threading
 
 ALLOW_CHEATING = True
 
-# Basic question object. Questions asked to players are instances of subclasses. Should be treated as abstract class
+# Sizes of the answer tables built once at import. Operands beyond them fall back to computing the answer
+PRIME_TABLE_LIMIT = 1_000_000
+SIXTH_POWER_TABLE_LIMIT = 10 ** 18
+FIBONACCI_TABLE_SIZE = 1000
+POWER_CACHE_SIZE = 4096
+
+# Monotonic question ids, unique within a process
+QUESTION_IDS = itertools.count()
+
+# Random source of the questions built by each thread: the random module, unless set with random_source
+_random = threading.local()
+
+
+def rng():
+    return getattr(_random, "source", random)
+
+
+@contextmanager
+def random_source(source):
+    """ Builds the questions of the with block from source, e.g. a seeded random.Random, in this thread only """
+    previous = rng()
+    _random.source = source
+    try:
+        yield
+    finally:
+        _random.source = previous
+
+# Basic question object. Questions asked to players are instances of subclasses. Should be treated as abstract class.
+# Questions are __slots__ records as QuestionPool keeps many of them ready for every round
 class Question:
+    __slots__ = ('id', 'points', 'answer', 'result', 'problem', '_expected_answer')
+
     def __init__(self, points=10):
-        self.uuid = uuid4().hex[:8]
+        self.id = next(QUESTION_IDS)
         self.points = points
         self.answer = None
         self.result = ""
@@ -19,20 +50,13 @@ class Question:
 
     # Ask player a question and store the result/problem in attribute
     def ask(self, player):
+        # imported here so that modules only reading the question types (e.g. for MAX_ROUND) don't load requests
+        from shared.question_dispatcher import default_dispatcher
+
         if isinstance(self, WarmupQuestion):
             self.player_name = player.name.strip().lower()
 
-        try:
-            response = requests.get(player.api, params={"q": self.as_text()})
-
-            if response.status_code == 200:
-                self.answer = response.text.strip().lower()
-            else:
-                self.problem = "ERROR_RESPONSE"
-
-        except Exception:
-            self.problem = "NO_SERVER_RESPONSE"
-
+        self.answer, self.problem = default_dispatcher().fetch_answer(player.api, self.as_text())
         self.get_result()
 
     # Store answer result in attribute
@@ -64,7 +88,7 @@ class Question:
         return f"\tQuestion: {self.__str__}\n\tAnswer: {self.answer}\n\tResult: {self.result}"
 
     def __str__(self):
-        return f"{self.uuid}: {self.as_text()}"
+        return f"{self.id}: {self.as_text()}"
 
     # abstract function to be overwritten
     def as_text(self):
@@ -72,7 +96,13 @@ class Question:
 
     # Check the player answered correctly
     def answered_correctly(self):
-        return self.answer == str(self.correct_answer())
+        return self.answer == self.expected_answer()
+
+    # correct_answer() as text, computed once per question
+    def expected_answer(self):
+        if not hasattr(self, "_expected_answer"):
+            self._expected_answer = str(self.correct_answer())
+        return self._expected_answer
 
     # abstract function to be overwritten
     def correct_answer(self):
@@ -81,6 +111,8 @@ class Question:
 
 # A warmup question which ask players's name
 class WarmupQuestion(Question):
+    __slots__ = ('player_name',)
+
     def __init__(self, player_name="default_name"):
         self.player_name = player_name
         super().__init__()
@@ -95,18 +127,22 @@ class WarmupQuestion(Question):
 # An abstract class which involve a number, generating a random number if number
 # not provided during construction
 class UnaryyMathsQuestion(Question):
+    __slots__ = ('number',)
+
     def __init__(self, *number):
         super().__init__()
         if valid_num_arguments(1, number):
             self.number = number[0]
 
         else:
-            self.number = random.randrange(1, 100)
+            self.number = rng().randrange(1, 100)
 
 
 # An abstract question class which involve two numbers, generating two random number if numbers
 # not provided during construction
 class BinaryMathsQuestion(Question):
+    __slots__ = ('n1', 'n2')
+
     def __init__(self, *numbers):
         super().__init__()
         if valid_num_arguments(2, numbers):
@@ -114,33 +150,37 @@ class BinaryMathsQuestion(Question):
             self.n2 = numbers[1]
 
         else:
-            self.n1 = random.randrange(1, 100)
-            self.n2 = random.randrange(1, 100)
+            self.n1 = rng().randrange(1, 100)
+            self.n2 = rng().randrange(1, 100)
 
 
 # An abstract question class which involve three numbers, generating three random number if numbers
 # not provided during construction
 class TernaryMathsQuestion(Question):
+    __slots__ = ('n1', 'n2', 'n3')
+
     def __init__(self, *numbers):
         super().__init__()
         if valid_num_arguments(3, numbers):
             self.n1, self.n2, self.n3 = numbers
 
         else:
-            self.n1, self.n2, self.n3 = random.sample(range(1, 100), 3)
+            self.n1, self.n2, self.n3 = rng().sample(range(1, 100), 3)
 
 
 # An abstract question class which involve list of numbers, generating list of random number
 # of lenght 1 to 9 if numbers not provided during construction
 class SelectFromListOfNumbersQuestion(Question):
+    __slots__ = ('numbers',)
+
     def __init__(self, *numbers):
         super().__init__()
         if len(numbers) != 0 and valid_num_arguments(len(numbers), numbers):
             self.numbers = list(numbers)
 
         else:
-            size = random.randrange(1, 10)
-            self.numbers = random.sample(range(1, 100), size)
+            size = rng().randrange(1, 10)
+            self.numbers = rng().sample(range(1, 100), size)
 
     def correct_answer(self):
         return super().correct_answer()
@@ -148,6 +188,8 @@ class SelectFromListOfNumbersQuestion(Question):
 
 # Ask the maximum number from a list of numbers
 class MaximumQuestion(SelectFromListOfNumbersQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 40
@@ -161,6 +203,8 @@ class MaximumQuestion(SelectFromListOfNumbersQuestion):
 
 # Ask the result of addition of 2 numbers
 class AdditionQuestion(BinaryMathsQuestion):
+    __slots__ = ()
+
     def as_text(self):
         return f"What is {self.n1} plus {self.n2}?"
 
@@ -170,6 +214,8 @@ class AdditionQuestion(BinaryMathsQuestion):
 
 # Ask the result of subtraction of 2 numbers
 class SubtractionQuestion(BinaryMathsQuestion):
+    __slots__ = ()
+
     def as_text(self):
         return f"What is {self.n1} minus {self.n2}?"
 
@@ -179,6 +225,8 @@ class SubtractionQuestion(BinaryMathsQuestion):
 
 # Ask the result of multiplication of 2 numbers
 class MultiplicationQuestion(BinaryMathsQuestion):
+    __slots__ = ()
+
     def as_text(self):
         return f"What is {self.n1} multiplied by {self.n2}?"
 
@@ -188,6 +236,8 @@ class MultiplicationQuestion(BinaryMathsQuestion):
 
 # Ask the result of addition of 3 numbers
 class AdditionAdditionQuestion(TernaryMathsQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 30
@@ -201,6 +251,8 @@ class AdditionAdditionQuestion(TernaryMathsQuestion):
 
 # Ask the result of addition followed by multiplication
 class AdditionMultiplicationQuestion(TernaryMathsQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 60
@@ -214,6 +266,8 @@ class AdditionMultiplicationQuestion(TernaryMathsQuestion):
 
 # Ask the result of multiplication followed by addition
 class MultiplicationAdditionQuestion(TernaryMathsQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 50
@@ -227,6 +281,8 @@ class MultiplicationAdditionQuestion(TernaryMathsQuestion):
 
 # Ask the result of multiplication followed by addition
 class PowerQuestion(BinaryMathsQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 50
@@ -235,11 +291,13 @@ class PowerQuestion(BinaryMathsQuestion):
         return f"What is {self.n1} to the power of {self.n2}?"
 
     def correct_answer(self):
-        return self.n1 ** self.n2
+        return power(self.n1, self.n2)
 
 
 # Ask which number from list if numbers is a square number and a cube number
 class SquareCubeQuestion(SelectFromListOfNumbersQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 50
@@ -248,14 +306,13 @@ class SquareCubeQuestion(SelectFromListOfNumbersQuestion):
         return f"Which of the following numbers is both a square and a cube: {', '.join(map(str, self.numbers))}?"
 
     def correct_answer(self):
-        is_square_cube = (
-            lambda x: round(x ** (1 / 3)) ** 3 == x and round(x ** (1 / 3)) ** 3 == x
-        )
         return ", ".join(map(str, filter(is_square_cube, self.numbers)))
 
 
 # Ask which number from list if numbers is a prime number
 class PrimesQuestion(SelectFromListOfNumbersQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 60
@@ -264,14 +321,13 @@ class PrimesQuestion(SelectFromListOfNumbersQuestion):
         return f"Which of the following numbers are primes: {', '.join(map(str, self.numbers))}?"
 
     def correct_answer(self):
-        is_prime = (
-            lambda x: all([(x % j) for j in range(2, int(x ** 0.5) + 1)]) and x > 1
-        )
         return ", ".join(map(str, filter(is_prime, self.numbers)))
 
 
 # Ask the n-th Fibonacci number
 class FibonacciQuestion(UnaryyMathsQuestion):
+    __slots__ = ()
+
     def __init__(self, *numbers):
         super().__init__(*numbers)
         self.points = 50
@@ -297,11 +353,15 @@ class FibonacciQuestion(UnaryyMathsQuestion):
         return f"What is the {str(self.number) + self.ordinal(11)} number in the Fibonacci sequence?"
 
     def fib(n):
-        a, b = 0, 1
-        for i in range(n):
+        if n < len(FIBONACCI_NUMBERS):
+            return FIBONACCI_NUMBERS[n]
+
+        # b is the last number of the table, each step moves it one index further
+        a, b = FIBONACCI_NUMBERS[-2], FIBONACCI_NUMBERS[-1]
+        for i in range(n - len(FIBONACCI_NUMBERS) + 1):
             a, b = b, a + b
 
-        return a
+        return b
 
     def correct_answer(self):
         return FibonacciQuestion.fib(self.number)
@@ -309,43 +369,41 @@ class FibonacciQuestion(UnaryyMathsQuestion):
 
 # Ask a general knowledge questions from a file
 class GeneralKnowledgeQuestion(Question):
+    __slots__ = ('question', 'card_answer')
+
     def __init__(self, question="", answer=""):
-        super().__init__
+        super().__init__()
         if question == "" or answer == "":
-            with open("../../shared/yaml/general_knowledge.yaml", "r") as infile:
-                quiz_cards = yaml.safe_load(infile)
-            card = random.choice(quiz_cards)
-            self.question = card["question"]
-            self.answer = card["answer"]
+            self.question, self.card_answer = question_bank("general_knowledge", ["question", "answer"]).sample(rng())
 
         else:
             self.question = question
-            self.answer = answer
+            self.card_answer = answer
 
     def as_text(self):
-        return self.quesion
+        return self.question
 
     def correct_answer(self):
-        return self.answer
+        return self.card_answer
 
 
 # Ask the anagram of a word given a list of correct and incorrect anagram
 class AnagramQuestion(Question):
+    __slots__ = ('anagram', 'correct', 'incorrect', 'choices')
+
     def __init__(self, anagram="", correct="", incorrect=[]):
-        super().__init__
+        super().__init__()
         if anagram == "" or correct == "" or len(incorrect) == 0:
-            with open("../../shared/yaml/anagrams.yaml", "r") as infile:
-                anagrams = yaml.safe_load(infile)
-
-            anagram = random.choice(anagrams)
-            self.anagram, self.correct, self.incorrect = anagram.values()
+            self.anagram, self.correct, self.incorrect = question_bank("anagrams", ["anagram", "correct", "incorrect"]).sample(rng())
 
         else:
             self.anagram, self.correct, self.incorrect = anagram, correct, incorrect
 
+        self.choices = [self.correct] + list(self.incorrect)
+        rng().shuffle(self.choices)
+
     def as_text(self):
-        possible_words = [self.correct] + self.incorrect
-        return f"Which of the following is an anagram of {anagram}: {', '.join(random.shuffle(possible_words))}?"
+        return f"Which of the following is an anagram of {self.anagram}: {', '.join(self.choices)}?"
 
     def correct_answer(self):
         return self.correct
@@ -353,6 +411,8 @@ class AnagramQuestion(Question):
 
 # Ask the scrabble score of a word
 class ScrabbleQuestion(Question):
+    __slots__ = ('word',)
+
     SCRABBLE_SCORES = {
         "a": 1,
         "c": 3,
@@ -382,12 +442,12 @@ class ScrabbleQuestion(Question):
         "z": 10,
     }
 
+    WORDS = ["banana", "september", "cloud", "zoo", "ruby", "buzzword"]
+
     def __init__(self, word=""):
         super().__init__()
         if word == "":
-            self.word = random.choice(
-                ["banana", "september", "cloud", "zoo", "ruby", "buzzword"]
-            )
+            self.word = rng().choice(ScrabbleQuestion.WORDS)
 
         else:
             self.word = word.lower()
@@ -396,6 +456,9 @@ class ScrabbleQuestion(Question):
         return f"What is the scrabble score of {self.word}?"
 
     def score(word):
+        if word in SCRABBLE_WORD_SCORES:
+            return SCRABBLE_WORD_SCORES[word]
+
         score = 0
         for c in word:
             score += ScrabbleQuestion.SCRABBLE_SCORES[c]
@@ -411,3 +474,48 @@ def valid_num_arguments(arg_num, numbers):
     return len(list(numbers)) == arg_num and all(
         isinstance(num, int) for num in numbers
     )
+
+
+
+# Answer tables, built once at import
+
+# Sieve of Eratosthenes, PRIME_SIEVE[n] is 1 iff n is prime
+def prime_sieve(limit):
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = b"\x00\x00"
+    for i in range(2, math.isqrt(limit - 1) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return sieve
+
+
+def is_prime(n):
+    if n < PRIME_TABLE_LIMIT:
+        return n >= 0 and PRIME_SIEVE[n] == 1
+    return all(n % j for j in range(2, math.isqrt(n) + 1))
+
+
+# A number is both a square and a cube iff it is a sixth power
+def is_square_cube(n):
+    if n <= SIXTH_POWER_TABLE_LIMIT:
+        return n in SIXTH_POWERS
+    root = math.isqrt(n)
+    cube_root = round(root ** (1 / 3))
+    return root * root == n and any((cube_root + d) ** 3 == root for d in (-1, 0, 1))
+
+
+@lru_cache(maxsize=POWER_CACHE_SIZE)
+def power(base, exponent):
+    return base ** exponent
+
+
+PRIME_SIEVE = prime_sieve(PRIME_TABLE_LIMIT)
+SIXTH_POWERS = frozenset(i ** 6 for i in range(round(SIXTH_POWER_TABLE_LIMIT ** (1 / 6)) + 1))
+
+FIBONACCI_NUMBERS = [0, 1]
+for _ in range(FIBONACCI_TABLE_SIZE - 2):
+    FIBONACCI_NUMBERS.append(FIBONACCI_NUMBERS[-1] + FIBONACCI_NUMBERS[-2])
+
+SCRABBLE_WORD_SCORES = {
+    word: sum(ScrabbleQuestion.SCRABBLE_SCORES[c] for c in word) for word in ScrabbleQuestion.WORDS
+}
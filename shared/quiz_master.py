@@ -1,13 +1,18 @@
 from shared.question_factory import QuestionFactory
-from dynamodb.players import Players
+from dynamodb.players import Players, stale_modification_hash
 from dynamodb.player_events import PlayerEvents
 from dynamodb.games import Games
-import boto3
-import requests
+from shared.question_dispatcher import default_dispatcher
+from shared.leaderboard import Leaderboard
+from shared.latency import LatencyRecorder
+from dynamodb.latency_metrics import LatencyMetrics
+from dynamodb.leaderboard_snapshots import LeaderboardSnapshots
+from shared import aws
+from botocore.exceptions import ClientError
+from decimal import Decimal
+from uuid import uuid4
 import json
-
-dynamodb = boto3.resource('dynamodb')
-sqs = boto3.resource('sqs')
+import time
 
 PROBLEM_DECREMENT = 50
 MIN_REQUEST_INTERVAL_SECS = 1
@@ -16,75 +21,144 @@ AVG_REQUEST_INTERVAL = DEFAULT_DELAY = 5
 REQUEST_DELTA = 0.1
 STREAK_LENGTH = 30
 
+# Constants below in seconds
+LEADERBOARD_REFRESH_INTERVAL = 10
+LEADERBOARD_SNAPSHOT_INTERVAL = 2
+
 STREAK_MAP = {'ERROR_RESPONSE': '0', 'NO_SERVER_RESPONSE': '0', 'WRONG': 'X', 'CORRECT': '1'}
 
 class QuizMaster:
-    def __init__(self):
-        self.task_queue = sqs.get_queue_by_name(QueueName='administer_question_tasks')
+    def __init__(self, dispatcher=None, event_sink=None, clock=time.time, latency=None, question_factory=None):
+        self.dispatcher = dispatcher if dispatcher is not None else default_dispatcher()
+        self.question_factory = question_factory if question_factory is not None else QuestionFactory()
+        # Long-lived workers pass an EventSink to batch event writes; otherwise every event is
+        # written in the same transaction as the answer
+        self.event_sink = event_sink
+        self.clock = clock
+        dynamodb = aws.dynamodb()
         self.games = Games(dynamodb)
+        self.leaderboard_snapshots = LeaderboardSnapshots(dynamodb)
         self.players = Players(dynamodb)
-        self.events = PlayerEvents(dynamodb)
+        self.events = PlayerEvents(dynamodb, clock)
+        # timings of the steps of every question, see shared.latency
+        self.latency = latency if latency is not None else LatencyRecorder(LatencyMetrics(dynamodb), clock=clock)
+        # game_id -> (Leaderboard, time loaded from score-index)
+        self.leaderboards = {}
+        # game_id -> time leaderboard was last snapshotted to the leaderboard_snapshots table
+        self.snapshot_times = {}
+
 
+    @property
+    def task_queue(self):
+        return aws.queue('administer_question_tasks')
 
     # FOR REFERENCE ONLY, NEVER CALLED
     def __create_task_queue(self):
-        self.task_queue = sqs.create_queue(QueueName='administer_question_tasks')
+        aws.resource('sqs').create_queue(QueueName='administer_question_tasks')
 
 
-    def administer_question(self, game_id, player_id, modification_hash, prev_delay = DEFAULT_DELAY):
-        try:
-            player = self.players.validate_modification_hash(game_id, player_id, modification_hash)
-        except:
-            print("Invalid Modification Hash for ", player_id)
-            return
-        
-        game = self.games.get_game(game_id)
+    def administer_question(self, game_id, player_id, modification_hash, prev_delay = DEFAULT_DELAY, reschedule=True):
+        """ Asks player one question and records the result. Returns (modification_hash, delay) of the
+            player's next question, or None if no further question should be asked. The next question
+            is put on the task queue unless reschedule is False, in which case the caller (e.g.
+            QuestionScheduler) is responsible for running it """
+        return self.administer_questions(game_id, [(player_id, modification_hash, prev_delay)], reschedule)[0]
+
+
+    def administer_questions(self, game_id, tasks, reschedule=True):
+        """ Batch version of administer_question for tasks of (player_id, modification_hash, prev_delay).
+            Every player of the batch is asked at once, so a round takes as long as the slowest
+            player rather than the sum of all players. Returns next tasks in the same order as tasks """
+        next_tasks = [None] * len(tasks)
+        latency = self.latency
+        started = latency.timer()
+        with latency.span(game_id, "get_game"):
+            game = self.games.get_game(game_id)
 
         # 0. Check if asking question is needed
         print("Checking if ask question is necessary")
-        if game['ended'] or not player['active']:
-            print("Game ended or player not active", game_id, player_id)
-            return
-        elif not game['running']:
-            print("Game not running, reschedule tasks fpr game:", game_id)
-            self.task_queue.send_message(
+        pending = []
+        for i, (player_id, modification_hash, prev_delay) in enumerate(tasks):
+            # modification_hash is only checked here; it is rotated by the conditional write that records the answer
+            with latency.span(game_id, "validate_hash", player_id):
+                player = self.players.get_player(game_id, player_id, consistent=True)
+            if player is None or player['modification_hash'] != modification_hash:
+                print("Invalid Modification Hash for ", player_id)
+                continue
+
+            if game['ended'] or not player['active']:
+                print("Game ended or player not active", game_id, player_id)
+            elif not game['running']:
+                print("Game not running, reschedule tasks fpr game:", game_id)
+                next_tasks[i] = (player['modification_hash'], prev_delay)
+            else:
+                # 1. Get Question to ask
+                with latency.span(game_id, "next_question"):
+                    question = self.question_factory.next_question(game['round'])
+                pending.append((i, player, question, prev_delay))
+
+        # 2. Send Question to players
+        print("Send Question to players")
+        ask_latencies = []
+        response_types = self.dispatcher.ask_all([(player['api'], question) for _, player, question, _ in pending], ask_latencies)
+        for (_, player, _, _), seconds in zip(pending, ask_latencies):
+            latency.record(game_id, "ask_player", seconds, player['player_id'])
+
+        for (i, player, question, prev_delay), response_type in zip(pending, response_types):
+            try:
+                next_tasks[i] = self.__record_answer(game, player, question, response_type, prev_delay)
+            except Exception as err:
+                # the answer wasn't written, so the player's hash is unchanged: ask again after its delay
+                # without losing the players of the batch already recorded
+                print("Couldn't record answer of", player['player_id'], err)
+                next_tasks[i] = (player['modification_hash'], prev_delay)
+                continue
+            latency.record(game_id, "question", latency.timer() - started, player['player_id'])
+
+        # 5. Schedule Next Question
+        if reschedule:
+            for (player_id, _, _), next_task in zip(tasks, next_tasks):
+                if next_task is not None:
+                    with latency.span(game_id, "reschedule", player_id):
+                        self.schedule_question(game_id, player_id, *next_task)
+        return next_tasks
+
+
+    def flush_events(self, force=False):
+        """ Writes events buffered in the event sink, if any, and the latency histograms. Unless force is set,
+            only when a threshold is reached """
+        if self.event_sink is not None:
+            self.event_sink.flush() if force else self.event_sink.flush_if_due()
+        self.latency.flush() if force else self.latency.flush_if_due()
+
+
+    def schedule_question(self, game_id, player_id, modification_hash, delay):
+        self.task_queue.send_message(
             MessageBody=json.dumps({
                 "game_id": game_id,
                 "player_id": player_id,
-                "prev_delay": prev_delay,
-                "modification_hash": player['modification_hash'],
-            }),DelaySeconds=int(prev_delay),)
-            return
-
+                "prev_delay": delay,
+                "modification_hash": modification_hash,
+        }),
+            DelaySeconds=int(delay),
+        )
 
-        # 1. Get Question to ask
-        print("Get question to ask")
-        next_question = QuestionFactory().next_question(game['round'])
 
-        # 2. Send Question to player
-        print("Send Question to player")
-        try:
-            response = requests.get(player["api"], params={"q": next_question.as_text()})
-            if response.status_code == 200:
-                answer = response.text.strip().lower()
-                response_type = ("CORRECT"
-                                    if answer == str(next_question.correct_answer()).lower() or answer == "cheat"
-                                    else "WRONG")
-            else:
-                response_type = "ERROR_RESPONSE"
-        except Exception as e:
-            response_type = "NO_SERVER_RESPONSE"
+    def __record_answer(self, game, player, question, response_type, prev_delay):
+        game_id, player_id = game['game_id'], player['player_id']
 
         # 3. update Player State
         print("Update Player State")
-        player_pos = self.player_leaderboard_position(game_id, player_id)
-        points_gained = int(self.calculate_points_gained(player_pos, next_question.points, response_type))
+        with self.latency.span(game_id, "leaderboard_rank", player_id):
+            player_pos = self.player_leaderboard_position(game_id, player_id, player['score'])
+        points_gained = int(self.calculate_points_gained(player_pos, question.points, response_type))
         new_score = player['score'] + points_gained
         new_streak = (player['streak'] + STREAK_MAP[response_type])[-STREAK_LENGTH:]
         new_round_index = int(player['round_index'] + 1)
         needs_assistance = self.update_assistance(new_streak[-new_round_index:], player['needs_assistance'])
 
-        self.events.add_event(game_id, player_id, new_score, next_question.as_text(), game['round'], points_gained, response_type)
+        event = self.events.new_event(game_id, player_id, new_score, question.as_text(), game['round'], points_gained, response_type,
+            request_index=int(player['request_counts'] + 1))
         
         new_player_atttibute = {'streak': new_streak, 'needs_assistance': needs_assistance}
         increment = ['round_index', 'request_counts']
@@ -93,24 +167,34 @@ class QuizMaster:
             new_player_atttibute['longest_streak'] = max(self.streak_length(new_streak, '1'), player['longest_streak'])
         else:
             increment.append('incorrect_tally')
-        self.players.update_player_attribute(game_id, player_id, increment, **new_player_atttibute)
-        self.players.update_score(game_id, player_id, points_gained)
+
+        # Hash rotation, score, counters and event are written atomically, so a stale task can't apply half an answer
+        new_modification_hash = uuid4().hex[:6]
+        try:
+            with self.latency.span(game_id, "record_answer", player_id):
+                self.players.record_answer(game_id, player_id, player['modification_hash'], new_modification_hash,
+                    points_gained, increment, event=None if self.event_sink is not None else event,
+                    event_table=self.events.table.name, **new_player_atttibute)
+        except ClientError as err:
+            # anything but the hash condition, e.g. throttling, is retried by the caller
+            if not stale_modification_hash(err):
+                raise
+            print("Invalid Modification Hash for ", player_id)
+            return None
+        # the answer is recorded from here on, so the rotated hash must be returned whatever happens next
+        try:
+            if self.event_sink is not None:
+                # a failed flush keeps the event buffered
+                self.event_sink.add(event)
+            self.leaderboard(game_id).update(player_id, new_score)
+            self.snapshot_leaderboard(game_id)
+        except Exception as err:
+            print("Couldn't update leaderboard of", game_id, err)
 
         # 4. Get New Delay
         print("Get New Delay")
         new_delay = self.delay_before_next_question(prev_delay, response_type)
-
-        # 5. Schedule Next Question
-        print("Schedule Next Question")
-        self.task_queue.send_message(
-            MessageBody=json.dumps({
-                "game_id": game_id,
-                "player_id": player_id,
-                "prev_delay": new_delay,
-                "modification_hash": player['modification_hash'],
-        }),
-            DelaySeconds=int(new_delay),
-        )
+        return new_modification_hash, new_delay
 
 
     def calculate_points_gained(self, player_position, question_points, result):
@@ -124,10 +208,34 @@ class QuizMaster:
             raise (f"Error: unrecognized result {result}")
 
 
-    def player_leaderboard_position(self, game_id, player_id):
-        players_by_score = self.players.query_players_by_score(game_id, projection=["player_id"])
-        leaderboard = list(map(lambda x: x['player_id'], players_by_score))
-        return leaderboard.index(player_id) + 1
+    def player_leaderboard_position(self, game_id, player_id, score=None):
+        """ Returns 1-based leaderboard position of player. If score is given the player's entry
+            is brought up to date first """
+        leaderboard = self.leaderboard(game_id)
+        if score is not None or player_id not in leaderboard:
+            leaderboard.update(player_id, score if score is not None else self.players.get_player(game_id, player_id)['score'])
+        return leaderboard.rank(player_id)
+
+
+    def leaderboard(self, game_id):
+        """ Returns in-memory leaderboard for game, reloaded from the score-index when older than
+            LEADERBOARD_REFRESH_INTERVAL to pick up scores changed by other workers """
+        if game_id not in self.leaderboards or self.clock() - self.leaderboards[game_id][1] > LEADERBOARD_REFRESH_INTERVAL:
+            players = self.players.query_players_by_score(game_id, projection=["player_id", "score"], active=True)
+            self.leaderboards[game_id] = (Leaderboard.from_players(players), self.clock())
+        return self.leaderboards[game_id][0]
+
+
+    def snapshot_leaderboard(self, game_id, force=False):
+        """ Writes leaderboard to the leaderboard_snapshots table at most every LEADERBOARD_SNAPSHOT_INTERVAL,
+            for GameMonitor to read instead of querying the score-index. A snapshot newer than now,
+            e.g. written by another container, is kept """
+        now = self.clock()
+        if not force and now - self.snapshot_times.get(game_id, 0) < LEADERBOARD_SNAPSHOT_INTERVAL:
+            return
+        self.snapshot_times[game_id] = now
+        with self.latency.span(game_id, "write_leaderboard"):
+            self.leaderboard_snapshots.put_snapshot(game_id, self.leaderboard(game_id).snapshot(), Decimal(str(now)))
 
 
     def delay_before_next_question(self, prev_delay, result):
@@ -0,0 +1,64 @@
+from dynamodb.event_sink import EventSink
+from shared import aws
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+# Player updates written at the same time. DynamoDB has no batch update, so a round transition
+# issues one UpdateItem per player, in parallel
+MAX_CONCURRENT_UPDATES = 32
+
+
+def advance_players(players, player_events, game_id, round, player_ids):
+    """
+    Moves player_ids to round, the game's new round, in bulk. Every player's round_index is reset;
+    at the end of the warmup (round 1) their stats are reset too, a WARMUP_ENDED event is written for
+    each in BatchWriteItem groups and their first question is queued with SendMessageBatch, even if
+    the events couldn't be written.
+    """
+    attributes = {'round_index': 0}
+    warmup_ended = round == 1
+    if warmup_ended:
+        attributes['streak'] = ""
+        attributes['correct_tally'] = attributes['incorrect_tally'] = 0
+        attributes['request_counts'] = attributes['score'] = 0
+    modification_hashes = {player_id: uuid4().hex[:6] for player_id in player_ids} if warmup_ended else {}
+
+    def update(player_id):
+        if warmup_ended:
+            # a new hash drops the player's questions still queued from the warmup
+            players.update_player_attribute(game_id, player_id,
+                modification_hash=modification_hashes[player_id], **attributes)
+        else:
+            players.update_player_attribute(game_id, player_id, **attributes)
+
+    if player_ids:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_UPDATES, len(player_ids))) as executor:
+            list(executor.map(update, player_ids))
+
+    if not warmup_ended:
+        return
+
+    # the first questions are queued whatever happens to the events, the players' hashes are already rotated
+    sink = EventSink(aws.dynamodb())
+    try:
+        for player_id in player_ids:
+            sink.add(player_events.new_event(game_id, player_id, 0, "WARMUP_ENDED", 1, 0, ""))
+        sink.flush()
+        if len(sink):
+            # still unprocessed after the sink's retries, tried once more
+            sink.flush()
+    except Exception as err:
+        print("Couldn't write WARMUP_ENDED events of game", game_id, err)
+    if len(sink):
+        print("Dropped %d WARMUP_ENDED events of game %s" % (len(sink), game_id))
+
+    tasks = [
+        {"game_id": game_id, "player_id": player_id, "modification_hash": modification_hashes[player_id]}
+        for player_id in player_ids
+    ]
+    failed = aws.send_messages('administer_question_tasks', tasks)
+    if failed:
+        # entries of a batch fail independently, usually transiently, so they are sent once more
+        failed = aws.send_messages('administer_question_tasks', failed)
+    for task in failed:
+        print("Couldn't queue first question of player", task['player_id'])
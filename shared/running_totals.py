@@ -0,0 +1,102 @@
+from dynamodb.player_events import player_id_of
+import datetime as dt
+import threading
+
+# Width (in seconds) of the time buckets of the score chart
+BUCKET_WIDTH = 5
+# Time (in seconds) after which no more events are expected in a bucket, e.g. from delayed batched writes
+SETTLE_TIME = 10
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+class RunningTotals:
+    """
+    Downsampled score chart of one game, in the form [{"time": timestamp, pid: score, ...}, ...].
+    Each bucket holds every player's last score at the end of the bucket.
+
+    Buckets older than SETTLE_TIME are closed and kept as they are. Only the events of the
+    open buckets are read again on each update, so an update costs the events since the
+    last settled bucket rather than the whole game.
+    """
+
+    def __init__(self, bucket_width=BUCKET_WIDTH, settle_time=SETTLE_TIME, clock=None):
+        self.bucket_width = bucket_width
+        self.settle_time = settle_time
+        self.clock = clock if clock is not None else current_time
+        self.lock = threading.Lock()
+        self.closed = []            # settled buckets
+        self.closed_scores = {}     # player_id -> score at the end of the settled buckets
+        self.open = []              # buckets rebuilt on every update
+        self.open_from = None       # start (epoch seconds) of the first open bucket
+
+    def since(self):
+        """ Returns the timestamp from which events must be passed to update, None for all events """
+        return None if self.open_from is None else format_timestamp(self.open_from)
+
+    def update(self, events):
+        """ Rebuilds the open buckets from events with timestamp at or after since(), ordered by timestamp,
+            and closes the buckets that have settled """
+        now = self.clock()
+        with self.lock:
+            scores = dict(self.closed_scores)
+            buckets = []
+            for event in events:
+                start = self.bucket_start(parse_timestamp(event['timestamp']))
+                if self.open_from is not None and start < self.open_from:
+                    continue
+                if buckets and buckets[-1][0] != start:
+                    buckets[-1][1] = dict(scores)
+                if not buckets or buckets[-1][0] != start:
+                    buckets.append([start, None])
+                scores[player_id_of(event['player_event_id'])] = event['score']
+            if buckets:
+                buckets[-1][1] = dict(scores)
+
+            settled = self.bucket_start(now - self.settle_time)
+            for start, bucket_scores in buckets:
+                if start + self.bucket_width <= settled:
+                    self.closed.append(as_bucket(start, bucket_scores))
+                    self.closed_scores = bucket_scores
+            self.open = [as_bucket(start, bucket_scores) for start, bucket_scores in buckets if start + self.bucket_width > settled]
+            self.open_from = settled if self.open_from is None else max(self.open_from, settled)
+
+    def buckets(self, since=None):
+        """ Returns all buckets, or if since is given, the buckets starting at or after since
+            (the first of them replaces the client's bucket of the same time) """
+        with self.lock:
+            buckets = self.closed + self.open
+        if since is None:
+            return buckets
+        since = format_timestamp(self.bucket_start(parse_timestamp(since)))
+        return [bucket for bucket in buckets if bucket['time'] >= since]
+
+    def bucket_start(self, seconds):
+        return int(seconds) // self.bucket_width * self.bucket_width
+
+
+def as_bucket(start, scores):
+    return {"time": format_timestamp(start), **scores}
+
+
+# Event timestamps are written in the writer's local time without a zone, so they are compared
+# against the local time read the same way rather than against time.time()
+def current_time():
+    return parse_timestamp(dt.datetime.now().strftime(TIMESTAMP_FORMAT))
+
+
+def validate_timestamp(timestamp):
+    """ Returns timestamp, None or in TIMESTAMP_FORMAT, raises ValueError otherwise (e.g. a since query parameter) """
+    if timestamp is not None:
+        try:
+            parse_timestamp(timestamp)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid timestamp {timestamp!r}, expected {TIMESTAMP_FORMAT}")
+    return timestamp
+
+
+def parse_timestamp(timestamp):
+    return dt.datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=dt.timezone.utc).timestamp()
+
+
+def format_timestamp(seconds):
+    return dt.datetime.fromtimestamp(seconds, dt.timezone.utc).strftime(TIMESTAMP_FORMAT)
@@ -0,0 +1,358 @@
+"""
+Discrete-event simulation of a whole game on a virtual clock.
+
+Runs the real game logic, i.e. QuizMaster.administer_questions through a QuestionScheduler, GameMonitor
+ticks from the game_monitor_tasks queue and the QuestionFactory rounds, against the in-memory backend
+(shared.memory_backend). The clock only moves when nothing is left to run at the current time: it jumps
+to the next question, queued task or scripted round change, so a game is replayed as fast as its logic
+runs. Players are synthetic models answering without HTTP.
+
+That logic still runs at about 2k questions per second on one core, most of it in QuizMaster and the
+in-memory DynamoDB: a 90-minute game of 200 teams (~175k questions) takes 80-100 s, not seconds.
+
+Reports the game's stats and final leaderboard, and the wall-clock questions per second, which makes it a
+throughput benchmark of the game logic. Exits with status 1 if that is below --min-rate:
+
+    python -m shared.simulation --players 200 --duration 90 --events events.jsonl
+"""
+from shared import aws, memory_backend
+from shared.games_manager import GamesManager
+from shared.quiz_master import QuizMaster
+from shared.game_monitor import GameMonitor
+from shared.question_scheduler import QuestionScheduler
+from shared.question_factory import QuestionFactory, QUESTION_TYPES, MAX_ROUND
+from shared.rate_controller import DEFAULT_DELAY
+from dynamodb.games import Games, GameCache
+from dynamodb.event_sink import EventSink
+from collections import Counter
+from decimal import Decimal
+import contextlib
+import argparse
+import heapq
+import itertools
+import json
+import os
+import random
+import sys
+import time
+
+ADMINISTER_QUESTION_QUEUE = 'administer_question_tasks'
+GAME_MONITOR_QUEUE = 'game_monitor_tasks'
+
+# Virtual time the simulated game starts at, 2026-01-01T00:00:00Z
+START_TIME = 1767225600
+# Constants below in seconds
+GAME_DURATION = 90 * 60
+WARMUP_DURATION = 5 * 60
+
+
+class VirtualClock:
+    """ Clock of a simulation, a drop-in for time.time that only moves when advanced """
+
+    def __init__(self, start=START_TIME):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, to):
+        self.now = max(self.now, to)
+
+
+class PlayerModel:
+    """ Behaviour of a synthetic team. Question types are implemented in the order they are introduced,
+        one every `pace` seconds from the start of the game, and answered correctly with probability
+        `accuracy` once implemented. A server error happens with probability `error_rate` and an outage of
+        `outage_duration` seconds, during which nothing answers, starts with probability `outage_rate`.
+        Its server takes `latency` seconds on average to answer, reported but not waited for """
+
+    def __init__(self, accuracy, pace, error_rate=0, outage_rate=0, outage_duration=60, latency=0.05):
+        self.accuracy = accuracy
+        self.pace = pace
+        self.error_rate = error_rate
+        self.outage_rate = outage_rate
+        self.outage_duration = outage_duration
+        self.latency = latency
+
+
+MODELS = {
+    "strong": PlayerModel(accuracy=0.98, pace=4 * 60, latency=0.02),
+    "average": PlayerModel(accuracy=0.9, pace=7 * 60, error_rate=0.02),
+    "weak": PlayerModel(accuracy=0.75, pace=15 * 60, error_rate=0.05, latency=0.1),
+    "flaky": PlayerModel(accuracy=0.85, pace=7 * 60, error_rate=0.1, outage_rate=0.002, outage_duration=120, latency=0.3),
+}
+
+QUESTION_TYPE_INDEX = {question_type: i for i, question_type in enumerate(QUESTION_TYPES)}
+
+
+class SimulatedPlayer:
+    """ One team following a PlayerModel, with its own random stream so a seeded game replays identically """
+
+    def __init__(self, name, model, clock, rng):
+        self.name = name
+        self.model = model
+        self.clock = clock
+        self.rng = rng
+        self.started = clock()
+        # teams don't all work at the same speed
+        self.pace = model.pace * rng.uniform(0.75, 1.25)
+        self.down_until = 0
+
+    def answer(self, question):
+        """ Returns the response type of the team's answer to question """
+        now, model, rng = self.clock(), self.model, self.rng
+        if now < self.down_until:
+            return "NO_SERVER_RESPONSE"
+        if rng.random() < model.outage_rate:
+            self.down_until = now + model.outage_duration
+            return "NO_SERVER_RESPONSE"
+        if rng.random() < model.error_rate:
+            return "ERROR_RESPONSE"
+        implemented = QUESTION_TYPE_INDEX[type(question)] * self.pace <= now - self.started
+        return "CORRECT" if implemented and rng.random() < model.accuracy else "WRONG"
+
+    def response_time(self):
+        return self.rng.expovariate(1 / self.model.latency) if self.model.latency else 0
+
+
+class SimulatedDispatcher:
+    """ Stands in for QuestionDispatcher, asking the synthetic player registered under each api """
+
+    def __init__(self):
+        self.players = {}   # api -> SimulatedPlayer
+        self.responses = Counter()
+
+    def add_player(self, api, player):
+        self.players[api] = player
+
+    def ask_all(self, asks, latencies=None):
+        response_types = [self.players[api].answer(question) for api, question in asks]
+        self.responses.update(response_types)
+        if latencies is not None:
+            latencies.extend(self.players[api].response_time() for api, _ in asks)
+        return response_types
+
+
+class GameSimulation:
+    """
+    One game from creation to its end. The warmup ends after `warmup` seconds; later rounds are then advanced
+    every `round_duration` seconds, or by the monitor's auto mode if round_duration is None. The game ends
+    after `duration` seconds and its stats are generated as for a real game.
+    """
+
+    def __init__(self, models, duration=GAME_DURATION, warmup=WARMUP_DURATION, round_duration=None, seed=None):
+        self.models = models    # one PlayerModel per team
+        self.duration = duration
+        self.warmup = warmup
+        self.round_duration = round_duration
+        self.rng = random.Random(seed)
+        self.clock = VirtualClock()
+        self.dispatcher = SimulatedDispatcher()
+        self.actions = []       # heap of (time, seq, description, function) scripted by the organiser
+        self.sequence = itertools.count()
+        self.scheduler = None
+        self.round_times = []   # (seconds since start, round) of every round change
+
+    def run(self, quiet=True):
+        """ Plays the game, returns its summary. Unless quiet is False, the game logic's prints are discarded """
+        if aws.backend() is not memory_backend:
+            raise RuntimeError(f"A game is only simulated on the in-memory backend, set {aws.BACKEND_ENV}=memory")
+
+        cache = Games.cache
+        output = open(os.devnull, "w") if quiet else contextlib.nullcontext(sys.stdout)
+        try:
+            with output as stdout, contextlib.redirect_stdout(stdout):
+                self.setup()
+                started = time.perf_counter()
+                self.play()
+                wall_seconds = time.perf_counter() - started
+                return self.summary(wall_seconds)
+        finally:
+            Games.cache = cache
+            aws.reset()
+
+    def setup(self):
+        # queue delays and cached games run on the virtual clock too
+        memory_backend.reset(self.clock)
+        aws.reset()
+        Games.cache = GameCache(clock=self.clock)
+        # the in-memory tables of dynamodb.schema exist from the start, queues are created
+        dynamodb = aws.dynamodb()
+        self.sqs = aws.client('sqs')
+        self.queue_urls = {name: self.sqs.create_queue(QueueName=name)['QueueUrl']
+                           for name in (ADMINISTER_QUESTION_QUEUE, GAME_MONITOR_QUEUE)}
+
+        self.games_manager = GamesManager(clock=self.clock)
+        self.event_sink = EventSink(dynamodb, clock=self.clock)
+        # questions and player ids come from the seed too, a seeded game replays identically
+        self.quiz_master = QuizMaster(dispatcher=self.dispatcher, event_sink=self.event_sink, clock=self.clock,
+                                      question_factory=QuestionFactory(rng=random.Random(self.rng.random())))
+        self.game_monitor = GameMonitor(clock=self.clock)
+
+        self.game_id = self.games_manager.new_game("simulation")['game_id']
+        self.scheduler = QuestionScheduler(self.game_id, self.quiz_master, clock=self.clock)
+        for i, model in enumerate(self.models):
+            api = f"sim://team{i}"
+            self.dispatcher.add_player(api, SimulatedPlayer(f"team{i}", model, self.clock, random.Random(self.rng.random())))
+            self.games_manager.add_player_to_game(self.game_id, f"team{i}", api, player_id=f"{self.rng.getrandbits(32):08x}")
+
+        self.script()
+
+    def script(self):
+        start = self.clock()
+        self.at(start + self.warmup, "end warmup", self.games_manager.advance_game_round)
+        if self.round_duration is None:
+            self.at(start + self.warmup, "auto mode", self.games_manager.set_auto_mode)
+        else:
+            for round in range(2, MAX_ROUND + 1):
+                round_start = start + self.warmup + (round - 1) * self.round_duration
+                if round_start < start + self.duration:
+                    self.at(round_start, f"round {round}", self.games_manager.advance_game_round)
+
+    def at(self, when, description, action):
+        heapq.heappush(self.actions, (when, next(self.sequence), description, action))
+
+    def play(self):
+        """ Runs every event in time order until the end of the game """
+        end = self.clock() + self.duration
+        round = 0
+        while True:
+            upcoming = [self.actions[0][0] if self.actions else None, self.scheduler.next_due()]
+            upcoming += [self.sqs.next_visible_at(url) for url in self.queue_urls.values()]
+            upcoming = [when for when in upcoming if when is not None]
+            if not upcoming or min(upcoming) >= end:
+                break
+            self.clock.advance(min(upcoming))
+
+            while self.actions and self.actions[0][0] <= self.clock():
+                _, _, _, action = heapq.heappop(self.actions)
+                action(self.game_id)
+            self.drain(GAME_MONITOR_QUEUE, self.game_monitor.handle_task)
+            self.drain(ADMINISTER_QUESTION_QUEUE, self.administer_question)
+            self.scheduler.tick()
+
+            game_round = int(self.games_manager.games.get_game(self.game_id)['round'])
+            if game_round != round:
+                round = game_round
+                self.round_times.append((self.clock() - end + self.duration, round))
+
+        self.clock.advance(end)
+        self.quiz_master.flush_events(force=True)
+        self.games_manager.end_game(self.game_id)
+
+    def drain(self, queue_name, handler):
+        """ Runs handler on the payload of every visible message of the queue, as the game runners would """
+        url = self.queue_urls[queue_name]
+        while True:
+            messages = self.sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=memory_backend.SQS_BATCH_LIMIT).get('Messages', [])
+            if not messages:
+                return
+            for message in messages:
+                handler(json.loads(message['Body']))
+            self.sqs.delete_message_batch(QueueUrl=url, Entries=[
+                {'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']} for i, message in enumerate(messages)])
+
+    def administer_question(self, payload):
+        # a queued task seeds the scheduler, as in Worker.administer_question
+        self.scheduler.schedule(payload['player_id'], payload['modification_hash'],
+            payload.get('prev_delay', DEFAULT_DELAY), due_time=self.clock())
+
+    def summary(self, wall_seconds):
+        questions = sum(self.dispatcher.responses.values())
+        return {
+            "game_id": self.game_id,
+            "players": len(self.models),
+            "virtual_seconds": self.duration,
+            "wall_seconds": round(wall_seconds, 3),
+            "questions": questions,
+            "questions_per_second": round(questions / wall_seconds, 1) if wall_seconds else 0,
+            "responses": dict(self.dispatcher.responses),
+            "rounds": self.round_times,
+            "leaderboard": self.games_manager.review_finalboard(self.game_id),
+            "stats": self.games_manager.review_stats(self.game_id),
+            "latency": self.games_manager.get_latency_metrics(self.game_id),
+        }
+
+    def events(self):
+        """ Yields every player and game event of the game ordered by timestamp, each with its "kind" """
+        player_events = self.games_manager.player_events.iter_events_by_timestamp(self.game_id, forward=True)
+        game_events = self.games_manager.game_events.iter_game_events_by_timestamp(self.game_id, forward=True)
+        merged = heapq.merge(
+            (dict(event, kind="player") for event in player_events),
+            (dict(event, kind="game") for event in game_events),
+            key=lambda event: event['timestamp'])
+        yield from merged
+
+
+def as_json(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def player_models(weights, players, rng):
+    names = list(weights)
+    return [MODELS[name] for name in rng.choices(names, [weights[name] for name in names], k=players)]
+
+
+def model_weight(value):
+    name, _, weight = value.partition("=")
+    if name not in MODELS:
+        raise argparse.ArgumentTypeError(f"unknown model {name}, choose from {', '.join(MODELS)}")
+    return name, float(weight or 1)
+
+
+def print_summary(summary, top):
+    print(f"game {summary['game_id']}: {summary['players']} players, {summary['virtual_seconds'] / 60:.0f} minutes")
+    print(f"simulated in           {summary['wall_seconds']:.2f} s")
+    print(f"questions              {summary['questions']}")
+    print(f"questions per second   {summary['questions_per_second']:.0f}")
+    for response_type, count in sorted(summary['responses'].items()):
+        print(f"    {response_type:<22} {count}")
+    print("rounds                 " + ", ".join(f"{round} at {seconds / 60:.1f} min" for seconds, round in summary['rounds']))
+    print()
+    for position, player in enumerate(summary['leaderboard'][:top], 1):
+        print(f"{position:>3}. {player['name']:<10} {player['score']:>8}  {float(player['success_ratio']):.0%} correct")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=200, help="synthetic teams")
+    parser.add_argument("--model", dest="models", action="append", type=model_weight,
+                        help="NAME=WEIGHT of a player model, repeatable (default average=1)")
+    parser.add_argument("--duration", type=float, default=GAME_DURATION / 60, help="game length in minutes")
+    parser.add_argument("--warmup", type=float, default=WARMUP_DURATION / 60, help="warmup length in minutes")
+    parser.add_argument("--round-duration", type=float,
+                        help="minutes per round after the warmup (default: rounds advanced by auto mode)")
+    parser.add_argument("--seed", type=int, help="seed of the player models, answers and questions")
+    parser.add_argument("--events", help="write the event stream to this file, one JSON event per line")
+    parser.add_argument("--json", help="write the summary to this file as JSON")
+    parser.add_argument("--top", type=int, default=10, help="players of the final leaderboard shown")
+    parser.add_argument("--min-rate", type=float, help="fail if fewer questions per second are simulated")
+    parser.add_argument("--verbose", action="store_true", help="show the game logic's output")
+    args = parser.parse_args()
+
+    os.environ[aws.BACKEND_ENV] = "memory"
+    rng = random.Random(args.seed)
+    simulation = GameSimulation(
+        player_models(dict(args.models or [("average", 1)]), args.players, rng),
+        duration=args.duration * 60, warmup=args.warmup * 60,
+        round_duration=args.round_duration * 60 if args.round_duration is not None else None,
+        seed=args.seed)
+    summary = simulation.run(quiet=not args.verbose)
+
+    print_summary(summary, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, default=as_json, indent=2)
+    if args.events:
+        with open(args.events, "w") as f:
+            for event in simulation.events():
+                f.write(json.dumps(event, default=as_json) + "\n")
+    if args.min_rate is not None and summary['questions_per_second'] < args.min_rate:
+        print(f"\nBelow the minimum of {args.min_rate:.0f} questions per second")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
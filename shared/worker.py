@@ -0,0 +1,269 @@
+from shared.quiz_master import QuizMaster
+from shared.game_monitor import GameMonitor
+from shared.question_scheduler import QuestionScheduler, TICK_INTERVAL
+from shared.rate_controller import DEFAULT_DELAY
+from shared import aws
+from dynamodb.event_sink import EventSink
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import json
+import time
+
+ADMINISTER_QUESTION_QUEUE = 'administer_question_tasks'
+GAME_MONITOR_QUEUE = 'game_monitor_tasks'
+
+# SQS limits of one ReceiveMessage/DeleteMessageBatch call
+MAX_MESSAGES = 10
+RECEIVE_WAIT_TIME = 20
+# Messages and scheduler ticks processed at the same time
+MAX_WORKERS = 16
+# Seconds an administer_question message stays in flight while its player is scheduled in process, extended
+# every LEASE_HEARTBEAT. Should the worker die, the message is received again once its lease expires
+LEASE_TIMEOUT = 60
+LEASE_HEARTBEAT = 20
+
+
+class Worker:
+    """
+    Long-lived game runner, an alternative to the Lambda functions of lambda-game-runner for running
+    games on a single box. Disable the queues' Lambda triggers before starting it.
+
+    Both task queues are long-polled with one reused client and resolved queue URLs, records are
+    processed concurrently and deleted in batches. An administer_question task seeds the game's
+    QuestionScheduler, which then keeps asking the player in process instead of through the queue.
+
+    The message of an administer_question task isn't deleted while its player is scheduled: it is kept
+    in flight as the player's lease. On stop, every pending question is sent back to the queue before
+    the leases are deleted; if the worker dies, the leases expire and the players are resumed by the
+    next worker to receive their messages.
+    """
+
+    def __init__(self, sqs_client=None, quiz_master=None, game_monitor=None, max_workers=MAX_WORKERS, clock=time.time):
+        self.sqs = sqs_client if sqs_client is not None else aws.client('sqs')
+        self.queue_urls = {
+            name: self.sqs.get_queue_url(QueueName=name)['QueueUrl']
+            for name in (ADMINISTER_QUESTION_QUEUE, GAME_MONITOR_QUEUE)
+        }
+        self.event_sink = None
+        if quiz_master is None:
+            self.event_sink = EventSink(aws.dynamodb())
+            quiz_master = QuizMaster(event_sink=self.event_sink)
+        self.quiz_master = quiz_master
+        self.game_monitor = game_monitor if game_monitor is not None else GameMonitor()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="worker")
+        self.clock = clock
+        self.stop_event = threading.Event()
+
+        self.lock = threading.Lock()
+        self.schedulers = {}    # game_id -> QuestionScheduler
+        self.ticking = set()    # game_ids with a tick running
+        self.schedulers_changed = threading.Event()
+        self.leases = {}        # (game_id, player_id) -> receipt handle of the message that seeded the player
+        self.last_heartbeat = clock()
+
+    def run(self):
+        """ Runs until stop() is called, then hands the pending questions back to the queue and writes the
+            buffered events """
+        threads = [
+            threading.Thread(target=self.poll, args=(ADMINISTER_QUESTION_QUEUE, self.administer_message, LEASE_TIMEOUT),
+                             daemon=True),
+            threading.Thread(target=self.poll, args=(GAME_MONITOR_QUEUE, self.monitor_message), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            self.run_schedulers()
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
+            self.executor.shutdown()
+            self.requeue_questions()
+            self.quiz_master.flush_events(force=True)
+
+    def stop(self):
+        self.stop_event.set()
+        self.schedulers_changed.set()
+
+    # SQS
+
+    def poll(self, queue_name, handler, visibility_timeout=None):
+        """ Long-polls queue_name and runs handler on every message. Messages are received with the queue's
+            visibility timeout unless visibility_timeout is given """
+        queue_url = self.queue_urls[queue_name]
+        params = {} if visibility_timeout is None else {'VisibilityTimeout': visibility_timeout}
+        while not self.stop_event.is_set():
+            try:
+                response = self.sqs.receive_message(
+                    QueueUrl=queue_url, MaxNumberOfMessages=MAX_MESSAGES, WaitTimeSeconds=RECEIVE_WAIT_TIME,
+                    MessageSystemAttributeNames=['ApproximateReceiveCount'], **params)
+                messages = response.get('Messages', [])
+                if messages:
+                    self.process(queue_url, messages, handler)
+            except Exception as err:
+                print("Couldn't poll queue", queue_name, err)
+                self.stop_event.wait(1)
+
+    def process(self, queue_url, messages, handler):
+        """ Runs handler on messages concurrently and deletes the messages it returned True for.
+            Failed messages are left on the queue, to be received again after their visibility timeout """
+        done = list(self.executor.map(lambda message: self.handle(handler, message), messages))
+        self.delete_messages(queue_url, [message['ReceiptHandle'] for message, ok in zip(messages, done) if ok])
+
+    def handle(self, handler, message):
+        try:
+            return handler(message)
+        except Exception as err:
+            print("Couldn't process message", message.get('MessageId'), err)
+            return False
+
+    def delete_messages(self, queue_url, receipt_handles):
+        for i in range(0, len(receipt_handles), MAX_MESSAGES):
+            entries = [{'Id': str(j), 'ReceiptHandle': receipt_handle}
+                       for j, receipt_handle in enumerate(receipt_handles[i:i + MAX_MESSAGES])]
+            try:
+                response = self.sqs.delete_message_batch(QueueUrl=queue_url, Entries=entries)
+            except Exception as err:
+                print("Couldn't delete messages", err)
+                continue
+            for failure in response.get('Failed', []):
+                print("Couldn't delete message", failure)
+
+    def monitor_message(self, message):
+        """ Runs a game_monitor task, its message is then deleted """
+        self.game_monitor.handle_task(json.loads(message['Body']))
+        return True
+
+    def administer_message(self, message):
+        """ Seeds the game's scheduler with an administer_question task and keeps its message as the player's
+            lease. Returns True, for the message to be deleted, only if the player isn't scheduled """
+        payload = json.loads(message['Body'])
+        # received before: the worker holding it died, or failed to process it
+        resumed = int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1)) > 1
+        if not self.administer_question(payload, resumed):
+            return True
+        key = (payload['game_id'], payload['player_id'])
+        with self.lock:
+            superseded = self.leases.get(key)
+            self.leases[key] = message['ReceiptHandle']
+        if superseded is not None:
+            self.delete_messages(self.queue_urls[ADMINISTER_QUESTION_QUEUE], [superseded])
+        return False
+
+    def renew_leases(self):
+        """ Extends the leases of the scheduled players and deletes the messages of the players whose
+            questions stopped, e.g. because the game ended """
+        with self.lock:
+            self.last_heartbeat = self.clock()
+            held, ended = [], []
+            for (game_id, player_id), receipt_handle in self.leases.items():
+                scheduler = self.schedulers.get(game_id)
+                # a tick has the player's task out of the scheduler while it runs
+                if game_id in self.ticking or (scheduler is not None and player_id in scheduler.modification_hashes):
+                    held.append(((game_id, player_id), receipt_handle))
+                else:
+                    ended.append((game_id, player_id))
+            released = [self.leases.pop(key) for key in ended]
+        queue_url = self.queue_urls[ADMINISTER_QUESTION_QUEUE]
+        self.delete_messages(queue_url, released)
+        for i in range(0, len(held), MAX_MESSAGES):
+            batch = held[i:i + MAX_MESSAGES]
+            try:
+                response = self.sqs.change_message_visibility_batch(QueueUrl=queue_url, Entries=[
+                    {'Id': str(j), 'ReceiptHandle': receipt_handle, 'VisibilityTimeout': LEASE_TIMEOUT}
+                    for j, (_, receipt_handle) in enumerate(batch)
+                ])
+            except Exception as err:
+                print("Couldn't renew leases", err)
+                continue
+            for failure in response.get('Failed', []):
+                # the lease expired and the message was received again, the player is resumed by its receiver
+                print("Couldn't renew lease", failure)
+                with self.lock:
+                    key, receipt_handle = batch[int(failure['Id'])]
+                    if self.leases.get(key) == receipt_handle:
+                        del self.leases[key]
+
+    def requeue_questions(self):
+        """ Sends every pending question back to the task queue, then deletes the leases of the players.
+            A player whose question couldn't be sent keeps its lease, to be resumed once it expires """
+        with self.lock:
+            schedulers, self.schedulers = self.schedulers, {}
+            leases, self.leases = self.leases, {}
+        for game_id, scheduler in schedulers.items():
+            for player_id, modification_hash, delay in scheduler.drain():
+                try:
+                    self.quiz_master.schedule_question(game_id, player_id, modification_hash, delay)
+                except Exception as err:
+                    print("Couldn't requeue question of player", player_id, err)
+                    leases.pop((game_id, player_id), None)
+        self.delete_messages(self.queue_urls[ADMINISTER_QUESTION_QUEUE], list(leases.values()))
+
+    # Question scheduling
+
+    def administer_question(self, payload, resumed=False):
+        """ Seeds the game's scheduler with a task received from the administer_question_tasks queue.
+            The queue already applied the task's delay, so it is due now. A resumed task continues from the
+            player's current modification_hash. Returns False if the player no longer exists """
+        game_id, player_id = payload['game_id'], payload['player_id']
+        modification_hash = payload['modification_hash']
+        if resumed:
+            # should the player's questions still run elsewhere, the conditional write of the next answer
+            # ends one of the two chains
+            player = self.quiz_master.players.get_player(game_id, player_id, consistent=True)
+            if player is None:
+                return False
+            modification_hash = player['modification_hash']
+        with self.lock:
+            if game_id not in self.schedulers:
+                self.schedulers[game_id] = QuestionScheduler(game_id, self.quiz_master, clock=self.clock)
+            self.schedulers[game_id].schedule(player_id, modification_hash,
+                payload.get('prev_delay', DEFAULT_DELAY), due_time=self.clock())
+        self.schedulers_changed.set()
+        return True
+
+    def run_schedulers(self):
+        """ Starts a tick for every game with due questions, at most one tick per game at a time """
+        while not self.stop_event.is_set():
+            self.schedulers_changed.clear()
+            now = self.clock()
+            wait = TICK_INTERVAL
+            with self.lock:
+                for game_id, scheduler in list(self.schedulers.items()):
+                    if game_id in self.ticking:
+                        continue
+                    next_due = scheduler.next_due()
+                    if next_due is None:
+                        # game ended or all its players left, seeded again by its next task
+                        del self.schedulers[game_id]
+                    elif next_due <= now:
+                        self.ticking.add(game_id)
+                        self.executor.submit(self.tick, game_id, scheduler)
+                    else:
+                        wait = min(wait, next_due - now)
+            if now - self.last_heartbeat >= LEASE_HEARTBEAT:
+                self.renew_leases()
+            try:
+                self.quiz_master.flush_events()
+            except Exception as err:
+                # e.g. throttled, the sink keeps the events buffered and the next pass retries them
+                print("Couldn't flush events", err)
+            self.schedulers_changed.wait(timeout=wait)
+
+    def tick(self, game_id, scheduler):
+        try:
+            scheduler.tick()
+        except Exception as err:
+            print("Couldn't administer questions of game", game_id, err)
+        finally:
+            with self.lock:
+                self.ticking.discard(game_id)
+            self.schedulers_changed.set()
+
+
+if __name__ == "__main__":
+    worker = Worker()
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
@@ -0,0 +1,90 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws, memory_backend
+from shared.quiz_master import QuizMaster, DEFAULT_DELAY
+from shared.games_manager import GamesManager
+from dynamodb.games import Games
+from botocore.exceptions import ClientError
+import pytest
+
+
+class AlwaysCorrect:
+    def ask_all(self, asks, latencies=None):
+        return ["CORRECT"] * len(asks)
+
+
+@pytest.fixture()
+def game(monkeypatch):
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+    games_manager = GamesManager()
+    game_id = games_manager.new_game("secret")['game_id']
+    players = [games_manager.add_player_to_game(game_id, f"team{i}", "http://team") for i in range(3)]
+    yield game_id, players
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+
+
+def tasks(players):
+    return [(player['player_id'], player['modification_hash'], DEFAULT_DELAY) for player in players]
+
+
+def test_failed_player_is_retried_without_the_rest_of_the_batch(game, monkeypatch):
+    game_id, players = game
+    quiz_master = QuizMaster(dispatcher=AlwaysCorrect())
+    record_answer = quiz_master.players.record_answer
+
+    def throttled(game_id, player_id, *args, **kwargs):
+        if player_id == players[1]['player_id']:
+            raise RuntimeError("throttled")
+        return record_answer(game_id, player_id, *args, **kwargs)
+
+    monkeypatch.setattr(quiz_master.players, "record_answer", throttled)
+    next_tasks = quiz_master.administer_questions(game_id, tasks(players), reschedule=False)
+
+    # the failed player is asked again with its unchanged hash, the others carry on with their rotated hash
+    assert next_tasks[1] == (players[1]['modification_hash'], DEFAULT_DELAY)
+    for i in (0, 2):
+        assert next_tasks[i][0] == quiz_master.players.get_player(game_id, players[i]['player_id'])['modification_hash']
+        assert next_tasks[i][0] != players[i]['modification_hash']
+
+
+def test_failed_leaderboard_snapshot_keeps_the_recorded_answers(game, monkeypatch):
+    game_id, players = game
+    quiz_master = QuizMaster(dispatcher=AlwaysCorrect())
+
+    def throttled(*args, **kwargs):
+        raise RuntimeError("throttled")
+
+    monkeypatch.setattr(quiz_master.leaderboard_snapshots, "put_snapshot", throttled)
+    next_tasks = quiz_master.administer_questions(game_id, tasks(players), reschedule=False)
+
+    for player, next_task in zip(players, next_tasks):
+        assert next_task[0] == quiz_master.players.get_player(game_id, player['player_id'])['modification_hash']
+
+
+@pytest.mark.parametrize("reasons, retried", [
+    ([{"Code": "ConditionalCheckFailed"}, {"Code": "None"}], False),
+    ([{"Code": "TransactionConflict"}, {"Code": "None"}], True),
+    (None, True),
+])
+def test_only_a_stale_hash_ends_the_player_questions(game, monkeypatch, reasons, retried):
+    game_id, players = game
+    quiz_master = QuizMaster(dispatcher=AlwaysCorrect())
+
+    def failed(*args, **kwargs):
+        if reasons is None:
+            raise ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": ""}}, "UpdateItem")
+        err = ClientError({"Error": {"Code": "TransactionCanceledException", "Message": ""}}, "TransactWriteItems")
+        err.response["CancellationReasons"] = reasons
+        raise err
+
+    monkeypatch.setattr(quiz_master.players, "record_answer", failed)
+    next_task = quiz_master.administer_question(game_id, players[0]['player_id'], players[0]['modification_hash'],
+                                                reschedule=False)
+    assert next_task == ((players[0]['modification_hash'], DEFAULT_DELAY) if retried else None)
@@ -0,0 +1,64 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws
+from botocore.exceptions import ClientError
+from unittest.mock import Mock
+import json
+import pytest
+
+
+@pytest.fixture()
+def sqs(monkeypatch):
+    sqs = Mock()
+    monkeypatch.setattr(aws, "_clients", {"sqs": sqs})
+    monkeypatch.setattr(aws, "_queue_urls", {})
+    monkeypatch.setattr(aws, "control_plane_calls", 0)
+    return sqs
+
+
+def test_queue_url_is_resolved_once(sqs):
+    sqs.get_queue_url.return_value = {"QueueUrl": "url"}
+    assert aws.queue_url("tasks") == "url"
+    assert aws.queue_url("tasks") == "url"
+    sqs.get_queue_url.assert_called_once_with(QueueName="tasks")
+    assert aws.control_plane_calls == 1
+
+
+def test_missing_queue_is_created(sqs):
+    sqs.get_queue_url.side_effect = ClientError(
+        {"Error": {"Code": "AWS.SimpleQueueService.NonExistentQueue", "Message": ""}}, "GetQueueUrl")
+    sqs.create_queue.return_value = {"QueueUrl": "new-url"}
+    assert aws.queue_url("tasks") == "new-url"
+    assert aws.control_plane_calls == 2
+
+
+def test_other_errors_are_raised(sqs):
+    sqs.get_queue_url.side_effect = ClientError({"Error": {"Code": "AccessDenied", "Message": ""}}, "GetQueueUrl")
+    with pytest.raises(ClientError):
+        aws.queue_url("tasks")
+
+
+def test_messages_are_sent_in_batches_of_ten(sqs):
+    sqs.get_queue_url.return_value = {"QueueUrl": "url"}
+    sqs.send_message_batch.side_effect = [{}, {}, {"Failed": [{"Id": "1"}]}]
+    failed = aws.send_messages("tasks", [{"n": i} for i in range(23)])
+    assert [len(call.kwargs["Entries"]) for call in sqs.send_message_batch.call_args_list] == [10, 10, 3]
+    assert failed == [{"n": 21}]
+
+
+def test_cold_start_is_reported_after_the_first_invocation(sqs, capsys):
+    sqs.get_queue_url.return_value = {"QueueUrl": "url"}
+
+    @aws.report_cold_start("tasks")
+    def handler(event, context):
+        return aws.queue_url("tasks")
+
+    assert handler({}, None) == "url"
+    handler({}, None)
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    # logged once, with the queue URL resolved during the invocation
+    assert len(lines) == 1
+    assert lines[0]["cold_start"] == "tasks" and lines[0]["control_plane_calls"] == 1
+    assert 0 < lines[0]["init_ms"] <= round(aws.process_uptime() * 1000, 1)
@@ -1,34 +1,210 @@
-from setups_for_tests import *
-import pymongo
+import sys
 
+sys.path.append(".")
 
-@with_local_database
-def test_can_insert_one(cli: pymongo.MongoClient):
-    # Try to insert a simple doc
-    assert cli.xs.abcdef.count_documents({}) == 0
+from shared import aws, memory_backend
+from shared.games_manager import GamesManager
+from dynamodb.games import Games
+from dynamodb.players import Players
+from dynamodb.player_events import PlayerEvents
+from dynamodb.game_events import GameEvents
+from dynamodb.event_sink import EventSink
+from dynamodb.leaderboard_snapshots import LeaderboardSnapshots
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from decimal import Decimal
+import json
+import pytest
 
-    test_id = cli.xs.abcdef.insert_one({"hello": "world"}).inserted_id
-    assert cli.xs.abcdef.count_documents({}) == 1
 
-    # Find it again in the db. This should be the only document.
-    test_doc = cli.xs.abcdef.find_one()
+@pytest.fixture()
+def dynamodb(monkeypatch):
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+    yield aws.dynamodb()
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
 
-    assert test_doc["_id"] == test_id
-    assert test_doc["hello"] == "world"
 
+def test_game_round_and_modification_hash(dynamodb):
+    games = Games(dynamodb)
+    game = games.add_game("secret")
+    assert games.update_round(game['game_id'])['round'] == 1
+    assert games.get_game(game['game_id'], consistent=True)['round'] == Decimal(1)
 
-@with_local_database
-def test_can_remove_single_by_id(cli: pymongo.MongoClient):
-    # Insert some docs
-    test_id_1 = cli.xs.abcdef.insert_one({"will_be_deleted": "yes"}).inserted_id
-    test_id_2 = cli.xs.abcdef.insert_one({"will_be_deleted": "no"}).inserted_id
-    assert cli.xs.abcdef.count_documents({}) == 2
+    games.validate_modification_hash(game['game_id'], game['modification_hash'])
+    with pytest.raises(ClientError) as err:
+        games.validate_modification_hash(game['game_id'], game['modification_hash'])
+    assert err.value.response['Error']['Code'] == 'ConditionalCheckFailedException'
 
-    # Remove the first one
-    cli.xs.abcdef.find_one_and_delete({"_id": test_id_1})
-    assert cli.xs.abcdef.count_documents({}) == 1
 
-    # Find the remaining one
-    left = cli.xs.abcdef.find_one()
-    assert left["_id"] == test_id_2
-    assert left["will_be_deleted"] == "no"
+def test_scan_filters_games(dynamodb):
+    games = Games(dynamodb)
+    running, ended = games.add_game("a"), games.add_game("b")
+    games.update_games_attribute(ended['game_id'], ended=True)
+    assert [game['game_id'] for game in games.scan_games(ended=False)] == [running['game_id']]
+
+
+def test_score_index_orders_active_players(dynamodb):
+    players = Players(dynamodb)
+    added = [players.add_player("g", name, "http://api") for name in "abc"]
+    for player, score in zip(added, [5, 20, 10]):
+        players.update_score("g", player['player_id'], score)
+    players.update_player_attribute("g", added[2]['player_id'], active=False)
+
+    ranked = players.query_players_by_score("g", ['name', 'score'], active=True)
+    assert ranked == [{'name': 'b', 'score': Decimal(20)}, {'name': 'a', 'score': Decimal(5)}]
+
+
+def test_consistent_read_is_rejected_on_global_index(dynamodb):
+    definition = {
+        'TableName': 'scores',
+        'KeySchema': [{'AttributeName': 'id', 'KeyType': 'HASH'}],
+        'AttributeDefinitions': [{'AttributeName': 'id', 'AttributeType': 'S'},
+                                 {'AttributeName': 'score', 'AttributeType': 'N'}],
+        'GlobalSecondaryIndexes': [{'IndexName': 'score-index', 'KeySchema': [{'AttributeName': 'score', 'KeyType': 'HASH'}],
+                                    'Projection': {'ProjectionType': 'ALL'}}],
+    }
+    table = dynamodb.create_table(**definition)
+    table.put_item(Item={'id': 'a', 'score': 1})
+    assert table.query(IndexName='score-index', KeyConditionExpression=Key('score').eq(1))['Count'] == 1
+    with pytest.raises(ClientError) as err:
+        table.query(IndexName='score-index', KeyConditionExpression=Key('score').eq(1), ConsistentRead=True)
+    assert err.value.response['Error']['Code'] == 'ValidationException'
+
+
+def test_record_answer_is_atomic(dynamodb):
+    players, events = Players(dynamodb), PlayerEvents(dynamodb)
+    player = players.add_player("g", "a", "http://api")
+    event = events.new_event("g", player['player_id'], 10, "q", 1, 10, "CORRECT")
+
+    players.record_answer("g", player['player_id'], player['modification_hash'], "new", 10,
+        ['correct_tally'], event=event, streak="1")
+    assert players.get_player("g", player['player_id'])['score'] == 10
+    assert len(events.query_events("g")) == 1
+
+    # stale hash: neither the player nor the event is written
+    stale = events.new_event("g", player['player_id'], 20, "q", 1, 10, "CORRECT")
+    with pytest.raises(ClientError) as err:
+        players.record_answer("g", player['player_id'], player['modification_hash'], "newer", 10,
+            ['correct_tally'], event=stale, streak="11")
+    assert err.value.response['Error']['Code'] == 'TransactionCanceledException'
+    assert players.get_player("g", player['player_id'])['correct_tally'] == 1
+    assert len(events.query_events("g")) == 1
+
+
+def test_timestamp_index_pages_and_since(dynamodb):
+    events = PlayerEvents(dynamodb)
+    for i in range(5):
+        event = events.new_event("g", "p0000000", i, "q", 1, 1, "CORRECT")
+        event['timestamp'] = f"2026-01-01T00:00:0{i}"
+        dynamodb.Table('player_events').put_item(Item=event)
+
+    first, cursor = events.query_events_by_timestamp_page("g", 2, forward=True)
+    second, cursor = events.query_events_by_timestamp_page("g", 2, cursor=cursor, forward=True)
+    assert [event['score'] for event in first + second] == [0, 1, 2, 3]
+    assert cursor is not None
+
+    since = list(events.iter_events_by_timestamp("g", ['score'], forward=True, since="2026-01-01T00:00:03"))
+    assert since == [{'score': 3}, {'score': 4}]
+
+
+@pytest.fixture()
+def events_of_players(dynamodb):
+    """ Events of players "abc" and "abcd", whose id starts with the first one, at interleaved timestamps """
+    events = PlayerEvents(dynamodb)
+    for i, player_id in enumerate(["abc", "abcd", "abc", "abcd", "abc"]):
+        event = events.new_event("g", player_id, i, "q", 1, 1, "CORRECT")
+        event['timestamp'] = f"2026-01-01T00:00:0{4 - i}"
+        dynamodb.Table('player_events').put_item(Item=event)
+    return events
+
+
+def test_events_for_player_exclude_players_with_a_longer_id(events_of_players):
+    events = events_of_players
+    assert [event['score'] for event in events.query_events_for_player("g", "abc")] == [0, 2, 4]
+    assert [event['score'] for event in events.query_events_for_player("g", "abc", forward=True)] == [4, 2, 0]
+    assert [event['score'] for event in events.query_events_for_player("g", "abcd", ['score'])] == [1, 3]
+    assert events.query_events_for_player("g", "ab") == []
+
+
+def test_events_are_grouped_by_player(events_of_players):
+    by_player = events_of_players.query_events_by_player("g", ['score'], forward=True)
+    assert {player_id: [event['score'] for event in events] for player_id, events in by_player.items()} \
+        == {"abc": [4, 2, 0], "abcd": [3, 1]}
+
+
+def test_game_events_since(dynamodb):
+    game_events = GameEvents(dynamodb)
+    game_events.add_game_events("g", "NewLeader", "a leads", "p0000000")
+    assert [event['title'] for event in game_events.iter_game_events_by_timestamp("g", since="2000-01-01T00:00:00")] \
+        == ["NewLeader"]
+    assert list(game_events.iter_game_events_by_timestamp("g", since="2999-01-01T00:00:00")) == []
+
+
+def test_older_leaderboard_snapshot_is_not_written(dynamodb):
+    games, snapshots = Games(dynamodb), LeaderboardSnapshots(dynamodb)
+    game_id = games.add_game("secret")['game_id']
+    assert snapshots.put_snapshot(game_id, [{"player_id": "new", "score": 20}], Decimal(2))
+    # e.g. a container whose leaderboard is older
+    assert not snapshots.put_snapshot(game_id, [{"player_id": "old", "score": 10}], Decimal(1))
+
+    assert snapshots.get_snapshot(game_id)['leaderboard'] == [{"player_id": "new", "score": 20}]
+    assert 'leaderboard' not in games.get_game(game_id, consistent=True)
+
+
+def test_event_sink_writes_in_batches(dynamodb):
+    events = PlayerEvents(dynamodb)
+    with EventSink(dynamodb, max_events=100) as sink:
+        for i in range(60):
+            sink.add(events.new_event("g", "p%07d" % i, i, "q", 1, 1, "CORRECT"))
+    assert sink.metrics()['flushed_events'] == 60
+    assert len(events.query_events("g")) == 60
+
+
+def test_floats_are_rejected(dynamodb):
+    with pytest.raises(TypeError):
+        dynamodb.Table('games').put_item(Item={'game_id': "g", 'ratio': 0.5})
+
+
+def test_queue_honours_delay_and_visibility():
+    now = [0]
+    sqs = memory_backend.MemorySQSClient(clock=lambda: now[0])
+    url = sqs.create_queue(QueueName="tasks")['QueueUrl']
+    sqs.send_message(QueueUrl=url, MessageBody="later", DelaySeconds=5)
+    sqs.send_message(QueueUrl=url, MessageBody="now")
+
+    messages = sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10, VisibilityTimeout=10)['Messages']
+    assert [message['Body'] for message in messages] == ["now"]
+
+    now[0] = 5
+    later = sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10)['Messages']
+    assert [message['Body'] for message in later] == ["later"]
+    sqs.delete_message_batch(QueueUrl=url, Entries=[{'Id': "0", 'ReceiptHandle': later[0]['ReceiptHandle']}])
+
+    # not deleted, so received again once its visibility timeout expires
+    now[0] = 11
+    assert [message['Body'] for message in sqs.receive_message(QueueUrl=url)['Messages']] == ["now"]
+    assert sqs.get_queue_attributes(QueueUrl=url)['Attributes']['ApproximateNumberOfMessagesNotVisible'] == "1"
+
+
+def test_games_manager_queues_first_questions(dynamodb):
+    games_manager = GamesManager()
+    game = games_manager.new_game("secret")
+    players = [games_manager.add_player_to_game(game['game_id'], name, "http://api") for name in "ab"]
+
+    games_manager.advance_game_round(game['game_id'])
+
+    sqs = aws.client('sqs')
+    url = aws.queue_url('administer_question_tasks')
+    tasks = [json.loads(message['Body'])
+             for message in sqs.receive_message(QueueUrl=url, MaxNumberOfMessages=10)['Messages']]
+    hashes = {player['player_id']: games_manager.players.get_player(game['game_id'], player['player_id'])['modification_hash']
+              for player in players}
+    # one task per player on joining, then one with the rotated hash at the end of the warmup
+    assert len(tasks) == 4
+    assert {task['player_id']: task['modification_hash'] for task in tasks[2:]} == hashes
+    assert len(games_manager.get_player_events(game['game_id'], players[0]['player_id'])) == 1
@@ -0,0 +1,79 @@
+import sys
+
+sys.path.append(".")
+
+from dynamodb.event_sink import EventSink
+from botocore.exceptions import ClientError, EndpointConnectionError
+from unittest.mock import Mock, patch
+import pytest
+
+
+@pytest.fixture()
+def basic_sink():
+    dyn_resource = Mock()
+    dyn_resource.batch_write_item.return_value = {}
+    return EventSink(dyn_resource, max_events=30, max_age=10, clock=lambda: 0), dyn_resource
+
+
+def test_buffers_until_size_threshold(basic_sink):
+    sink, dyn_resource = basic_sink
+    for i in range(29):
+        sink.add({"id": i})
+    dyn_resource.batch_write_item.assert_not_called()
+
+    sink.add({"id": 29})
+    assert dyn_resource.batch_write_item.call_count == 2
+    assert len(sink) == 0
+    assert sink.metrics()["flushed_events"] == 30
+
+
+def test_flushes_in_groups_of_25(basic_sink):
+    sink, dyn_resource = basic_sink
+    sink.buffer = [{"id": i} for i in range(26)]
+    sink.flush()
+
+    sizes = [len(call.kwargs["RequestItems"]["player_events"]) for call in dyn_resource.batch_write_item.call_args_list]
+    assert sizes == [25, 1]
+
+
+def test_retries_unprocessed_items(basic_sink):
+    sink, dyn_resource = basic_sink
+    unprocessed = {"UnprocessedItems": {"player_events": [{"PutRequest": {"Item": {"id": 0}}}]}}
+    dyn_resource.batch_write_item.side_effect = [unprocessed, {}]
+
+    with patch("time.sleep", return_value=None):
+        sink.add({"id": 0})
+        sink.flush()
+
+    assert dyn_resource.batch_write_item.call_count == 2
+    assert sink.metrics()["retries"] == 1
+    assert len(sink) == 0
+
+
+def test_keeps_items_still_unprocessed_after_retries(basic_sink):
+    sink, dyn_resource = basic_sink
+    dyn_resource.batch_write_item.return_value = {
+        "UnprocessedItems": {"player_events": [{"PutRequest": {"Item": {"id": 0}}}]}
+    }
+
+    with patch("time.sleep", return_value=None):
+        sink.add({"id": 0})
+        sink.flush()
+
+    assert sink.buffer == [{"id": 0}]
+
+
+@pytest.mark.parametrize("failure", [
+    EndpointConnectionError(endpoint_url="https://dynamodb"),
+    ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "BatchWriteItem"),
+])
+def test_keeps_unwritten_items_when_a_call_fails(basic_sink, failure):
+    sink, dyn_resource = basic_sink
+    dyn_resource.batch_write_item.side_effect = [{}, failure]
+    sink.buffer = [{"id": i} for i in range(30)]
+
+    with pytest.raises(type(failure)):
+        sink.flush()
+
+    # the first batch was written, the second is kept in order
+    assert sink.buffer == [{"id": i} for i in range(25, 30)]
@@ -0,0 +1,53 @@
+import sys
+
+sys.path.append(".")
+
+from dynamodb.games import Games, GameCache
+from unittest.mock import Mock
+import pytest
+
+
+@pytest.fixture()
+def cached_games():
+    now = [0]
+    dyn_resource = Mock()
+    table = dyn_resource.Table.return_value
+    table.get_item.return_value = {"Item": {"game_id": "g", "round": 1}}
+    table.update_item.return_value = {"Attributes": {}}
+    games = Games(dyn_resource)
+    games.cache = GameCache(ttl=2, clock=lambda: now[0])
+    return games, table, now
+
+
+def test_get_game_is_served_from_cache(cached_games):
+    games, table, _ = cached_games
+    games.get_game("g")
+    games.get_game("g")["round"] = 5
+
+    assert games.get_game("g")["round"] == 1
+    assert table.get_item.call_count == 1
+    assert games.cache.hits == 2
+
+
+def test_cached_game_expires(cached_games):
+    games, table, now = cached_games
+    games.get_game("g")
+    now[0] = 3
+    games.get_game("g")
+    assert table.get_item.call_count == 2
+
+
+def test_consistent_read_bypasses_cache(cached_games):
+    games, table, _ = cached_games
+    games.get_game("g")
+    games.get_game("g", consistent=True)
+    assert table.get_item.call_args.kwargs["ConsistentRead"] is True
+    assert table.get_item.call_count == 2
+
+
+def test_update_invalidates_cache(cached_games):
+    games, table, _ = cached_games
+    games.get_game("g")
+    games.update_round("g")
+    games.get_game("g")
+    assert table.get_item.call_count == 2
@@ -0,0 +1,82 @@
+import sys
+
+sys.path.append(".")
+
+from shared.game_detectors import (
+    GameSnapshot, AutoIncrementDetector, NewLeaderDetector, NewLastPlayerDetector, EpicComebackDetector, EpicFailDetector
+)
+from shared.leaderboard import Leaderboard
+from unittest.mock import Mock
+import json
+import pytest
+
+
+@pytest.fixture()
+def monitor():
+    return Mock()
+
+
+def snapshot(scores, now, players=None, **game):
+    game = {"game_id": "g", "auto_mode": False, "round": 1, **game}
+    get_player = lambda game_id, pid: {"player_id": pid, "name": pid.upper()}
+    return GameSnapshot(game, Leaderboard(scores), players or dict(), now, get_player)
+
+
+def run(detector, monitor, ticks):
+    state = detector.initial_state()
+    for scores, now in ticks:
+        state = detector.check(monitor, snapshot(scores, now), state)
+        json.dumps(state)
+    return state
+
+
+def test_new_leader_logged_once_established(monitor):
+    detector = NewLeaderDetector()
+    run(detector, monitor, [({"a": 10, "b": 0}, 0), ({"a": 10, "b": 0}, 16), ({"a": 10, "b": 0}, 32)])
+    monitor.log.assert_called_once()
+    assert monitor.log.call_args.args[1] == "New Leader"
+    assert monitor.log.call_args.args[3] == "a"
+
+
+def test_new_leader_not_logged_when_overtaken(monitor):
+    detector = NewLeaderDetector()
+    run(detector, monitor, [({"a": 10, "b": 0}, 0), ({"a": 10, "b": 20}, 10), ({"a": 10, "b": 20}, 20)])
+    monitor.log.assert_not_called()
+
+
+def test_new_last_player(monitor):
+    detector = NewLastPlayerDetector()
+    run(detector, monitor, [({"a": 10, "b": 0}, 0), ({"a": 10, "b": 0}, 16)])
+    assert monitor.log.call_args.args[1:] == (
+        "New Last Player", "player B became the worst one and maintained that position for more than 15 seconds", "b")
+
+
+def test_epic_comeback(monitor):
+    scores = {pid: 10 * i for i, pid in enumerate("abcde")}
+    climbed = {**scores, "a": 100}
+    run(EpicComebackDetector(), monitor, [(scores, 0), (climbed, 2), (climbed, 4), (climbed, 8)])
+    monitor.log.assert_called_once()
+    assert monitor.log.call_args.args[1::2] == ("EpicComeback", "a")
+
+
+def test_epic_fail(monitor):
+    scores = {pid: 10 * i for i, pid in enumerate("abcde")}
+    fallen = {**scores, "e": -100}
+    run(EpicFailDetector(), monitor, [(scores, 0), (fallen, 2), (fallen, 8)])
+    monitor.log.assert_called_once()
+    assert monitor.log.call_args.args[1::2] == ("EpicFail", "e")
+
+
+def test_auto_increment_advances_round(monitor):
+    players = {
+        "a": {"player_id": "a", "streak": "0111111", "round_index": 7},
+        "b": {"player_id": "b", "streak": "0000000", "round_index": 7},
+    }
+    auto = snapshot({"a": 10, "b": 0}, 0, players, auto_mode=True)
+    AutoIncrementDetector().check(monitor, auto, dict())
+    monitor.advance_round.assert_called_once_with("g", ["a", "b"])
+
+    monitor.reset_mock()
+    manual = snapshot({"a": 10, "b": 0}, 0, players)
+    AutoIncrementDetector().check(monitor, manual, dict())
+    monitor.advance_round.assert_not_called()
@@ -0,0 +1,81 @@
+import sys
+
+sys.path.append(".")
+
+from shared.game_stats import EventColumns, generate_game_stats, as_item
+from decimal import Decimal
+import datetime as dt
+import numpy as np
+
+
+def events(player_id, responses, start=0, round=1):
+    base = dt.datetime(2023, 1, 1)
+    return [{
+        "player_event_id": player_id + f"{i:08x}",
+        "timestamp": (base + dt.timedelta(seconds=start + i)).strftime('%Y-%m-%dT%H:%M:%S'),
+        "difficulty": round,
+        "points_gained": 10 if response == "CORRECT" else -5,
+        "response_type": response,
+    } for i, response in enumerate(responses)]
+
+
+C, W, E = "CORRECT", "WRONG", "ERROR_RESPONSE"
+PLAYERS = ["aaaaaaaa", "bbbbbbbb"]
+
+
+def test_stats_of_game():
+    # aaaaaaaa: runs of 8 and 2 correct answers; bbbbbbbb: a single correct answer
+    game_events = events("aaaaaaaa", [C] * 8 + [W, C, C, E]) + events("bbbbbbbb", [W, C, W, W])
+    game_events.reverse()
+    stats = generate_game_stats(EventColumns.from_events(game_events, PLAYERS), ["Alice", "Bob"])
+
+    assert stats["num_players"] == 2
+    assert stats["total_requests"] == 16
+    assert stats["longest_streak"] == 8
+    assert stats["average_streak"] == 2.5
+    assert stats["average_success_rate"] == (10 / 12 + 1 / 4) / 2
+    assert stats["best_success_rate"] == {"team": "Alice", "value": 10 / 12}
+    assert stats["average_on_fire_duration"] == 7
+    assert stats["longest_on_fire_duration"] == {"achieved_by_team": "Alice", "duration": 7, "streak_len": 8}
+
+
+def test_stats_of_game_without_events():
+    stats = generate_game_stats(EventColumns.from_events([], PLAYERS), ["Alice", "Bob"])
+    assert stats["total_requests"] == 0
+    assert stats["longest_streak"] == 0
+    assert stats["longest_on_fire_duration"]["achieved_by_team"] is None
+
+
+def test_as_item_converts_floats():
+    assert as_item({"a": 0.5, "b": {"c": 1 / 3}, "d": 2}) == {"a": Decimal("0.5"), "b": {"c": Decimal("0.3333")}, "d": 2}
+
+
+def test_answers_of_the_same_second_are_ordered_by_request_index():
+    # 8 correct answers in a row, all within one second, listed out of order
+    game_events = events("aaaaaaaa", [C] * 4 + [W] + [C] * 4)
+    for i, event in enumerate(game_events):
+        event["timestamp"], event["request_index"] = game_events[0]["timestamp"], i + 1
+    game_events.insert(0, game_events.pop(4))
+    stats = generate_game_stats(EventColumns.from_events(game_events, PLAYERS), ["Alice", "Bob"])
+
+    assert stats["longest_streak"] == 4
+    assert stats["average_streak"] == 2
+
+
+def test_players_whose_id_starts_with_another_are_kept_apart():
+    game_events = events("abc", [C, C, W]) + events("abcd", [W])
+    stats = generate_game_stats(EventColumns.from_events(game_events, ["abc", "abcd"]), ["Alice", "Bob"])
+    assert stats["best_success_rate"] == {"team": "Alice", "value": 2 / 3}
+    assert stats["longest_streak"] == 2
+
+
+def test_only_answers_after_the_warmup_are_counted():
+    warmup = events("aaaaaaaa", [C] * 8, round=0)
+    warmup_ended = events("aaaaaaaa", [""], start=8)
+    warmup_ended[0]["query"], warmup_ended[0]["points_gained"] = "WARMUP_ENDED", 0
+    game_events = warmup + warmup_ended + events("aaaaaaaa", [C, C, W], start=9)
+    stats = generate_game_stats(EventColumns.from_events(game_events, PLAYERS), ["Alice", "Bob"])
+
+    assert stats["total_requests"] == 3
+    assert stats["longest_streak"] == 2
+    assert stats["best_success_rate"] == {"team": "Alice", "value": 2 / 3}
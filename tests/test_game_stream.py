@@ -0,0 +1,177 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws, memory_backend
+from shared.games_manager import GamesManager
+from flaskr.game_stream import GameStream, GameStreams
+from dynamodb.games import Games
+from queue import Empty, Queue
+import itertools
+import threading
+import time
+import pytest
+
+
+@pytest.fixture()
+def game(monkeypatch):
+    now = [1_700_000_000]
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+    games_manager = GamesManager(clock=lambda: now[0])
+    game_id = games_manager.new_game("secret")['game_id']
+    yield games_manager, game_id, now
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+
+
+def messages(queue):
+    received = []
+    while True:
+        try:
+            received.append(queue.get_nowait())
+        except Empty:
+            return received
+
+
+def test_changes_are_published_once(game):
+    games_manager, game_id, now = game
+    stream = GameStream(games_manager, game_id)
+    stream.poll()
+    queue = Queue()
+    stream.subscribers.add(queue)
+
+    player = games_manager.add_player_to_game(game_id, "team", "http://team")
+    games_manager.advance_game_round(game_id)
+    now[0] += 1
+    games_manager.player_events.add_event(game_id, player['player_id'], 10, "q", 1, 10, "CORRECT")
+    stream.poll()
+
+    received = dict(messages(queue))
+    assert received["round"] == {"round": 1}
+    assert received["game"]["players"] == [player['player_id']]
+    assert [p['player_id'] for p in received["leaderboard"]["updated"]] == [player['player_id']]
+    # the end of the warmup is an event of every player too
+    assert [e['query'] for e in received["player_events"]] == ["WARMUP_ENDED", "q"]
+
+    # nothing is published when nothing changed
+    stream.poll()
+    assert messages(queue) == []
+
+
+def test_late_events_behind_the_cursor_are_published(game):
+    games_manager, game_id, now = game
+    player = games_manager.add_player_to_game(game_id, "team", "http://team")
+    games_manager.player_events.add_event(game_id, player['player_id'], 10, "q1", 1, 10, "CORRECT")
+    stream = GameStream(games_manager, game_id)
+    stream.poll()
+    queue = Queue()
+    stream.subscribers.add(queue)
+
+    now[0] += 5
+    games_manager.player_events.add_event(game_id, player['player_id'], 20, "q3", 1, 10, "CORRECT")
+    stream.poll()
+    # written by a buffered sink after the newer one, with an earlier timestamp
+    now[0] -= 3
+    games_manager.player_events.add_event(game_id, player['player_id'], 15, "q2", 1, 5, "CORRECT")
+    stream.poll()
+    stream.poll()
+
+    published = [event['query'] for name, events in messages(queue) if name == "player_events" for event in events]
+    assert published == ["q3", "q2"]
+
+
+def test_unchanged_scores_are_not_published_again(game):
+    games_manager, game_id, now = game
+    # the chart only rebuilds the buckets that haven't settled in real time
+    now[0] = int(time.time())
+    player = games_manager.add_player_to_game(game_id, "team", "http://team")
+    games_manager.player_events.add_event(game_id, player['player_id'], 10, "q", 1, 10, "CORRECT")
+    stream = GameStream(games_manager, game_id)
+    stream.poll()
+    queue = Queue()
+    stream.subscribers.add(queue)
+
+    stream.poll()
+    assert [name for name, _ in messages(queue)] == []
+    now[0] += 1
+    games_manager.player_events.add_event(game_id, player['player_id'], 20, "q", 1, 10, "CORRECT")
+    stream.poll()
+    scores = [data for name, data in messages(queue) if name == "scores"]
+    assert [[bucket[player['player_id']] for bucket in buckets] for buckets in scores] == [[20]]
+
+
+def test_new_viewer_is_sent_the_last_state(game):
+    games_manager, game_id, _ = game
+    stream = GameStream(games_manager, game_id, interval=60)
+    stream.poll()
+    queue = stream.subscribe()
+    try:
+        assert queue.get(timeout=1)[0] == "game"
+        assert queue.get(timeout=1) == ("leaderboard", {"updated": [], "removed": []})
+    finally:
+        stream.unsubscribe(queue)
+
+
+def test_game_fields_are_attributes_of_the_game(game):
+    games_manager, game_id, _ = game
+    stream = GameStream(games_manager, game_id)
+    stream.poll()
+    assert set(stream.game) == {'round', 'running', 'ended', 'auto_mode', 'players', 'players_to_assist', 'max_round'}
+
+
+def test_poll_thread_stops_with_the_last_viewer(game):
+    games_manager, game_id, _ = game
+    stream = GameStream(games_manager, game_id, interval=0.01)
+    first, second = stream.subscribe(), stream.subscribe()
+    thread = stream.thread
+    stream.unsubscribe(first)
+    assert thread.is_alive()
+
+    stream.unsubscribe(second)
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert stream.thread is None
+
+
+def test_resubscribing_never_polls_from_two_threads(game, monkeypatch):
+    games_manager, game_id, _ = game
+    stream = GameStream(games_manager, game_id, interval=0)
+    polling = []
+    overlapped = threading.Event()
+
+    def poll():
+        polling.append(threading.current_thread())
+        if len(polling) > 1:
+            overlapped.set()
+        time.sleep(0.01)
+        polling.remove(threading.current_thread())
+
+    monkeypatch.setattr(stream, "poll", poll)
+    threads = []
+    for _ in range(20):
+        queue = stream.subscribe()
+        threads.append(stream.thread)
+        time.sleep(0.005)
+        stream.unsubscribe(queue)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert not overlapped.is_set()
+
+
+def test_events_end_with_the_game(game):
+    games_manager, game_id, _ = game
+    streams = GameStreams(games_manager, interval=0.01)
+    events = streams.events(game_id, keepalive=1)
+
+    assert next(events).startswith("event: round\n")
+    games_manager.end_game(game_id)
+    # keepalives at most, until the producer sees the game ended
+    for message in itertools.islice(events, 20):
+        pass
+    assert message.startswith("event: game\n") and '"ended": true' in message
+    # the viewer unsubscribed, so the poll thread stopped
+    assert streams.stream(game_id).thread is None
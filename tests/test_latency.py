@@ -0,0 +1,91 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws, memory_backend
+from shared.latency import Histogram, LatencyRecorder, bucket_of, bucket_range
+from shared.games_manager import GamesManager
+from dynamodb.latency_metrics import LatencyMetrics
+from dynamodb.games import Games
+from unittest.mock import Mock
+import pytest
+
+
+@pytest.fixture()
+def dynamodb(monkeypatch):
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+    yield aws.dynamodb()
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+
+
+def test_buckets_are_contiguous_with_bounded_error():
+    for value in list(range(5000)) + [10 ** 6, 10 ** 7 + 3]:
+        low, width = bucket_range(bucket_of(value))
+        assert low <= value < low + width
+        assert width == 1 or width / low <= 1 / 16
+    assert [bucket_of(value) for value in (15, 16, 31, 32, 34)] == [15, 16, 31, 32, 33]
+
+
+def test_percentiles_merge_and_round_trip():
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+    assert len(histogram) == 100
+    assert abs(histogram.percentile(50) - 50_000) <= 50_000 / 16
+    assert abs(histogram.percentile(99) - 99_000) <= 99_000 / 16
+    assert histogram.percentile(100) <= histogram.max == 100_000
+
+    merged = Histogram.from_item(histogram.to_item()).merge(histogram)
+    assert len(merged) == 200 and merged.total == 2 * histogram.total
+    assert merged.summary()["p50_ms"] == histogram.summary()["p50_ms"]
+
+
+def test_recorder_flushes_changed_games_when_due():
+    now = [0]
+    table = Mock()
+    recorder = LatencyRecorder(table, flush_interval=10, clock=lambda: now[0])
+    recorder.record("g", "ask_player", 0.2, "p1")
+    recorder.record("g", "get_game", 0.001)
+    table.put_metrics.assert_not_called()
+
+    now[0] = 10
+    recorder.record("g", "ask_player", 0.4, "p1")
+    game_id, source, spans, players, _ = table.put_metrics.call_args.args
+    assert (game_id, source) == ("g", recorder.source)
+    assert set(spans) == {"ask_player", "get_game"}
+    # only the spans that depend on the team are kept per player
+    assert set(players["p1"]) == {"ask_player"}
+
+    recorder.flush_if_due()
+    assert table.put_metrics.call_count == 1
+
+    # players that weren't asked since the last flush aren't written again
+    now[0] = 20
+    recorder.record("g", "ask_player", 0.1, "p2")
+    _, _, _, players, _ = table.put_metrics.call_args.args
+    assert set(players) == {"p2"}
+
+
+def test_metrics_of_every_source_are_merged(dynamodb):
+    games_manager = GamesManager()
+    game = games_manager.new_game("secret")
+    player = games_manager.add_player_to_game(game['game_id'], "slow", "http://api")
+
+    for seconds in (0.1, 0.3):
+        recorder = LatencyRecorder(LatencyMetrics(dynamodb))
+        recorder.record(game['game_id'], "ask_player", seconds, player['player_id'])
+        recorder.flush()
+
+    # one item per source for the game, and one per source and player
+    items = LatencyMetrics(dynamodb).query_metrics(game['game_id'])
+    assert sorted(item.get('player_id', '') for item in items) == ['', '', player['player_id'], player['player_id']]
+
+    metrics = games_manager.get_latency_metrics(game['game_id'])
+    assert metrics["spans"]["ask_player"]["count"] == 2
+    assert metrics["players"][0]["name"] == "slow"
+    assert 290 <= metrics["players"][0]["ask_player"]["max_ms"] <= 300
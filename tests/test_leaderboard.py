@@ -0,0 +1,45 @@
+import sys
+
+sys.path.append(".")
+
+from shared.leaderboard import Leaderboard
+import pytest
+
+
+@pytest.fixture()
+def basic_leaderboard():
+    return Leaderboard({"a": 10, "b": 30, "c": 20, "d": 0, "e": -5})
+
+
+def test_ranks_by_descending_score(basic_leaderboard):
+    assert basic_leaderboard.player_ids() == ["b", "c", "a", "d", "e"]
+    assert basic_leaderboard.rank("b") == 1
+    assert basic_leaderboard.rank("e") == 5
+    assert basic_leaderboard.leader() == "b"
+    assert basic_leaderboard.last() == "e"
+
+
+def test_update_moves_player(basic_leaderboard):
+    basic_leaderboard.update("e", 100)
+    assert basic_leaderboard.rank("e") == 1
+    assert basic_leaderboard.increment("b", -31) == -1
+    assert basic_leaderboard.last() == "b"
+
+
+def test_unknown_player_has_no_rank(basic_leaderboard):
+    basic_leaderboard.remove("a")
+    with pytest.raises(ValueError):
+        basic_leaderboard.rank("a")
+    assert len(basic_leaderboard) == 4
+
+
+def test_percentiles(basic_leaderboard):
+    assert basic_leaderboard.top_percentile_players(20) == ["b"]
+    assert basic_leaderboard.bottom_percentile_players(20) == ["e"]
+    assert basic_leaderboard.bottom_percentile_players(40) == ["d", "e"]
+
+
+def test_snapshot_round_trip(basic_leaderboard):
+    snapshot = basic_leaderboard.snapshot()
+    assert snapshot[0] == {"player_id": "b", "score": 30}
+    assert Leaderboard.from_snapshot(snapshot).player_ids() == basic_leaderboard.player_ids()
@@ -0,0 +1,116 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws, memory_backend
+from shared.metrics import Registry, instrument_dynamodb, instrument_methods
+from dynamodb.games import Games
+from botocore.exceptions import ClientError
+import pytest
+
+
+@pytest.fixture()
+def dynamodb(monkeypatch):
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+    yield aws.dynamodb()
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.counter("http_requests_total", "HTTP requests", ["route"])
+    duration = registry.histogram("duration_seconds", "Durations", ["route"], buckets=[0.1, 1])
+    requests.inc(route='/api/"quoted"')
+    requests.inc(2, route='/api/"quoted"')
+    for seconds in (0.05, 0.5, 5):
+        duration.observe(seconds, route="/api")
+
+    lines = registry.exposition().splitlines()
+    assert "# TYPE http_requests_total counter" in lines
+    assert 'http_requests_total{route="/api/\\"quoted\\""} 3' in lines
+    # buckets are cumulative and end with +Inf
+    assert [line.rsplit(" ", 1)[1] for line in lines if line.startswith("duration_seconds_bucket")] == ["1", "2", "3"]
+    assert 'duration_seconds_bucket{route="/api",le="+Inf"} 3' in lines
+    assert 'duration_seconds_count{route="/api"} 3' in lines
+
+    with pytest.raises(ValueError):
+        requests.inc(method="GET")
+    with pytest.raises(ValueError):
+        registry.gauge("http_requests_total", "Not a counter")
+
+
+def test_dynamodb_calls_errors_and_capacity_per_table(dynamodb):
+    registry = Registry()
+    metrics = instrument_dynamodb(dynamodb.meta.client, registry)
+    games = dynamodb.Table("games")
+
+    games.put_item(Item={"game_id": "g1", "round": 0})
+    response = games.get_item(Key={"game_id": "g1"})
+    assert "ConsumedCapacity" in response
+    with pytest.raises(ClientError):
+        games.put_item(Item={"game_id": "g1"}, ConditionExpression="attribute_not_exists(game_id)")
+    dynamodb.batch_write_item(RequestItems={"games": [{"PutRequest": {"Item": {"game_id": "g2"}}}]})
+
+    assert metrics.calls.value(table="games", operation="PutItem") == 2
+    assert metrics.errors.value(table="games", operation="PutItem", code="ConditionalCheckFailedException") == 1
+    assert metrics.capacity.value(table="games", operation="GetItem") == 0.5
+    assert metrics.capacity.value(table="games", operation="BatchWriteItem") == 1
+    assert metrics.duration.value(table="games", operation="GetItem")[0] == 1
+
+
+def test_methods_are_counted_and_timed():
+    class Manager:
+        def get(self, game_id):
+            return game_id
+
+        def fail(self):
+            raise KeyError()
+
+    registry = Registry()
+    manager = instrument_methods(Manager(), registry, "manager")
+    assert manager.get("g1") == "g1"
+    with pytest.raises(KeyError):
+        manager.fail()
+
+    assert registry.get("manager_call_duration_seconds").value(method="get")[0] == 1
+    assert registry.get("manager_call_errors_total").value(method="fail") == 1
+
+
+def test_metrics_endpoint(dynamodb):
+    from flaskr import create_app
+
+    client = create_app().test_client()
+    game_id = client.post("/api", json={"password": "secret"}).get_json()["game_id"]
+    client.get(f"/api/{game_id}")
+    client.get(f"/api/{game_id}")
+
+    response = client.get("/metrics")
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    lines = response.get_data(as_text=True).splitlines()
+    # routes are labelled by their rule, not by the game id
+    assert 'http_requests_total{route="/api/<game_id>",method="GET",status="200"} 2' in lines
+    assert 'games_manager_call_duration_seconds_count{method="new_game"} 1' in lines
+    assert any(line.startswith('dynamodb_consumed_capacity_units_total{table="games",operation="PutItem"}')
+               for line in lines)
+    assert 'sqs_queue_messages{queue="game_monitor_tasks",state="visible"} 1' in lines
+    assert "# TYPE game_cache_lookups_total counter" in lines
+
+
+def test_app_metrics_only_see_the_app_calls(dynamodb):
+    from flaskr import create_app
+
+    apps = [create_app(), create_app()]
+    game_id = apps[0].test_client().post("/api", json={"password": "secret"}).get_json()["game_id"]
+
+    # a QuizMaster or GameMonitor of the same process uses the process-wide client
+    response = dynamodb.Table("games").get_item(Key={"game_id": game_id})
+    assert "ConsumedCapacity" not in response
+    calls = [app.config["METRICS"].get("dynamodb_calls_total") for app in apps]
+    assert calls[0].value(table="games", operation="PutItem") == 1
+    assert calls[0].value(table="games", operation="GetItem") == 0
+    assert calls[1].value(table="games", operation="PutItem") == 0
@@ -0,0 +1,85 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws, memory_backend
+from dynamodb.games import Games
+from dynamodb.pagination import paginate, page, parse_page, encode_cursor, decode_cursor
+from decimal import Decimal
+from unittest.mock import Mock
+import base64
+import pytest
+
+
+def paged_operation(*pages):
+    responses = [{"Items": items, "LastEvaluatedKey": {"id": items[-1]}} for items in pages[:-1]]
+    responses.append({"Items": pages[-1]})
+    return Mock(side_effect=responses)
+
+
+def test_paginate_follows_last_evaluated_key():
+    operation = paged_operation(["a", "b"], ["c"], [])
+    assert list(paginate(operation, TableName="t")) == ["a", "b", "c"]
+    assert operation.call_args_list[1].kwargs["ExclusiveStartKey"] == {"id": "b"}
+
+
+def test_paginate_is_lazy():
+    operation = paged_operation(["a"], ["b"])
+    items = paginate(operation)
+    assert next(items) == "a"
+    assert operation.call_count == 1
+
+
+def test_page_returns_cursor_of_next_page():
+    operation = paged_operation(["a", "b"], ["c"])
+    items, cursor = page(operation, 2)
+    assert items == ["a", "b"]
+    assert operation.call_args.kwargs["Limit"] == 2
+
+    items, cursor = page(operation, 2, cursor)
+    assert items == ["c"]
+    assert cursor is None
+    assert operation.call_args.kwargs["ExclusiveStartKey"] == {"id": "b"}
+
+
+def test_cursor_keeps_number_types():
+    key = {"game_id": "abc", "score": Decimal("-30")}
+    assert decode_cursor(encode_cursor(key)) == key
+
+
+def test_page_parameters_are_validated():
+    cursor = encode_cursor({"game_id": "abc"})
+    assert parse_page("10", cursor) == (10, cursor)
+    assert parse_page(None, "") == (None, None)
+    for limit in ("ten", "0", "-5", "1.5"):
+        with pytest.raises(ValueError):
+            parse_page(limit, None)
+    for cursor in ("not base64!", base64.urlsafe_b64encode(b"[1]").decode(), base64.urlsafe_b64encode(b'{"k": {}}').decode()):
+        with pytest.raises(ValueError):
+            parse_page(None, cursor)
+    with pytest.raises(ValueError):
+        parse_page(None, encode_cursor({"game_id": "abc"}))
+
+
+@pytest.mark.parametrize("query", ["limit=ten", "limit=0", "limit=-1", "cursor=garbage",
+                                   "cursor=" + encode_cursor({"game_id": "abc"})])
+def test_invalid_page_is_a_bad_request(monkeypatch, query):
+    from flaskr import create_app
+
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+    try:
+        client = create_app().test_client()
+        game_id = client.post("/api", json={"password": "secret"}).get_json()["game_id"]
+        for route in ("scores", "review/finalgraph", "review/analysis"):
+            assert client.get(f"/api/{game_id}/{route}?{query}").status_code == 400
+        assert client.get(f"/api/{game_id}/scores?limit=1").status_code == 200
+        # the scores chart's since parameter is checked with the page parameters
+        assert client.get(f"/api/{game_id}/scores?since=yesterday").status_code == 400
+        assert client.get(f"/api/{game_id}/scores?since=2023-01-01T12:00:05").status_code == 200
+    finally:
+        aws.reset()
+        memory_backend.reset()
+        Games.cache.clear()
@@ -0,0 +1,58 @@
+import sys
+
+sys.path.append(".")
+
+from shared.question_bank import QuestionBank
+from shared.questions import GeneralKnowledgeQuestion, AnagramQuestion
+from unittest.mock import patch
+import os
+import pytest
+
+
+@pytest.fixture()
+def bank_dir(tmp_path):
+    (tmp_path / "cards.yaml").write_text("---\n- question: q1\n  answer: a1\n- question: q2\n  answer: 2\n")
+    return tmp_path
+
+
+def test_bank_samples_cards(bank_dir):
+    bank = QuestionBank("cards", ["question", "answer"], yaml_dir=bank_dir, cache_dir=bank_dir)
+    assert len(bank) == 2
+    assert bank.sample() in [("q1", "a1"), ("q2", 2)]
+
+
+def test_bank_is_loaded_from_cache(bank_dir):
+    QuestionBank("cards", ["question", "answer"], yaml_dir=bank_dir, cache_dir=bank_dir)
+    with patch("yaml.safe_load") as safe_load:
+        bank = QuestionBank("cards", ["question", "answer"], yaml_dir=bank_dir, cache_dir=bank_dir)
+    safe_load.assert_not_called()
+    assert len(bank) == 2
+
+
+def test_cache_is_rebuilt_when_bank_changes(bank_dir):
+    QuestionBank("cards", ["question", "answer"], yaml_dir=bank_dir, cache_dir=bank_dir)
+    (bank_dir / "cards.yaml").write_text("---\n- question: q3\n  answer: a3\n")
+    os.utime(bank_dir / "cards.yaml", ns=(0, 10 ** 18))
+    bank = QuestionBank("cards", ["question", "answer"], yaml_dir=bank_dir, cache_dir=bank_dir)
+    assert bank.sample() == ("q3", "a3")
+
+
+def test_questions_from_shipped_banks():
+    general_knowledge = GeneralKnowledgeQuestion()
+    assert general_knowledge.as_text() == general_knowledge.question
+    assert general_knowledge.correct_answer() is not None
+
+    anagram = AnagramQuestion("listen", "silent", ["enlists", "google"])
+    assert anagram.as_text().startswith("Which of the following is an anagram of listen: ")
+    assert sorted(anagram.choices) == ["enlists", "google", "silent"]
+    assert anagram.expected_answer() == "silent"
+    assert AnagramQuestion().correct_answer() is not None
+
+
+def test_cache_is_plain_data(bank_dir):
+    QuestionBank("cards", ["question", "answer"], yaml_dir=bank_dir, cache_dir=bank_dir)
+    assert not list(bank_dir.glob("*.pickle"))
+    # an unreadable or foreign cache file is ignored and replaced
+    (bank_dir / "question_bank_cards.json").write_bytes(b"\x80\x04K\x01.")
+    bank = QuestionBank("cards", ["question", "answer"], yaml_dir=bank_dir, cache_dir=bank_dir)
+    assert len(bank) == 2
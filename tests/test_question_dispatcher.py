@@ -0,0 +1,98 @@
+import sys
+
+sys.path.append(".")
+
+from shared.question_dispatcher import QuestionDispatcher, grade_answer
+from shared import questions
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+import threading
+import time
+import pytest
+
+
+class TeamServer(ThreadingHTTPServer):
+    """ Answers every question with `answer` after `delay` seconds, counting the requests in flight """
+
+    def __init__(self, answer="42", status=200, delay=0):
+        super().__init__(("127.0.0.1", 0), TeamHandler)
+        self.answer, self.status, self.delay = answer, status, delay
+        self.lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+
+    @property
+    def api(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+
+class TeamHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        body = server.answer.encode()
+        self.send_response(server.status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def team_server(request):
+    server = TeamServer(**getattr(request, "param", {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def question(expected="42"):
+    return Mock(as_text=Mock(return_value="What is 6 times 7?"), expected_answer=Mock(return_value=expected))
+
+
+def test_grading(monkeypatch):
+    assert grade_answer("42", question()) == "CORRECT"
+    assert grade_answer("paris", question("Paris")) == "CORRECT"
+    assert grade_answer("41", question()) == "WRONG"
+    assert grade_answer("cheat", question()) == "CORRECT"
+    monkeypatch.setattr(questions, "ALLOW_CHEATING", False)
+    assert grade_answer("cheat", question()) == "WRONG"
+
+
+@pytest.mark.parametrize("team_server, response_type", [
+    ({"answer": " 42\n"}, "CORRECT"),
+    ({"answer": "41"}, "WRONG"),
+    ({"status": 500}, "ERROR_RESPONSE"),
+], indirect=["team_server"])
+def test_answers_are_graded(team_server, response_type):
+    assert QuestionDispatcher().ask(team_server.api, question()) == response_type
+
+
+@pytest.mark.parametrize("team_server", [{"delay": 1}], indirect=True)
+def test_slow_server_times_out(team_server):
+    dispatcher = QuestionDispatcher(timeout=0.2)
+    latencies = []
+    started = time.perf_counter()
+    assert dispatcher.ask_all([(team_server.api, question())], latencies) == ["NO_SERVER_RESPONSE"]
+    assert time.perf_counter() - started < 0.9
+    assert 0.2 <= latencies[0] < 0.9
+
+
+def test_unreachable_server():
+    assert QuestionDispatcher(timeout=0.2).ask("http://127.0.0.1:9/", question()) == "NO_SERVER_RESPONSE"
+
+
+@pytest.mark.parametrize("team_server", [{"delay": 0.1}], indirect=True)
+def test_concurrent_requests_are_capped(team_server):
+    dispatcher = QuestionDispatcher(max_concurrency=2)
+    response_types = dispatcher.ask_all([(team_server.api, question())] * 6)
+    assert response_types == ["CORRECT"] * 6
+    assert team_server.max_in_flight == 2
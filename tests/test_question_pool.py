@@ -0,0 +1,36 @@
+import sys
+
+sys.path.append(".")
+
+from shared.question_factory import QuestionFactory, QuestionPool
+from shared.questions import Question, AdditionQuestion
+import time
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_pool_is_refilled_in_background():
+    pool = QuestionPool(size=8, refill_threshold=4)
+    question = pool.next_question(1)
+    assert isinstance(question, Question)
+    assert wait_until(lambda: len(pool.rings[1]) == 8)
+
+
+def test_pool_serves_questions_of_round():
+    pool = QuestionPool(size=8, refill_threshold=4)
+    factory = QuestionFactory(pool=pool)
+    types = set(type(factory.next_question(2)) for _ in range(50))
+    window_start, window_end = factory.adjust_window(2)
+    assert types <= set(factory.question_types[window_start:window_end])
+
+
+def test_questions_have_no_dict_and_increasing_ids():
+    first, second = AdditionQuestion(1, 2), AdditionQuestion(3, 4)
+    assert not hasattr(first, "__dict__")
+    assert second.id > first.id
+    assert first.expected_answer() == "3"
@@ -0,0 +1,52 @@
+import sys
+
+sys.path.append(".")
+
+from shared.question_scheduler import QuestionScheduler
+from unittest.mock import Mock
+import pytest
+
+
+@pytest.fixture()
+def basic_scheduler():
+    quiz_master = Mock()
+    quiz_master.administer_questions.side_effect = lambda game_id, tasks, reschedule: [
+        (modification_hash + "'", delay) for _, modification_hash, delay in tasks
+    ]
+    return QuestionScheduler("game", quiz_master, clock=lambda: 0), quiz_master
+
+
+def test_tick_administers_only_due_questions(basic_scheduler):
+    scheduler, quiz_master = basic_scheduler
+    scheduler.schedule("p1", "h1", 1)
+    scheduler.schedule("p2", "h2", 5)
+
+    assert scheduler.tick(now=2) == 1
+    quiz_master.administer_questions.assert_called_once_with("game", [("p1", "h1", 1)], reschedule=False)
+
+
+def test_tick_reschedules_with_rotated_hash(basic_scheduler):
+    scheduler, quiz_master = basic_scheduler
+    scheduler.schedule("p1", "h1", 1)
+
+    scheduler.tick(now=1)
+    assert scheduler.due_tasks(now=100) == [("p1", "h1'", 1)]
+
+
+def test_stale_task_is_dropped(basic_scheduler):
+    scheduler, quiz_master = basic_scheduler
+    quiz_master.administer_questions.side_effect = lambda game_id, tasks, reschedule: [None] * len(tasks)
+    scheduler.schedule("p1", "h1", 1)
+
+    scheduler.tick(now=1)
+    assert len(scheduler) == 0
+    assert scheduler.next_due() is None
+
+
+def test_newer_task_supersedes_pending_one(basic_scheduler):
+    scheduler, _ = basic_scheduler
+    scheduler.schedule("p1", "old", 1)
+    scheduler.schedule("p1", "new", 3)
+
+    assert scheduler.next_due() == 3
+    assert scheduler.due_tasks(now=10) == [("p1", "new", 3)]
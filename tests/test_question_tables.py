@@ -0,0 +1,53 @@
+import sys
+
+sys.path.append(".")
+
+from shared.questions import (
+    is_prime, is_square_cube, power, FibonacciQuestion, ScrabbleQuestion, PRIME_TABLE_LIMIT, SIXTH_POWER_TABLE_LIMIT,
+    FIBONACCI_TABLE_SIZE,
+)
+import math
+import pytest
+
+
+def trial_division(n):
+    return n > 1 and all(n % j for j in range(2, math.isqrt(n) + 1))
+
+
+def test_prime_sieve_matches_trial_division():
+    assert [n for n in range(1000) if is_prime(n)] == [n for n in range(1000) if trial_division(n)]
+
+
+@pytest.mark.parametrize("n", [PRIME_TABLE_LIMIT + 3, PRIME_TABLE_LIMIT + 4, 1_000_003])
+def test_prime_beyond_table(n):
+    assert is_prime(n) == trial_division(n)
+
+
+def test_square_cube_is_sixth_power():
+    assert [n for n in range(5000) if is_square_cube(n)] == [0, 1, 64, 729, 4096]
+    assert is_square_cube(SIXTH_POWER_TABLE_LIMIT)
+    assert is_square_cube(1001 ** 6)
+    assert not is_square_cube(1001 ** 6 + 1)
+    assert not is_square_cube(1001 ** 2)
+
+
+def iterative_fib(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+
+
+def test_fibonacci_beyond_table():
+    assert FibonacciQuestion.fib(11) == 89
+    for n in (FIBONACCI_TABLE_SIZE - 1, FIBONACCI_TABLE_SIZE, FIBONACCI_TABLE_SIZE + 1, 1500):
+        assert FibonacciQuestion.fib(n) == iterative_fib(n)
+
+
+def test_scrabble_scores():
+    assert ScrabbleQuestion.score("buzzword") == 3 + 1 + 10 + 10 + 4 + 1 + 1 + 2
+    assert ScrabbleQuestion("Helix").correct_answer() == 4 + 1 + 1 + 1 + 8
+
+
+def test_power():
+    assert power(99, 99) == 99 ** 99
@@ -0,0 +1,71 @@
+import sys
+
+sys.path.append(".")
+
+from shared import round_transition
+from shared.round_transition import advance_players
+from dynamodb import event_sink
+from botocore.exceptions import ClientError
+from unittest.mock import MagicMock, Mock
+import pytest
+
+
+@pytest.fixture()
+def dynamodb(monkeypatch):
+    dynamodb = MagicMock()
+    dynamodb.batch_write_item.return_value = {}
+    monkeypatch.setattr(round_transition.aws, "dynamodb", lambda: dynamodb)
+    return dynamodb
+
+
+@pytest.fixture()
+def send_messages(monkeypatch):
+    send_messages = Mock(return_value=[])
+    monkeypatch.setattr(round_transition.aws, "send_messages", send_messages)
+    return send_messages
+
+
+def test_round_change_only_resets_round_index(dynamodb, send_messages):
+    players, player_events = Mock(), Mock()
+    advance_players(players, player_events, "g", 3, ["a", "b"])
+    assert sorted(call.args[1] for call in players.update_player_attribute.call_args_list) == ["a", "b"]
+    assert all(call.kwargs == {"round_index": 0} for call in players.update_player_attribute.call_args_list)
+    players.get_player.assert_not_called()
+    dynamodb.batch_write_item.assert_not_called()
+    send_messages.assert_not_called()
+
+
+def test_warmup_end_is_written_and_queued_in_batches(dynamodb, send_messages):
+    players, player_events = Mock(), Mock()
+    player_events.new_event.side_effect = lambda game_id, player_id, *args: {"player_id": player_id}
+    player_ids = ["p%d" % i for i in range(30)]
+    advance_players(players, player_events, "g", 1, player_ids)
+
+    hashes = {call.args[1]: call.kwargs["modification_hash"] for call in players.update_player_attribute.call_args_list}
+    assert sorted(hashes) == sorted(player_ids)
+    assert all(call.kwargs["score"] == 0 for call in players.update_player_attribute.call_args_list)
+
+    # 30 events in BatchWriteItem groups of 25
+    assert dynamodb.batch_write_item.call_count == 2
+    queue_name, tasks = send_messages.call_args.args
+    assert queue_name == "administer_question_tasks"
+    assert {task["player_id"]: task["modification_hash"] for task in tasks} == hashes
+
+
+@pytest.mark.parametrize("response", [
+    ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": ""}}, "BatchWriteItem"),
+    {"UnprocessedItems": {"player_events": [{"PutRequest": {"Item": {}}}]}},
+])
+def test_first_questions_are_queued_when_events_fail(dynamodb, send_messages, monkeypatch, capsys, response):
+    monkeypatch.setattr(event_sink, "RETRY_BASE_DELAY", 0)
+    if isinstance(response, Exception):
+        dynamodb.batch_write_item.side_effect = response
+    else:
+        dynamodb.batch_write_item.return_value = response
+    players, player_events = Mock(), Mock()
+    player_events.new_event.side_effect = lambda game_id, player_id, *args: {"player_id": player_id}
+    advance_players(players, player_events, "g", 1, ["a", "b"])
+
+    _, tasks = send_messages.call_args.args
+    assert sorted(task["player_id"] for task in tasks) == ["a", "b"]
+    assert "WARMUP_ENDED events of game g" in capsys.readouterr().out
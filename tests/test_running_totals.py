@@ -0,0 +1,83 @@
+import sys
+
+sys.path.append(".")
+
+from shared.running_totals import RunningTotals, parse_timestamp, format_timestamp, validate_timestamp
+import pytest
+
+START = parse_timestamp("2023-01-01T12:00:00")
+
+
+def event(seconds, player_id, score):
+    return {"timestamp": format_timestamp(START + seconds), "player_event_id": player_id * 8 + "00000000", "score": score}
+
+
+class EventLog:
+    def __init__(self):
+        self.events = []
+        self.queried = []
+
+    def since(self, since):
+        self.queried.append(since)
+        return [e for e in self.events if since is None or e["timestamp"] >= since]
+
+
+@pytest.fixture()
+def clock():
+    return [START]
+
+
+@pytest.fixture()
+def totals(clock):
+    return RunningTotals(bucket_width=5, settle_time=10, clock=lambda: clock[0])
+
+
+def test_buckets_hold_last_score_of_every_player(totals):
+    totals.update([event(0, "a", 1), event(1, "b", 2), event(3, "a", 3), event(7, "b", 4)])
+    assert totals.buckets() == [
+        {"time": "2023-01-01T12:00:00", "aaaaaaaa": 3, "bbbbbbbb": 2},
+        {"time": "2023-01-01T12:00:05", "aaaaaaaa": 3, "bbbbbbbb": 4},
+    ]
+
+
+def test_update_only_reads_unsettled_events(totals, clock):
+    log = EventLog()
+    log.events = [event(0, "a", 1), event(6, "a", 2)]
+    clock[0] = START + 30
+    totals.update(log.since(totals.since()))
+
+    log.events.append(event(31, "b", 5))
+    clock[0] = START + 32
+    totals.update(log.since(totals.since()))
+
+    assert log.queried[-1] == "2023-01-01T12:00:20"
+    assert totals.buckets()[-1] == {"time": "2023-01-01T12:00:30", "aaaaaaaa": 2, "bbbbbbbb": 5}
+    assert len(totals.buckets()) == 3
+
+
+def test_open_buckets_are_rebuilt(totals, clock):
+    log = EventLog()
+    log.events = [event(0, "a", 1)]
+    totals.update(log.since(totals.since()))
+    log.events.append(event(1, "b", 2))
+    totals.update(log.since(totals.since()))
+    assert totals.buckets() == [{"time": "2023-01-01T12:00:00", "aaaaaaaa": 1, "bbbbbbbb": 2}]
+
+
+def test_players_are_told_apart_by_their_full_id(totals):
+    totals.update([{"timestamp": format_timestamp(START), "player_event_id": "abc" + "00000000", "score": 1},
+                   {"timestamp": format_timestamp(START), "player_event_id": "abcd" + "00000000", "score": 2}])
+    assert totals.buckets() == [{"time": "2023-01-01T12:00:00", "abc": 1, "abcd": 2}]
+
+
+def test_buckets_since(totals):
+    totals.update([event(0, "a", 1), event(6, "a", 2), event(12, "a", 3)])
+    assert [b["time"] for b in totals.buckets("2023-01-01T12:00:07")] == ["2023-01-01T12:00:05", "2023-01-01T12:00:10"]
+
+
+def test_since_is_validated():
+    assert validate_timestamp(None) is None
+    assert validate_timestamp("2023-01-01T12:00:05") == "2023-01-01T12:00:05"
+    for since in ("yesterday", "2023-01-01", "2023-01-01T12:00:05Z"):
+        with pytest.raises(ValueError):
+            validate_timestamp(since)
@@ -0,0 +1,67 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws, memory_backend
+from shared.simulation import GameSimulation, SimulatedPlayer, PlayerModel, VirtualClock, MODELS, START_TIME
+from shared.questions import WarmupQuestion, AdditionQuestion
+from shared.question_factory import MAX_ROUND
+from dynamodb.games import Games
+import datetime as dt
+import random
+import pytest
+
+
+@pytest.fixture()
+def memory(monkeypatch):
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    yield
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+
+
+def test_player_implements_question_types_in_order():
+    clock = VirtualClock()
+    player = SimulatedPlayer("team0", PlayerModel(accuracy=1, pace=60), clock, random.Random(0))
+    assert player.answer(WarmupQuestion()) == "CORRECT"
+    assert player.answer(AdditionQuestion()) == "WRONG"
+
+    clock.advance(START_TIME + 2 * 60)
+    assert player.answer(AdditionQuestion()) == "CORRECT"
+
+
+def test_simulated_game_replays_every_round(memory):
+    models = [MODELS["strong"]] * 4 + [MODELS["weak"]] * 4
+    simulation = GameSimulation(models, duration=14 * 60, warmup=60, round_duration=2 * 60, seed=1)
+    summary = simulation.run()
+
+    assert [round for _, round in summary['rounds']] == list(range(1, MAX_ROUND + 1))
+    assert summary['questions'] == sum(summary['responses'].values()) > 0
+    assert summary['stats']['num_players'] == len(models)
+    assert summary['latency']['spans']['question']['count'] == summary['questions']
+    assert Games(aws.dynamodb()).get_game(summary['game_id'], consistent=True)['ended']
+
+    # events are stamped with the virtual clock and come in time order
+    events = list(simulation.events())
+    timestamps = [event['timestamp'] for event in events]
+    assert timestamps == sorted(timestamps)
+    assert timestamps[0] >= dt.datetime.fromtimestamp(START_TIME).strftime('%Y-%m-%dT%H:%M:%S')
+    assert sum(event.get('query') == "WARMUP_ENDED" for event in events) == len(models)
+
+
+def test_simulation_needs_memory_backend(monkeypatch):
+    monkeypatch.delenv(aws.BACKEND_ENV, raising=False)
+    with pytest.raises(RuntimeError):
+        GameSimulation([MODELS["average"]], duration=60).run()
+
+
+def test_seeded_game_replays_identically(memory):
+    models = [MODELS["average"], MODELS["flaky"], MODELS["weak"]] * 2
+    summaries = [GameSimulation(models, duration=6 * 60, warmup=60, round_duration=60, seed=7).run() for _ in range(2)]
+    # everything but the ids and the wall-clock measures
+    for summary in summaries:
+        for key in ("game_id", "wall_seconds", "questions_per_second", "latency"):
+            del summary[key]
+    assert summaries[0] == summaries[1]
+    assert summaries[0]['questions'] > 0
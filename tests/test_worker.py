@@ -0,0 +1,124 @@
+import sys
+
+sys.path.append(".")
+
+from shared import aws, memory_backend, worker as worker_module
+from shared.worker import Worker, ADMINISTER_QUESTION_QUEUE, LEASE_TIMEOUT
+from shared.quiz_master import QuizMaster
+from shared.games_manager import GamesManager
+from dynamodb.games import Games
+from botocore.exceptions import ClientError
+from unittest.mock import Mock
+import threading
+import json
+import time
+import pytest
+
+
+class AlwaysCorrect:
+    def ask_all(self, asks, latencies=None):
+        return ["CORRECT"] * len(asks)
+
+
+@pytest.fixture()
+def sqs_offset(monkeypatch):
+    """ Seconds the SQS clock is ahead of the worker's, to expire leases without waiting """
+    offset = [0]
+    monkeypatch.setenv(aws.BACKEND_ENV, "memory")
+    monkeypatch.setattr(worker_module, "RECEIVE_WAIT_TIME", 0.1)
+    aws.reset()
+    memory_backend.reset(clock=lambda: time.time() + offset[0])
+    Games.cache.clear()
+    yield offset
+    aws.reset()
+    memory_backend.reset()
+    Games.cache.clear()
+
+
+def start_game(players=3):
+    games_manager = GamesManager()
+    game_id = games_manager.new_game("secret")['game_id']
+    player_ids = [games_manager.add_player_to_game(game_id, f"team{i}", "http://team")['player_id']
+                  for i in range(players)]
+    return games_manager, game_id, player_ids
+
+
+def start_worker(quiz_master=None):
+    quiz_master = quiz_master or QuizMaster(dispatcher=AlwaysCorrect())
+    worker = Worker(quiz_master=quiz_master, game_monitor=Mock())
+    thread = threading.Thread(target=worker.run, daemon=True)
+    thread.start()
+    return worker, thread
+
+
+def wait_for_questions(games_manager, game_id, player_ids, count, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        players = games_manager.get_game_players(game_id, *player_ids)
+        if all(player['request_counts'] >= count for player in players.values()):
+            return players
+        time.sleep(0.05)
+    raise AssertionError("players weren't asked")
+
+
+def queued_tasks():
+    sqs = aws.client('sqs')
+    messages = sqs.queues[aws.queue_url(ADMINISTER_QUESTION_QUEUE)]
+    return messages, {json.loads(m.body)['player_id']: json.loads(m.body) for m in messages}
+
+
+def test_stopped_worker_requeues_pending_questions(sqs_offset):
+    games_manager, game_id, player_ids = start_game()
+    worker, thread = start_worker()
+    wait_for_questions(games_manager, game_id, player_ids, 1)
+
+    worker.stop()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+    # one task per player, with the hash of its next question, and the seeding messages are deleted
+    messages, tasks = queued_tasks()
+    players = games_manager.get_game_players(game_id, *player_ids)
+    assert len(messages) == len(player_ids)
+    assert {player_id: task['modification_hash'] for player_id, task in tasks.items()} == \
+        {player_id: player['modification_hash'] for player_id, player in players.items()}
+    assert not worker.leases
+
+
+def test_players_of_a_dead_worker_are_resumed(sqs_offset):
+    games_manager, game_id, player_ids = start_game()
+    worker, thread = start_worker()
+    asked = wait_for_questions(games_manager, game_id, player_ids, 1)
+
+    # dies without handing its questions back: the seeding messages are still in flight
+    worker.requeue_questions = lambda: None
+    worker.stop()
+    thread.join(timeout=10)
+    messages, _ = queued_tasks()
+    assert len(messages) == len(player_ids)
+
+    sqs_offset[0] += LEASE_TIMEOUT + 1
+    worker, thread = start_worker()
+    counts = max(player['request_counts'] for player in asked.values())
+    wait_for_questions(games_manager, game_id, player_ids, counts + 1)
+    worker.stop()
+    thread.join(timeout=10)
+
+
+def test_failed_event_flush_doesnt_stop_the_worker(sqs_offset):
+    games_manager, game_id, player_ids = start_game()
+    quiz_master = QuizMaster(dispatcher=AlwaysCorrect())
+    throttled = ClientError({"Error": {"Code": "ProvisionedThroughputExceededException", "Message": ""}}, "BatchWriteItem")
+
+    def flush_events(force=False):
+        # only the final flush, on stop, gets through
+        if not force:
+            raise throttled
+
+    quiz_master.flush_events = flush_events
+    worker, thread = start_worker(quiz_master)
+
+    wait_for_questions(games_manager, game_id, player_ids, 2)
+    assert thread.is_alive()
+    worker.stop()
+    thread.join(timeout=10)